@@ -0,0 +1 @@
+"""Performance benchmarks for the ridership analytics (run with ``python -m``)."""
@@ -0,0 +1,113 @@
+"""Time and memory benchmark of the dashboard analytics on synthetic data.
+
+    python -m benchmarks.bench_analytics
+    python -m benchmarks.bench_analytics --scales 1 100 --lines 13 --json bench.json
+
+Each case is timed as the best of ``--repeat`` runs and its peak traced memory
+is taken from a separate run under tracemalloc. Combinations whose input frame
+would exceed ``--max-frame-gb`` are reported as skipped. The date-range cases
+compare filtering with `DateRangeIndex` against regrouping the filtered rows.
+"""
+import argparse
+import functools
+import json
+import time
+import tracemalloc
+
+from benchmarks.synthetic import BASE_ROWS, line_names, make_ridership_frame
+from ridership import analytics
+from ridership.cube import LINE_COLUMNS, build_cube, update_cube
+from ridership.data import select_rows
+from ridership.ranges import DateRangeIndex
+
+CUBE_CASES = {
+    'total_ridership': analytics.total_ridership,
+    'avg_ridership_per_day': analytics.avg_ridership_per_day,
+    'latest_growth_rate': analytics.latest_growth_rate,
+    'peak_ridership': analytics.peak_ridership,
+    'yearly_ridership': analytics.yearly_ridership,
+    'monthly_average_ridership': analytics.monthly_average_ridership,
+    'day_of_week_ridership': analytics.day_of_week_ridership,
+    'weekday_weekend_ridership': lambda cube: analytics.weekday_weekend_ridership(cube, LINE_COLUMNS),
+    'monthly_mode_comparison': analytics.monthly_mode_comparison,
+    'yearly_mode_comparison': analytics.yearly_mode_comparison,
+}
+
+
+def measure(fn, arg, repeat):
+    """Return (best seconds, peak traced MiB) of calling `fn(arg)`."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def run(scales, line_counts, repeat=3, max_frame_gb=4.0):
+    records = []
+    for n_lines in line_counts:
+        for scale in scales:
+            n_rows = BASE_ROWS * scale
+            frame_gb = n_rows * (n_lines + 1) * 8 / 2**30
+            case = {'scale': scale, 'rows': n_rows, 'lines': n_lines}
+            if frame_gb > max_frame_gb:
+                print(f'{scale:>6}x {n_lines:>4} lines  skipped: frame would be {frame_gb:.1f} GiB')
+                records.append({**case, 'name': None, 'skipped': f'{frame_gb:.1f} GiB frame'})
+                continue
+
+            df = make_ridership_frame(n_rows, n_lines)
+            build = functools.partial(build_cube, lines=line_names(n_lines))
+            results = [('build_cube', *measure(build, df, repeat))]
+            previous = build(df.iloc[:-1])
+            results.append(('update_cube (+1 day)', *measure(lambda d: update_cube(previous, d), df, repeat)))
+            del previous
+
+            # The middle half of the history, from prefix sums vs. regrouping its rows
+            start, end = df['date'].iloc[n_rows // 4], df['date'].iloc[3 * n_rows // 4]
+            index_range = functools.partial(DateRangeIndex, lines=line_names(n_lines))
+            results.append(('DateRangeIndex', *measure(index_range, df, repeat)))
+            index = index_range(df)
+            results.append(('range cube (prefix sums)', *measure(lambda i: i.cube(start, end), index, repeat)))
+            results.append(('range cube (regroup rows)',
+                            *measure(lambda d: build(select_rows(d, None, start, end)), df, repeat)))
+            del index
+
+            cube = build(df)
+            del df
+            for name, fn in CUBE_CASES.items():
+                results.append((name, *measure(fn, cube, repeat)))
+
+            for name, seconds, peak in results:
+                print(f'{scale:>6}x {n_lines:>4} lines  {name:<28}{seconds * 1e3:>11.2f} ms{peak:>11.1f} MiB')
+                records.append({**case, 'name': name, 'seconds': seconds, 'peak_mib': peak})
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100, 10_000],
+                        help='multiples of the current row count')
+    parser.add_argument('--lines', type=int, nargs='+', default=[len(LINE_COLUMNS), 500],
+                        help='number of line columns')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-frame-gb', type=float, default=4.0,
+                        help='skip combinations whose input frame is larger than this')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    records = run(args.scales, args.lines, args.repeat, args.max_frame_gb)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(records, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
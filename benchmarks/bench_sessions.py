@@ -0,0 +1,224 @@
+"""Concurrent-session load test of the dashboard.
+
+    python -m benchmarks.bench_sessions
+    python -m benchmarks.bench_sessions --sessions 50 --rounds 5 --json sessions.json
+    python -m benchmarks.bench_sessions --fixture ridership_headline.parquet --max-p95-ms 500
+
+Opens ``--sessions`` simulated browser sessions of ``ridership_dashboard.py``
+with Streamlit's ``AppTest``, all in this process so they share its caches
+and background refresher as sessions of one server do, against a local
+parquet file (synthetic unless ``--fixture`` is given; no network). Each
+session then runs ``--rounds`` of scripted interactions, taking turns with
+the other sessions:
+
+- clear "Select All Lines" and pick two to five lines in the multiselect,
+- move the date-range slider to a random range,
+- download the full table and the selection (the deferred download callables
+  are executed as a click would),
+- check "Select All Lines" again.
+
+Switching the overview tabs is not scripted: tabs switch in the browser
+without a rerun, and every run renders all of them.
+
+Script runs hold the GIL, so one process executes them one at a time
+whatever the number of sessions; running them in turn measures the service
+time of each rerun, and reruns per second is the throughput of one process.
+Reported are latency percentiles per interaction, throughput, and resident
+memory before the sessions, after opening the first one (which loads the
+data), after opening all of them and at the end. With
+``--max-p95-ms`` the exit status is 1 when the p95 latency of any interaction
+exceeds the budget.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / 'ridership_dashboard.py'
+
+PERCENTILES = (50, 95, 99)
+
+# {deferred file id: callable} of the download buttons rendered so far. AppTest
+# drops the media file manager they are registered with at the end of each
+# run, so the registrations are recorded as they happen.
+_downloads = {}
+
+
+def _record_downloads():
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    add_deferred = MediaFileManager.add_deferred
+
+    def recording_add_deferred(self, data_callable, *args, **kwargs):
+        file_id = add_deferred(self, data_callable, *args, **kwargs)
+        _downloads[file_id] = data_callable
+        return file_id
+
+    MediaFileManager.add_deferred = recording_add_deferred
+
+
+class Session:
+    """One simulated browser session and the latencies of its reruns."""
+
+    def __init__(self, rng, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_file(str(APP), default_timeout=timeout)
+        self.rng = rng
+        self.samples = []
+        self.errors = []
+        self.dates = None
+
+    def _timed(self, action, step):
+        start = time.perf_counter()
+        step()
+        self.samples.append((action, time.perf_counter() - start))
+        self.errors += [f'{action}: {exception.value}' for exception in self.app.exception]
+
+    def _widget(self, kind, label):
+        return next(widget for widget in getattr(self.app, kind) if widget.label == label)
+
+    def _download(self, key):
+        # What a click on the button runs on the server
+        _downloads.pop(self.app.download_button(key=key).proto.deferred_file_id)()
+
+    def open(self):
+        self._timed('open', self.app.run)
+        # The date-range slider starts at the full history
+        self.dates = self._widget('slider', 'Date range').value
+
+    def play_round(self):
+        app, rng = self.app, self.rng
+        self._timed('select_all.off', self._widget('checkbox', 'Select All Lines').uncheck().run)
+
+        multiselect = app.multiselect[0]
+        lines = rng.sample(list(multiselect.options), rng.randint(2, min(5, len(multiselect.options))))
+        self._timed('multiselect', multiselect.set_value(lines).run)
+
+        first, last = self.dates
+        days = (last - first).days
+        start = first + datetime.timedelta(days=rng.randrange(days // 2))
+        end = start + datetime.timedelta(days=rng.randrange(30, (last - start).days))
+        self._timed('date_range', self._widget('slider', 'Date range').set_value((start, end)).run)
+
+        self._timed('download.full', lambda: self._download('download-csv'))
+        self._timed('download.selection', lambda: self._download('download-selection'))
+
+        self._timed('select_all.on', self._widget('checkbox', 'Select All Lines').check().run)
+
+
+def latency_table(samples):
+    """{action: {'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}}, plus 'all' actions."""
+    by_action = {}
+    for action, seconds in samples:
+        by_action.setdefault(action, []).append(seconds)
+    by_action['all'] = [seconds for _, seconds in samples]
+    table = {}
+    for action, values in by_action.items():
+        quantiles = np.percentile(np.array(values) * 1e3, PERCENTILES)
+        table[action] = {'count': len(values), **{f'p{p}_ms': q for p, q in zip(PERCENTILES, quantiles)},
+                         'max_ms': max(values) * 1e3}
+    return table
+
+
+def run(n_sessions, rounds, seed, timeout):
+    from ridership.metrics import rss_bytes
+
+    _record_downloads()
+    rss_start = rss_bytes()
+    sessions = [Session(random.Random(seed + i), timeout) for i in range(n_sessions)]
+    start = time.perf_counter()
+    # The first session also loads the data and fills the shared caches
+    sessions[0].open()
+    rss_first = rss_bytes()
+    for session in sessions[1:]:
+        session.open()
+    rss_open = rss_bytes()
+    for _ in range(rounds):
+        for session in sessions:
+            session.play_round()
+    elapsed = time.perf_counter() - start
+    rss_end = rss_bytes()
+
+    samples = [sample for session in sessions for sample in session.samples]
+    reruns = sum(1 for action, _ in samples if not action.startswith('download'))
+    return {
+        'sessions': n_sessions,
+        'rounds': rounds,
+        'seconds': elapsed,
+        'reruns': reruns,
+        'reruns_per_second': reruns / elapsed,
+        'latency': latency_table(samples),
+        'rss_start_bytes': rss_start,
+        'rss_first_bytes': rss_first,
+        'rss_open_bytes': rss_open,
+        'rss_end_bytes': rss_end,
+        'errors': [error for session in sessions for error in session.errors],
+    }
+
+
+def report(result):
+    print(f'{result["sessions"]} sessions x {result["rounds"]} rounds: {result["reruns"]:,} reruns in '
+          f'{result["seconds"]:.1f} s, {result["reruns_per_second"]:.1f} reruns/s')
+    print(f'{"interaction":<22}{"count":>7}' + ''.join(f'{f"p{p}":>10}' for p in PERCENTILES) + f'{"max":>10}')
+    for action, row in result['latency'].items():
+        print(f'{action:<22}{row["count"]:>7}' + ''.join(f'{row[f"p{p}_ms"]:>8.1f}ms' for p in PERCENTILES)
+              + f'{row["max_ms"]:>8.1f}ms')
+    if result['rss_start_bytes'] is not None:
+        mib = 1024 ** 2
+        per_session = (result['rss_open_bytes'] - result['rss_first_bytes']) / max(result['sessions'] - 1, 1)
+        print(f'RSS {result["rss_start_bytes"] / mib:.0f} MiB before, {result["rss_first_bytes"] / mib:.0f} MiB '
+              f'with one session, {result["rss_open_bytes"] / mib:.0f} MiB with all of them '
+              f'({per_session / mib:.2f} MiB per additional session), {result["rss_end_bytes"] / mib:.0f} MiB at the end')
+    for error in result['errors'][:10]:
+        print(f'error: {error}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--fixture', help='parquet file to serve instead of a synthetic one')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds allowed for one script run')
+    parser.add_argument('--max-p95-ms', type=float, help='fail if the p95 latency of any interaction exceeds this')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixture = Path(args.fixture).resolve() if args.fixture else tmp / 'ridership_headline.parquet'
+        # The ridership modules read their configuration when imported, so it
+        # is set before the first import, here or by the dashboard
+        os.environ.update({'RIDERSHIP_DATA_URL': '',
+                           'RIDERSHIP_LOCAL_PATH': str(fixture),
+                           'RIDERSHIP_CACHE_DIR': str(tmp / 'cache'),
+                           'RIDERSHIP_SNAPSHOT_PATH': str(tmp / 'aggregates.pkl'),
+                           'RIDERSHIP_METRICS_DIR': str(tmp / 'metrics'),
+                           'RIDERSHIP_REFRESH_INTERVAL': str(24 * 60 * 60)})
+        if not args.fixture:
+            from benchmarks.synthetic import make_ridership_frame
+            make_ridership_frame().to_parquet(fixture, index=False)
+        result = run(args.sessions, args.rounds, args.seed, args.timeout)
+
+    report(result)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(result, fh, indent=2)
+
+    over_budget = [action for action, row in result['latency'].items()
+                   if args.max_p95_ms is not None and row['p95_ms'] > args.max_p95_ms]
+    if over_budget:
+        print(f'p95 over {args.max_p95_ms:g} ms: {", ".join(over_budget)}')
+    if result['errors'] or over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
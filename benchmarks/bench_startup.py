@@ -0,0 +1,145 @@
+"""Cold-start benchmark of the dashboard.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --json startup.json
+
+Every measurement runs in a fresh Python process against a synthetic local
+parquet file (no network), and the median of ``--repeat`` runs is reported:
+
+- import time of the dashboard's modules, and of the plotting stack it used
+  to import eagerly (modules that aren't installed are skipped),
+- loading the aggregate snapshot vs. loading the data and aggregating it,
+- a full first script run with Streamlit's ``AppTest``, with and without a
+  snapshot on disk.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.synthetic import make_ridership_frame
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / 'ridership_dashboard.py'
+
+APP_IMPORTS = 'import streamlit, pandas, ridership.analytics, ridership.charts, ridership.correlation, ' \
+              'ridership.cube, ridership.data, ridership.downsample, ridership.export, ridership.snapshot'
+EAGER_IMPORTS = 'import streamlit, pandas, numpy, matplotlib.pyplot, plotly.express, seaborn, ' \
+                'streamlit_extras.add_vertical_space, plotly.graph_objects'
+
+# Each snippet prints the seconds it took as its last line of output
+SNIPPETS = {
+    'import dashboard modules': f'''
+import time
+start = time.perf_counter()
+{APP_IMPORTS}
+print(time.perf_counter() - start)
+''',
+    'import eager plotting stack (before)': f'''
+import time
+start = time.perf_counter()
+{EAGER_IMPORTS}
+print(time.perf_counter() - start)
+''',
+    'load snapshot': '''
+import time
+start = time.perf_counter()
+from ridership.snapshot import load_snapshot
+assert load_snapshot() is not None
+print(time.perf_counter() - start)
+''',
+    'load data + aggregate': '''
+import time
+start = time.perf_counter()
+from ridership.cube import LINE_COLUMNS, build_cube
+from ridership.data import load_ridership
+df, version = load_ridership(columns=LINE_COLUMNS, compact=True)
+build_cube(df)
+print(time.perf_counter() - start)
+''',
+    'first script run': f'''
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({str(APP)!r}, default_timeout=120)
+app.run()
+assert not app.exception, [e.value for e in app.exception]
+print(time.perf_counter() - start)
+''',
+}
+
+
+def run_snippet(code, env):
+    result = subprocess.run([sys.executable, '-c', code], env=env, cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    return float(result.stdout.strip().splitlines()[-1]), None
+
+
+def measure(name, code, env, repeat, prepare=None):
+    samples = []
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        seconds, error = run_snippet(code, env)
+        if error is not None:
+            print(f'{name:<42} skipped: {error}')
+            return {'name': name, 'skipped': error}
+        samples.append(seconds)
+    median = statistics.median(samples)
+    print(f'{name:<42}{median * 1e3:>10.1f} ms')
+    return {'name': name, 'median_seconds': median, 'samples': samples}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixture = tmp / 'ridership_headline.parquet'
+        make_ridership_frame().to_parquet(fixture, index=False)
+        snapshot = tmp / 'aggregates.pkl'
+        env = {**os.environ,
+               'PYTHONPATH': str(ROOT),
+               'RIDERSHIP_DATA_URL': '',
+               'RIDERSHIP_LOCAL_PATH': str(fixture),
+               'RIDERSHIP_CACHE_DIR': str(tmp / 'cache'),
+               'RIDERSHIP_SNAPSHOT_PATH': str(snapshot)}
+
+        build = 'from ridership.snapshot import main; main([])'
+        subprocess.run([sys.executable, '-c', build], env=env, cwd=ROOT, check=True, capture_output=True)
+        snapshot_bytes = snapshot.read_bytes()
+
+        def with_snapshot():
+            snapshot.write_bytes(snapshot_bytes)
+
+        def without_snapshot():
+            snapshot.unlink(missing_ok=True)
+
+        records = [
+            measure('import dashboard modules', SNIPPETS['import dashboard modules'], env, args.repeat),
+            measure('import eager plotting stack (before)', SNIPPETS['import eager plotting stack (before)'],
+                    env, args.repeat),
+            measure('load snapshot', SNIPPETS['load snapshot'], env, args.repeat, with_snapshot),
+            measure('load data + aggregate', SNIPPETS['load data + aggregate'], env, args.repeat),
+            measure('first script run (no snapshot)', SNIPPETS['first script run'], env, args.repeat,
+                    without_snapshot),
+            measure('first script run (snapshot)', SNIPPETS['first script run'], env, args.repeat,
+                    with_snapshot),
+        ]
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(records, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
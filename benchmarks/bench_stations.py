@@ -0,0 +1,106 @@
+"""Time and peak memory of rolling station-level ridership up to lines.
+
+    python -m benchmarks.bench_stations
+    python -m benchmarks.bench_stations --days 2192 --stations-per-line 40 --hours 18 --json stations.json
+
+A synthetic station file (one row per station, day and hour) is written to a
+temporary directory a month at a time. It is then aggregated by the streaming
+path and, unless ``--skip-eager``, by reading it whole with pandas and
+grouping. Each run is in a fresh process so the reported peak resident memory
+belongs to that approach alone.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.synthetic import make_station_frame, station_lines
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Each snippet prints "<seconds> <peak RSS KiB>"; argv is (parquet path, station table JSON)
+RUNNERS = {
+    'stream_station_ridership': '''
+import json, resource, sys, time
+from ridership.stations import stream_station_ridership
+start = time.perf_counter()
+daily = stream_station_ridership(sys.argv[1], json.load(open(sys.argv[2]))).result()
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+''',
+    'read_parquet + groupby': '''
+import json, resource, sys, time
+import pandas as pd
+start = time.perf_counter()
+df = pd.read_parquet(sys.argv[1])
+df['line'] = df['station'].astype(str).map(json.load(open(sys.argv[2])))
+daily = df.groupby([df['date'].dt.normalize(), 'line'])['ridership'].sum().unstack()
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+''',
+}
+
+
+def write_station_file(path, days, stations, hours):
+    """Write the synthetic station rows to `path` a month at a time; returns the row count."""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer, rows = None, 0
+    for offset in range(0, days, 30):
+        start = pd.Timestamp('2019-01-01') + pd.Timedelta(days=offset)
+        chunk = make_station_frame(min(30, days - offset), stations, hours, seed=offset, start=start)
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table, row_group_size=1024 * 1024)
+        rows += len(chunk)
+    writer.close()
+    return rows
+
+
+def run(code, path, table_path):
+    result = subprocess.run([sys.executable, '-c', code, str(path), str(table_path)], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    seconds, peak_kib = result.stdout.split()
+    return (float(seconds), int(peak_kib) / 1024), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--stations-per-line', type=int, default=20)
+    parser.add_argument('--hours', type=int, default=18)
+    parser.add_argument('--skip-eager', action='store_true', help='only run the streaming path')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    stations = station_lines(args.stations_per_line)
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path, table_path = Path(tmp) / 'stations.parquet', Path(tmp) / 'stations.json'
+        table_path.write_text(json.dumps(stations))
+        rows = write_station_file(path, args.days, stations, args.hours)
+        print(f'{rows:,} rows, {path.stat().st_size / 1024 ** 2:.0f} MiB on disk')
+        for name, code in RUNNERS.items():
+            if args.skip_eager and name != 'stream_station_ridership':
+                continue
+            measured, error = run(code, path, table_path)
+            if error is not None:
+                print(f'{name:<28} failed: {error}')
+                records.append({'name': name, 'rows': rows, 'error': error})
+                continue
+            seconds, peak_mib = measured
+            print(f'{name:<28}{seconds:>9.2f} s{peak_mib:>10.0f} MiB peak RSS')
+            records.append({'name': name, 'rows': rows, 'seconds': seconds, 'peak_rss_mib': peak_mib})
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(records, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
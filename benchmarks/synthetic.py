@@ -0,0 +1,58 @@
+"""Synthetic ridership tables shaped like the headline dataset."""
+import numpy as np
+import pandas as pd
+
+from ridership.cube import LINE_COLUMNS
+
+# Daily rows in the headline dataset (2019-01-01 to 2024-12-31)
+BASE_ROWS = 2192
+
+
+def line_names(n_lines):
+    """The real line columns first, padded with generated names up to `n_lines`."""
+    extra = [f'line_{i:03d}' for i in range(len(LINE_COLUMNS), n_lines)]
+    return (LINE_COLUMNS + extra)[:n_lines]
+
+
+def make_ridership_frame(n_rows=BASE_ROWS, n_lines=len(LINE_COLUMNS), seed=0, start='2019-01-01'):
+    """Daily ridership with a weekly pattern and noise, one row per consecutive day.
+
+    Columns are float64 like the published parquet file. Dates use second
+    resolution so very long histories stay inside the datetime range; at the
+    10,000x scale they run past the year 60000, which the table's int32
+    `year` column and the cube handle like any other year.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_rows, freq='D', unit='s')
+    weekly = np.where(dates.dayofweek >= 5, 0.6, 1.0)
+
+    # Built column by column to keep peak memory at one extra column
+    columns = {'date': dates}
+    for line in line_names(n_lines):
+        level = rng.uniform(1e3, 3e5)
+        columns[line] = np.rint(level * weekly * rng.uniform(0.8, 1.2, n_rows))
+    return pd.DataFrame(columns)
+
+
+def station_lines(n_stations_per_line=20):
+    """A station → line table with `n_stations_per_line` made-up stations on each line."""
+    return {f'{line}:{i:02d}': line for line in LINE_COLUMNS for i in range(n_stations_per_line)}
+
+
+def make_station_frame(n_days=BASE_ROWS, stations=None, hours=1, seed=0, start='2019-01-01'):
+    """Station-level ridership: one row per station, day and hour, like the OD/station files.
+
+    The rows of each day are shuffled across stations, and the `date` column
+    holds the hour's timestamp when `hours` > 1.
+    """
+    rng = np.random.default_rng(seed)
+    stations = list(stations or station_lines())
+    days = pd.date_range(start, periods=n_days, freq='D', unit='s')
+    hour_offsets = pd.to_timedelta(np.arange(hours), unit='h')
+    dates = (days.values[:, None] + hour_offsets.values[None, :]).ravel()
+    n_rows = len(dates) * len(stations)
+    return pd.DataFrame({
+        'date': np.repeat(dates, len(stations)),
+        'station': pd.Categorical(np.tile(stations, len(dates))),
+        'ridership': rng.integers(0, 500, n_rows).astype(np.float64),
+    })
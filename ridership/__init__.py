@@ -0,0 +1,9 @@
+"""Data access and analytics for the public transport ridership dashboard."""
+from ridership.cube import (DAY_NAMES, LINE_COLUMNS, IncrementalCube, RidershipCube, build_cube,
+                            update_cube)
+from ridership.data import URL_DATA, compact_ridership, load_ridership
+from ridership.registry import REGISTRY, LineRegistry, load_registry
+from ridership.table import RidershipTable
+
+__all__ = ['DAY_NAMES', 'LINE_COLUMNS', 'REGISTRY', 'IncrementalCube', 'LineRegistry', 'RidershipCube',
+           'RidershipTable', 'URL_DATA', 'build_cube', 'compact_ridership', 'load_registry', 'load_ridership', 'update_cube']
@@ -0,0 +1,98 @@
+"""KPI math and chart aggregations for the dashboard.
+
+Everything here is a pure function of a `RidershipCube`, with no Streamlit
+calls, so it can be imported, unit-tested and benchmarked on its own.
+"""
+import pandas as pd
+
+from ridership.cube import DAY_NAMES
+from ridership.registry import REGISTRY
+
+
+# KPIs
+def total_ridership(cube):
+    """Total trips across all lines and days."""
+    return cube.sums.sum().sum()
+
+
+def avg_ridership_per_day(cube):
+    """Average of the per-line ridership totals shown on the KPI card."""
+    return cube.sums.sum().mean()
+
+
+def monthly_ridership(cube):
+    """Per-line monthly sums with the month-over-month `growth_rate` in percent."""
+    monthly = cube.sum_by('year', 'month')
+    monthly['growth_rate'] = cube.growth_rate()
+    return monthly
+
+
+def latest_growth_rate(cube):
+    """Month-over-month growth of the most recent month, in percent."""
+    return cube.growth_rate().iloc[-1]
+
+
+def peak_ridership(cube):
+    """Highest total ridership on a single day and the (first) date it occurred."""
+    return cube.peak
+
+
+# Overview tabs
+def yearly_ridership(cube):
+    """Per-line yearly sums plus `total_ridership`, indexed by year."""
+    yearly = cube.sum_by('year')
+    yearly['total_ridership'] = yearly.sum(axis=1)
+    return yearly
+
+
+def monthly_average_ridership(cube):
+    """Monthly totals and average daily ridership with `year`/`month` columns."""
+    monthly = cube.sum_by('year', 'month')
+    monthly['total_ridership'] = monthly.sum(axis=1)
+    monthly['average_ridership'] = monthly['total_ridership'] / cube.days_by('year', 'month')
+    return monthly.reset_index()
+
+
+def day_of_week_ridership(cube):
+    """Mean daily ridership per line for each weekday, with bus/rail breakdown.
+
+    The total and the breakdown are means of the table's daily `total` and
+    `bus_total`/`rail_total` columns, so bus and rail add up to the total.
+    """
+    days = cube.mean_by('day_of_week').reindex(range(7))
+    days.index = pd.Index(DAY_NAMES, name='day_of_week')
+    n_days = cube.days_by('day_of_week').reindex(range(7)).to_numpy()
+    subtotals = cube.subtotals.groupby(level='day_of_week').sum().reindex(range(7))
+    days['total_ridership'] = cube.sum_by('day_of_week').sum(axis=1).reindex(range(7)).to_numpy() / n_days
+    days['bus_ridership'] = subtotals['bus'].to_numpy() / n_days
+    days['rail_ridership'] = subtotals['rail'].to_numpy() / n_days
+    return days
+
+
+# In-depth comparisons
+def weekday_weekend_ridership(cube, lines):
+    """Weekday and weekend totals of `lines`, one row per `Transport Mode`."""
+    # A short range may have only weekdays or only weekend days
+    day_type = cube.sum_by('is_weekend').reindex([False, True], fill_value=0)[lines]
+    comparison = pd.DataFrame({'Weekday': day_type.loc[False], 'Weekend': day_type.loc[True]})
+    comparison = comparison.reset_index()
+    return comparison.rename(columns={'index': 'Transport Mode'})
+
+
+def _mode_totals(sums, label):
+    # All modes in one product with the line -> mode indicator matrix
+    modes = REGISTRY.rollup(sums, 'mode')
+    modes.columns.name = None
+    modes.insert(0, label, sums.index)
+    return modes
+
+
+def monthly_mode_comparison(cube):
+    """Average ridership per calendar month and mode across all years."""
+    n_years = len(cube.levels('year'))
+    return _mode_totals(cube.sum_by('month') / n_years, 'month')
+
+
+def yearly_mode_comparison(cube):
+    """Average monthly ridership per year and mode."""
+    return _mode_totals(cube.sum_by('year') / 12, 'year')
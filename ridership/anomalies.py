@@ -0,0 +1,182 @@
+"""Days of unusual ridership, scored for every line at once.
+
+Each line's expected ridership on a day is a seasonal baseline: its level
+(the median of the previous four weeks) times a day-of-week factor (the
+median ratio to the level on the same weekday of the previous eight weeks).
+A day's relative deviation from the baseline is scored as a robust z-score
+against the median and MAD of the deviations over the previous eight weeks,
+and days scoring beyond a threshold are flagged as anomalies.
+
+All windows trail the day being scored, so appending days leaves the scores
+of earlier days unchanged. The scores are computed for the whole (days ×
+lines) matrix with sorted window views instead of rolling one line at a
+time, and `AnomalyDetector` rescores only the days from the first new or
+corrected one on.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ridership.cube import LINE_COLUMNS
+from ridership.data import date_bounds
+from ridership.table import as_table
+
+# Days in the level window; a whole number of weeks, so no weekday dominates
+LEVEL_WINDOW = 28
+# Same weekdays the day-of-week factor is taken over
+SEASONAL_WEEKS = 8
+# Days of deviations the robust z-score is measured against
+SCALE_WINDOW = 56
+# Days with |robust z| of at least this are flagged
+THRESHOLD = 3.5
+# Makes the MAD a consistent estimate of the standard deviation for normal data
+MAD_SCALE = 1.4826
+# Days of history that the score of one day depends on
+LOOKBACK = LEVEL_WINDOW + 7 * SEASONAL_WEEKS + SCALE_WINDOW
+
+
+def _trailing_windows(values, window, step=1):
+    """(days × lines × window) view of the `window` days before each day, `step` days apart.
+
+    Days before the first one are NaN.
+    """
+    padded = np.concatenate([np.full((window * step, values.shape[1]), np.nan), values])
+    return sliding_window_view(padded, (window - 1) * step + 1, axis=0)[:len(values), :, ::step]
+
+
+def _nanmedian(windows, min_periods):
+    """Median over the last axis skipping NaN; NaN where fewer than `min_periods` values."""
+    # Sorting moves the NaNs to the end, so the median of the k valid values
+    # is at positions (k - 1) // 2 and k // 2
+    ordered = np.sort(windows, axis=-1)
+    k = np.count_nonzero(~np.isnan(windows), axis=-1)
+    low = np.take_along_axis(ordered, np.maximum(k - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, k[..., None] // 2, axis=-1)[..., 0]
+    median = (low + high) / 2
+    median[k < max(min_periods, 1)] = np.nan
+    return median
+
+
+def score_days(values):
+    """Seasonal baseline and robust z-score of every value of a (days × lines) matrix.
+
+    `values` has one row per consecutive day, NaN where a line has no reading.
+    Both results are NaN where there is too little history to score a day.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    level = _nanmedian(_trailing_windows(values, LEVEL_WINDOW), LEVEL_WINDOW // 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        level[~(level > 0)] = np.nan
+        seasonal = _nanmedian(_trailing_windows(values / level, SEASONAL_WEEKS, 7), SEASONAL_WEEKS // 2)
+        baseline = level * seasonal
+        baseline[~(baseline > 0)] = np.nan
+        deviation = values / baseline - 1
+
+        windows = _trailing_windows(deviation, SCALE_WINDOW)
+        centre = _nanmedian(windows, SCALE_WINDOW // 2)
+        mad = _nanmedian(np.abs(windows - centre[..., None]), SCALE_WINDOW // 2)
+        mad[~(mad > 0)] = np.nan
+        scores = (deviation - centre) / (MAD_SCALE * mad)
+    return baseline, scores
+
+
+def _daily_values(table, lines):
+    """First day number and the (days × lines) values with one row per calendar day."""
+    days = table.column('day_number')
+    values = table.line_values(lines)
+    if not len(days):
+        return 0, values
+    if days[-1] - days[0] + 1 != len(days):
+        # Missing dates become rows without readings
+        full = np.full((days[-1] - days[0] + 1, len(lines)), np.nan)
+        full[days - days[0]] = values
+        values = full
+    return int(days[0]), values
+
+
+@dataclass(frozen=True)
+class Anomalies:
+    """Baselines and robust z-scores of every line on every day.
+
+    `values`, `baseline` and `scores` are (days × lines) arrays with one row
+    per day of `dates`, which runs without gaps from the first to the last day
+    of the table.
+    """
+    lines: list
+    dates: pd.DatetimeIndex
+    values: np.ndarray
+    baseline: np.ndarray
+    scores: np.ndarray
+
+    def flagged(self, lines=None, start=None, end=None, threshold=THRESHOLD):
+        """Days of `lines` from `start` to `end` (inclusive) with |score| of at least `threshold`.
+
+        One row per flagged day and line, in date order, with the ridership,
+        the expected ridership, the relative deviation and the score.
+        """
+        lines = self.lines if lines is None else list(lines)
+        columns = [self.lines.index(line) for line in lines]
+        lo, hi = date_bounds(self.dates, start, end)
+
+        scores = self.scores[lo:hi, columns]
+        with np.errstate(invalid='ignore'):
+            days, flagged = np.nonzero(np.abs(scores) >= threshold)
+        rows, picked = lo + days, np.asarray(columns, dtype=np.intp)[flagged]
+        values, baseline = self.values[rows, picked], self.baseline[rows, picked]
+        return pd.DataFrame({'date': self.dates[rows],
+                             'line': np.asarray(lines, dtype=object)[flagged],
+                             'ridership': values,
+                             'expected': baseline,
+                             'deviation': values / baseline - 1,
+                             'score': scores[days, flagged]})
+
+
+class AnomalyDetector:
+    """Keeps the latest `Anomalies` and rescores only the days that changed on each new version.
+
+    One detector serves every session of the process; `update` holds a lock,
+    so two sessions seeing a new version score it once rather than racing.
+    """
+
+    def __init__(self, lines=LINE_COLUMNS):
+        self.lines = list(lines)
+        self.anomalies = None
+        self.version = None
+        self._first_day = None
+        self._lock = threading.Lock()
+
+    def update(self, df, version=None):
+        """Return the `Anomalies` of `df` (a frame or `RidershipTable`), reusing the previous scores."""
+        with self._lock:
+            if self.anomalies is not None and version is not None and version == self.version:
+                return self.anomalies
+            first_day, values = _daily_values(as_table(df, self.lines), self.lines)
+            previous = self.anomalies
+
+            # Days before the first new or corrected one keep their scores
+            start = 0
+            if previous is not None and first_day == self._first_day:
+                n = min(len(values), len(previous.values))
+                old, new = previous.values[:n], values[:n]
+                changed = np.flatnonzero(((old != new) & ~(np.isnan(old) & np.isnan(new))).any(axis=1))
+                start = changed[0] if len(changed) else n
+
+            if previous is not None and start == len(values) == len(previous.values):
+                anomalies = previous
+            else:
+                # Rescored days need LOOKBACK days of history before them
+                context = max(start - LOOKBACK, 0)
+                baseline, scores = score_days(values[context:])
+                baseline, scores = baseline[start - context:], scores[start - context:]
+                if start:
+                    baseline = np.concatenate([previous.baseline[:start], baseline])
+                    scores = np.concatenate([previous.scores[:start], scores])
+                anomalies = Anomalies(
+                    lines=self.lines,
+                    dates=pd.date_range(pd.Timestamp(first_day, unit='D'), periods=len(values), freq='D'),
+                    values=values, baseline=baseline, scores=scores)
+            self.anomalies, self.version, self._first_day = anomalies, version, first_day
+            return anomalies
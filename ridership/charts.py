@@ -0,0 +1,184 @@
+"""Plotly figures shown on the dashboard.
+
+Plotly is imported inside each builder instead of at module level, so starting
+the app (or importing this module) doesn't pay for `plotly.express` until the
+first chart is actually built.
+"""
+from ridership.cube import DAY_NAMES
+from ridership.registry import REGISTRY
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def yearly_figure(yearly_df):
+    """Line chart of total ridership per year."""
+    import plotly.express as px
+    return px.line(yearly_df, x=yearly_df.index,
+                   y='total_ridership',
+                   labels={'total_ridership': 'Total Ridership'},
+                   line_shape="linear",
+                   markers=True,
+                   line_dash_sequence=['solid'],
+                   color_discrete_sequence=["#1E90FF"])
+
+
+def monthly_figure(monthly_ridership_df):
+    """One line per year of the average daily ridership in each month."""
+    import plotly.express as px
+    fig_monthly = px.line(monthly_ridership_df, x='month', y='average_ridership',
+                          color='year',
+                          labels={'average_ridership': 'Average Ridership'},
+                          line_shape="linear",
+                          color_discrete_sequence=px.colors.qualitative.Set2)
+
+    # Customize x-axis to show month names
+    fig_monthly.update_xaxes(title='Month', tickmode='array',
+                             tickvals=monthly_ridership_df['month'],
+                             ticktext=MONTH_LABELS)
+    return fig_monthly
+
+
+def day_of_week_figure(days):
+    """Bar chart of average ridership per weekday with a bus/rail breakdown on hover."""
+    import plotly.express as px
+    fig_day = px.bar(days,
+                     x=days.index,
+                     y='total_ridership',
+                     labels={'total_ridership': 'Average Ridership'},
+                     color='total_ridership',
+                     color_continuous_scale='Blues',
+                     template='plotly_dark',
+                     barmode='group',
+                     category_orders={"day_of_week": DAY_NAMES}
+                     )
+
+    # Pass the custom bus and rail breakdown data
+    fig_day.update_traces(
+        customdata=days[['bus_ridership', 'rail_ridership']].values,
+        hovertemplate="<b>Day: </b> %{x}<br><b>Total Ridership: </b> %{y:.0f}<br><b>Bus: </b> %{customdata[0]:.0f}<br><b>Rail: </b> %{customdata[1]:.0f}"
+    )
+    return fig_day
+
+
+def daily_trend_figure(series, flagged=None):
+    """WebGL line per downsampled daily series (a dict of line -> Series).
+
+    `flagged` days (see `Anomalies.flagged`) are marked on top of the lines.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    fig_daily = go.Figure([go.Scattergl(x=line_series.index, y=line_series.values, mode='lines', name=line)
+                           for line, line_series in series.items()])
+    if flagged is not None and len(flagged):
+        fig_daily.add_trace(go.Scattergl(
+            x=flagged['date'], y=flagged['ridership'], mode='markers', name='Unusual days',
+            marker=dict(symbol='x', size=8, color='#d62728'),
+            customdata=flagged[['line', 'expected', 'score']].values,
+            hovertemplate="<b>%{customdata[0]}</b> %{x|%d %b %Y}<br>Ridership: %{y:,.0f}"
+                          "<br>Expected: %{customdata[1]:,.0f}<br>Robust z: %{customdata[2]:.1f}<extra></extra>"))
+    fig_daily.update_layout(xaxis_title="Date", yaxis_title="Ridership", height=500,
+                            colorway=px.colors.qualitative.Set2)
+    return fig_daily
+
+
+def correlation_figure(correlations):
+    """Heatmap of a line-by-line correlation matrix."""
+    import plotly.graph_objects as go
+    fig_corr = go.Figure(data=go.Heatmap(
+        z=correlations.values,
+        x=correlations.columns,
+        y=correlations.columns,
+        colorscale='RdBu',
+        colorbar=dict(title='Correlation'),
+        hoverongaps=False,
+        hovertemplate='Correlation: %{z:.2f}<br>X: %{x}<br>Y: %{y}<extra></extra>'))
+
+    fig_corr.update_layout(
+        xaxis_title="Transport Modes",
+        yaxis_title="Transport Modes",
+        height=600,
+        width=800,
+    )
+    return fig_corr
+
+
+def rolling_correlation_figure(rolling_df):
+    """Rolling correlation of one line (columns) with each other line over time."""
+    import plotly.express as px
+    fig_rolling = px.line(rolling_df,
+                          labels={'value': 'Correlation', 'date': 'Date', 'other_line': 'Line'},
+                          color_discrete_sequence=px.colors.qualitative.Set2)
+    fig_rolling.update_layout(yaxis_range=[-1, 1], height=450)
+    return fig_rolling
+
+
+def weekday_weekend_figure(comparison_df):
+    """Grouped bars of weekday and weekend ridership per line."""
+    import plotly.express as px
+    comparison_df_melted = comparison_df.melt(id_vars=['Transport Mode'], value_vars=['Weekday', 'Weekend'],
+                                              var_name='DayType', value_name='Ridership')
+    return px.bar(
+        comparison_df_melted,
+        x='Transport Mode',
+        y='Ridership',
+        color='DayType',
+        color_discrete_map={'Weekday': '#004c8c', 'Weekend': '#eb6060'},
+        labels={'Ridership': 'Ridership', 'Transport Mode': 'Transport Mode'},
+        hover_data={'Transport Mode': True, 'Ridership': True, 'DayType': True}
+    )
+
+
+def day_type_figure(day_type_means):
+    """Grouped bars of the mean daily ridership per line for each day type."""
+    import plotly.express as px
+    melted = day_type_means.reset_index().melt(id_vars='line', var_name='Day Type', value_name='Ridership')
+    return px.bar(
+        melted,
+        x='line',
+        y='Ridership',
+        color='Day Type',
+        barmode='group',
+        labels={'Ridership': 'Average Daily Ridership', 'line': 'Transport Mode'},
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+
+
+def monthly_mode_figure(ridership_comparison):
+    """Stacked bars of average ridership per calendar month and mode."""
+    import plotly.express as px
+    fig_bar = px.bar(ridership_comparison,
+                     x='month',
+                     y=REGISTRY.groups('mode'),
+                     labels={'value': 'Average Ridership', 'month': 'Month'},
+                     color_discrete_sequence=px.colors.qualitative.Set1)
+
+    fig_bar.update_layout(
+        barmode='stack',
+        xaxis_title="Month",
+        yaxis_title="Ridership",
+        height=600,
+        width=900
+    )
+    fig_bar.update_xaxes(tickmode='array',
+                         tickvals=ridership_comparison.index,
+                         ticktext=MONTH_LABELS)
+    return fig_bar
+
+
+def yearly_mode_figure(ridership_comparison_yearly):
+    """Grouped bars of average monthly ridership per year and mode."""
+    import plotly.express as px
+    fig_bar_yearly = px.bar(ridership_comparison_yearly,
+                            x='year',
+                            y=REGISTRY.groups('mode'),
+                            labels={'value': 'Average Ridership', 'year': 'Year'},
+                            color_discrete_sequence=px.colors.qualitative.Set1)
+
+    fig_bar_yearly.update_layout(
+        barmode='group',
+        xaxis_title="Year",
+        yaxis_title="Ridership",
+        height=600,
+        width=900
+    )
+    return fig_bar_yearly
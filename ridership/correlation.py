@@ -0,0 +1,78 @@
+"""Line-by-line correlations of daily ridership.
+
+The full correlation matrix is computed once per data version and any line
+selection is served as a slice of it. Rolling correlations for every pair of
+lines come from one vectorized pass over cumulative sums instead of a
+`rolling().corr()` call per pair.
+"""
+import numpy as np
+import pandas as pd
+
+# Default window (days) of the rolling correlation view
+ROLLING_WINDOW = 90
+
+
+def correlation_matrix(df, lines):
+    """Pearson correlation of every pair of `lines`, using pairwise-complete days."""
+    return df[lines].astype('float64').corr()
+
+
+def select_correlations(matrix, lines):
+    """The sub-matrix of `matrix` for `lines`; equal to correlating just those lines."""
+    return matrix.loc[lines, lines]
+
+
+def _window_sums(values, window):
+    # Sum of each column over the trailing `window` rows, as differences of cumulative sums
+    cumulative = np.cumsum(values, axis=0)
+    sums = cumulative.copy()
+    sums[window:] -= cumulative[:-window]
+    return sums
+
+
+def rolling_correlation(df, lines, window=ROLLING_WINDOW, min_periods=None):
+    """Trailing-window Pearson correlation between every pair of `lines`.
+
+    Returns a frame indexed by date with (line, other_line) column pairs in
+    both orders, so `result[line]` holds the correlation of `line` with every
+    other line. Like pandas, a pair only uses days on which both lines have a
+    reading, and windows with fewer than `min_periods` such days (default
+    `window`) are NaN.
+    """
+    min_periods = window if min_periods is None else min_periods
+    values = df[lines].to_numpy(dtype='float64', na_value=np.nan)
+    valid = ~np.isnan(values)
+
+    # Standardize each line first: correlation is unchanged and the running
+    # sums of squares stay small enough to avoid cancellation
+    mean = np.nanmean(values, axis=0)
+    std = np.nanstd(values, axis=0)
+    std[~(std > 0)] = 1.0
+    x = np.where(valid, (values - mean) / std, 0.0)
+
+    left, right = np.triu_indices(len(lines), k=1)
+    both = (valid[:, left] & valid[:, right]).astype('float64')
+    xl = x[:, left] * both
+    xr = x[:, right] * both
+
+    n = _window_sums(both, window)
+    sl = _window_sums(xl, window)
+    sr = _window_sums(xr, window)
+    sll = _window_sums(xl * xl, window)
+    srr = _window_sums(xr * xr, window)
+    slr = _window_sums(xl * xr, window)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = slr - sl * sr / n
+        var_l = sll - sl * sl / n
+        var_r = srr - sr * sr / n
+        corr = cov / np.sqrt(var_l * var_r)
+    corr[(n < min_periods) | ~(var_l > 0) | ~(var_r > 0)] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+
+    names = np.asarray(lines)
+    columns = pd.MultiIndex.from_arrays([np.concatenate([names[left], names[right]]),
+                                         np.concatenate([names[right], names[left]])],
+                                        names=['line', 'other_line'])
+    return pd.DataFrame(np.concatenate([corr, corr], axis=1),
+                        index=pd.DatetimeIndex(df['date']), columns=columns)
@@ -0,0 +1,226 @@
+"""Aggregate cube shared by the dashboard KPIs and charts.
+
+The raw daily table is grouped once per data version into cells keyed by
+(year, month, day_of_week, is_weekend). Every yearly, monthly and day-of-week
+view is then a cheap roll-up of those few hundred cells instead of a group-by
+over all the daily rows.
+
+When the source only grows (one new row per day, with occasional corrections
+to recent days), `update_cube` folds the change into an existing cube by
+re-aggregating just the affected months.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ridership.registry import REGISTRY
+from ridership.table import as_table
+
+# Ridership columns of the headline dataset, as listed in the line registry
+LINE_COLUMNS = REGISTRY.lines
+# Groups of the registry's `category` grouping, each with a `<group>_total` table column
+CATEGORIES = REGISTRY.groups('category')
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+CUBE_LEVELS = ['year', 'month', 'day_of_week', 'is_weekend']
+
+# How far back (days) an incremental update looks for corrected rows
+REVISION_DAYS = 31
+
+
+@dataclass(frozen=True)
+class RidershipCube:
+    """Per-line sums and non-null counts for every (year, month, weekday) cell.
+
+    `day_of_week` is stored as 0 (Monday) to 6 (Sunday). `subtotals` holds
+    the sums of the table's per-category subtotals (`bus_total`, ...) for
+    every cell, one column per category. `daily` holds the
+    total ridership across all lines for each date, `row_hashes` a fingerprint
+    of each source row used to spot corrections, `monthly_totals` the total
+    per (year, month) and `peak` the (value, date) of the busiest day.
+    """
+    lines: list
+    sums: pd.DataFrame
+    counts: pd.DataFrame
+    n_days: pd.Series
+    subtotals: pd.DataFrame
+    daily: pd.Series
+    row_hashes: pd.Series
+    monthly_totals: pd.Series
+    peak: tuple
+
+    def sum_by(self, *levels):
+        """Per-line ridership sums rolled up to `levels`."""
+        return self.sums.groupby(level=list(levels)).sum()
+
+    def count_by(self, *levels):
+        """Per-line number of days with a reading, rolled up to `levels`."""
+        return self.counts.groupby(level=list(levels)).sum()
+
+    def mean_by(self, *levels):
+        """Per-line mean daily ridership, ignoring missing readings like `DataFrame.mean`."""
+        return self.sum_by(*levels) / self.count_by(*levels)
+
+    def days_by(self, *levels):
+        """Number of days covered by each group."""
+        return self.n_days.groupby(level=list(levels)).sum()
+
+    def levels(self, level):
+        """Sorted distinct values of one cube level."""
+        return self.sums.index.unique(level=level).sort_values()
+
+    def growth_rate(self):
+        """Month-over-month growth of the total ridership, in percent."""
+        return self.monthly_totals.pct_change() * 100
+
+    @property
+    def last_date(self):
+        return self.daily.index.max()
+
+    def memory_usage(self):
+        """Bytes held by the cube's frames and series."""
+        parts = [self.sums, self.counts, self.n_days, self.subtotals, self.daily, self.row_hashes,
+                 self.monthly_totals]
+        return sum(int(np.sum(part.memory_usage(index=True, deep=True))) for part in parts)
+
+
+def _peak(daily):
+    return daily.max(), daily.idxmax()
+
+
+def build_cube(df, lines=LINE_COLUMNS):
+    """Group the daily table into a `RidershipCube` in a single pass.
+
+    `df` is a frame or a `RidershipTable`, whose calendar fields, values and
+    row totals are then reused rather than derived again.
+    """
+    table = as_table(df, lines)
+    lines = list(lines)
+    keys = [table.column(level) for level in CUBE_LEVELS]
+
+    values = pd.DataFrame(table.line_values(lines), columns=lines)
+    grouped = values.groupby(keys, sort=True)
+    sums = grouped.sum().rename_axis(CUBE_LEVELS)
+    counts = grouped.count().rename_axis(CUBE_LEVELS)
+    n_days = grouped.size().rename_axis(CUBE_LEVELS).rename('n_days')
+    subtotals = pd.DataFrame({group: table.column(f'{group}_total', lines) for group in CATEGORIES},
+                             columns=CATEGORIES)
+    subtotals = subtotals.groupby(keys, sort=True).sum().rename_axis(CUBE_LEVELS)
+
+    dates = table.dates
+    daily = pd.Series(table.column('total', lines), index=dates, name='total')
+    row_hashes = pd.Series(table.column('row_hash', lines), index=dates, name='row_hash')
+    monthly_totals = sums.sum(axis=1).groupby(level=['year', 'month']).sum()
+    return RidershipCube(lines=lines, sums=sums, counts=counts, n_days=n_days, subtotals=subtotals,
+                         daily=daily, row_hashes=row_hashes, monthly_totals=monthly_totals,
+                         peak=_peak(daily) if len(daily) else (np.nan, pd.NaT))
+
+
+def changed_dates(cube, df, revision_days=REVISION_DAYS):
+    """Dates of `df` that are new, corrected or removed relative to `cube`.
+
+    Only rows dated within `revision_days` of the cube's last date are
+    compared, so the cost tracks the size of the change rather than the
+    length of the history. `df` must be sorted by date.
+    """
+    window_start = cube.last_date - pd.Timedelta(days=revision_days)
+    recent = as_table(df.iloc[df['date'].searchsorted(window_start):], cube.lines)
+    # The same fingerprint the cube's row hashes were taken with
+    hashes = pd.Series(recent.column('row_hash', cube.lines), index=recent.dates)
+
+    stored = cube.row_hashes.iloc[cube.row_hashes.index.searchsorted(window_start):]
+    known = stored.reindex(hashes.index, fill_value=0)
+    changed = hashes.index[hashes.to_numpy() != known.to_numpy()]
+    removed = stored.index.difference(hashes.index)
+    return changed.union(removed)
+
+
+def update_cube(cube, df, revision_days=REVISION_DAYS, lines=None):
+    """Fold new and corrected rows of `df` into `cube` and return the new cube.
+
+    Every month touched by a change is re-aggregated from `df`, together with
+    the months after it; older cells are reused as they are. Corrections
+    older than `revision_days` are not detected and need a full `build_cube`,
+    as does a cube of other `lines` than asked for (by default its own).
+    """
+    lines = list(cube.lines) if lines is None else list(lines)
+    if list(cube.lines) != lines or not set(lines).issubset(df.columns) or not len(cube.daily):
+        return build_cube(df, lines)
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date')
+
+    changed = changed_dates(cube, df, revision_days)
+    if changed.empty:
+        return cube
+
+    first = changed.min()
+    # Floored with numpy rather than built from (year, month), which only
+    # works up to year 9999
+    month_start = pd.Timestamp(first.to_datetime64().astype('datetime64[M]'))
+    part = build_cube(df.iloc[df['date'].searchsorted(month_start):], cube.lines)
+
+    # Everything is sorted by date, so the cells kept are a prefix of each index
+    keep_cells = slice(cube.sums.index.get_slice_bound((first.year, first.month), side='left'))
+    keep_months = slice(cube.monthly_totals.index.get_slice_bound((first.year, first.month), side='left'))
+    keep_days = slice(cube.daily.index.searchsorted(month_start))
+
+    daily = pd.concat([cube.daily.iloc[keep_days], part.daily])
+    old_value, old_date = cube.peak
+    if old_date >= month_start:
+        # The old peak may have been corrected away, so search again
+        peak = _peak(daily)
+    elif len(part.daily) and part.peak[0] > old_value:
+        peak = part.peak
+    else:
+        peak = cube.peak
+
+    return RidershipCube(
+        lines=cube.lines,
+        sums=pd.concat([cube.sums.iloc[keep_cells], part.sums]),
+        counts=pd.concat([cube.counts.iloc[keep_cells], part.counts]),
+        n_days=pd.concat([cube.n_days.iloc[keep_cells], part.n_days]),
+        subtotals=pd.concat([cube.subtotals.iloc[keep_cells], part.subtotals]),
+        daily=daily,
+        row_hashes=pd.concat([cube.row_hashes.iloc[keep_days], part.row_hashes]),
+        monthly_totals=pd.concat([cube.monthly_totals.iloc[keep_months], part.monthly_totals]),
+        peak=peak,
+    )
+
+
+class IncrementalCube:
+    """Keeps the latest cube and updates it in place of a rebuild on each new version.
+
+    Safe to share between sessions: concurrent calls are serialized.
+    """
+
+    def __init__(self, lines=LINE_COLUMNS, revision_days=REVISION_DAYS):
+        self.lines = list(lines)
+        self.revision_days = revision_days
+        self.cube = None
+        self.version = None
+        self._lock = threading.Lock()
+
+    def seed(self, cube, version):
+        """Start from a previously saved cube, unless one has been ingested already.
+
+        A cube of other lines (saved under an older line registry) is ignored.
+        """
+        with self._lock:
+            if self.cube is None and list(cube.lines) == self.lines:
+                self.cube, self.version = cube, version
+
+    def ingest(self, df, version=None):
+        """Return the cube for `df` (a frame or `RidershipTable`), reusing the previously ingested one."""
+        with self._lock:
+            current = self.cube is not None and list(self.cube.lines) == self.lines
+            if current and version is not None and version == self.version:
+                return self.cube
+            table = as_table(df, self.lines)
+            if not current:
+                self.cube = build_cube(table, self.lines)
+            else:
+                self.cube = update_cube(self.cube, table.df, self.revision_days, self.lines)
+            self.version = version
+            return self.cube
@@ -0,0 +1,229 @@
+"""Data access for the ridership headline dataset.
+
+The parquet file is kept as a versioned copy on disk. Before downloading, the
+copy is revalidated against the source with ETag/Last-Modified, and when the
+source can't be reached the last good copy (or a configured local file) is used.
+A download that isn't a readable parquet file (an error page from a proxy or
+captive portal, say) is never cached.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Source and cache locations, overridable for offline/staging deployments
+URL_DATA = os.environ.get('RIDERSHIP_DATA_URL',
+                          'https://storage.data.gov.my/transportation/ridership_headline.parquet')
+LOCAL_DATA_PATH = os.environ.get('RIDERSHIP_LOCAL_PATH') or None
+CACHE_DIR = Path(os.environ.get('RIDERSHIP_CACHE_DIR',
+                                Path.home() / '.cache' / 'ridership_dashboard'))
+REQUEST_TIMEOUT = float(os.environ.get('RIDERSHIP_REQUEST_TIMEOUT', 10))
+KEEP_VERSIONS = 3
+
+_META_FILE = 'meta.json'
+
+# Smallest-first unsigned types used by `compact_ridership`, with their nullable twins
+_UNSIGNED_DTYPES = [(np.uint8, 'UInt8'), (np.uint16, 'UInt16'), (np.uint32, 'UInt32'),
+                    (np.uint64, 'UInt64')]
+
+
+def content_version(data):
+    """Short content hash used as the data version of a parquet file."""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _read_meta(cache_dir):
+    try:
+        return json.loads((cache_dir / _META_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_atomic(path, data):
+    """Write `data` to `path` so readers never see a partial file."""
+    # Write next to the target and rename over it
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _cached_copy(cache_dir, meta):
+    """Return (path, version) of the current cached copy, or None."""
+    version = meta.get('version')
+    if version is None:
+        return None
+    path = cache_dir / meta['file']
+    return (path, version) if path.exists() else None
+
+
+def _prune(cache_dir, meta):
+    versions = meta.get('history', [])
+    for old in versions[KEEP_VERSIONS:]:
+        (cache_dir / old).unlink(missing_ok=True)
+    meta['history'] = versions[:KEEP_VERSIONS]
+
+
+class InvalidParquetError(ValueError):
+    """The source returned something that is not a readable parquet file."""
+
+
+def _check_parquet(data, url):
+    # Reading the footer is enough to reject HTML and truncated downloads
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    try:
+        pq.read_metadata(pa.BufferReader(data))
+    except (pa.ArrowException, OSError, ValueError) as exc:
+        raise InvalidParquetError(f'{url} did not return a parquet file ({exc})') from exc
+
+
+def fetch_parquet(url=URL_DATA, cache_dir=CACHE_DIR, timeout=REQUEST_TIMEOUT):
+    """Make sure the latest copy of `url` is cached and return (path, version).
+
+    A conditional request is sent when a copy already exists, so an unchanged
+    file costs one round trip and no download. Network errors, and responses
+    that are not parquet files (`InvalidParquetError`), fall back to the
+    cached copy; they are only raised when nothing has been cached yet.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    meta = _read_meta(cache_dir)
+    cached = _cached_copy(cache_dir, meta) if meta.get('url') == url else None
+
+    request = urllib.request.Request(url)
+    if cached is not None:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read()
+            headers = response.headers
+        _check_parquet(data, url)
+    except (OSError, InvalidParquetError):
+        # HTTPError (including 304 Not Modified) and URLError are both OSErrors
+        if cached is not None:
+            return cached
+        raise
+
+    version = content_version(data)
+    filename = f'ridership_headline-{version}.parquet'
+    path = cache_dir / filename
+    if not path.exists():
+        write_atomic(path, data)
+
+    history = [name for name in meta.get('history', []) if name != filename]
+    meta = {
+        'url': url,
+        'file': filename,
+        'version': version,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'history': [filename] + history,
+    }
+    _prune(cache_dir, meta)
+    write_atomic(cache_dir / _META_FILE, json.dumps(meta, indent=2).encode('utf-8'))
+    return path, version
+
+
+def _downcast_unsigned(series):
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    present = values[~np.isnan(values)]
+    if present.size and (present.min() < 0 or not np.array_equal(present, np.floor(present))):
+        # Not a count column, leave it alone
+        return series
+    top = present.max() if present.size else 0
+    for np_dtype, nullable in _UNSIGNED_DTYPES:
+        if top <= np.iinfo(np_dtype).max:
+            break
+    return series.astype(nullable if present.size < values.size else np_dtype)
+
+
+def compact_ridership(df):
+    """Downcast the ridership columns of `df` to the smallest safe unsigned integer type.
+
+    Columns with missing days (lines that opened later) use the nullable
+    `UInt*` types so the gaps stay missing instead of becoming zeros. Columns
+    that are negative or fractional are returned unchanged.
+    """
+    numeric = [column for column in df.columns
+               if column != 'date' and pd.api.types.is_numeric_dtype(df[column])]
+    return df.assign(**{column: _downcast_unsigned(df[column]) for column in numeric})
+
+
+def memory_usage(df):
+    """Bytes held by `df`, including its index."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def date_bounds(dates, start=None, end=None):
+    """Positions [lo, hi) of the dates from `start` to `end` (inclusive; None for open).
+
+    `dates` is a sorted date column or `DatetimeIndex`, searched with a binary
+    search; an empty range gives ``lo == hi``.
+    """
+    lo = 0 if start is None else int(dates.searchsorted(pd.Timestamp(start), side='left'))
+    hi = len(dates) if end is None else int(dates.searchsorted(pd.Timestamp(end), side='right'))
+    return lo, max(lo, hi)
+
+
+def select_rows(df, lines=None, start=None, end=None):
+    """The `date` plus `lines` columns of `df` between `start` and `end` (inclusive).
+
+    `df` must be sorted by date; the range is located with `date_bounds` and
+    taken as a positional slice rather than a boolean-mask copy.
+    """
+    lo, hi = date_bounds(df['date'], start, end)
+    rows = df.iloc[lo:hi]
+    return rows if lines is None else rows[['date'] + [line for line in lines if line != 'date']]
+
+
+def read_ridership(path, columns=None, compact=False):
+    """Read a ridership parquet file and parse its date column.
+
+    `columns` prunes the file to just those columns (the date is always kept)
+    and `compact` downcasts the ridership columns with `compact_ridership`.
+    """
+    if columns is not None:
+        columns = ['date'] + [column for column in columns if column != 'date']
+    df = pd.read_parquet(path, columns=columns)
+    if 'date' in df.columns: df['date'] = pd.to_datetime(df['date'])
+    return compact_ridership(df) if compact else df
+
+
+def load_ridership(url=URL_DATA, local_path=LOCAL_DATA_PATH, cache_dir=CACHE_DIR,
+                   columns=None, compact=False):
+    """Load the ridership table and return it with its data version.
+
+    The remote source is tried first (through the on-disk cache). When it can't
+    be reached and nothing is cached, or the copy can't be read, `local_path`
+    is used instead, which lets air-gapped deployments run from a bundled file.
+    An empty `url` skips the network entirely. `columns` and `compact` are
+    passed to `read_ridership`.
+    """
+    if url:
+        try:
+            path, version = fetch_parquet(url, cache_dir)
+            return read_ridership(path, columns, compact), version
+        except (OSError, ValueError):
+            # ValueError covers pyarrow's ArrowInvalid for a corrupt copy
+            if not local_path:
+                raise
+    if not local_path:
+        raise FileNotFoundError('No ridership source configured: set RIDERSHIP_DATA_URL '
+                                'or RIDERSHIP_LOCAL_PATH')
+    data = Path(local_path).read_bytes()
+    return read_ridership(io.BytesIO(data), columns, compact), content_version(data)
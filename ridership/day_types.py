@@ -0,0 +1,184 @@
+"""Day-type flags and ridership splits by day type.
+
+Every date gets a bitmask of the day types it belongs to: weekday or weekend,
+public holiday, school holiday and COVID-19 movement control. Holidays and
+periods are read from ``calendar.toml`` (or the file named by
+``RIDERSHIP_CALENDAR_CONFIG``). A named day type requires some flags and
+excludes others, e.g. a working day is a weekday that is not a public
+holiday. `day_type_split` compares day types with one mask-and-reduce over
+the (days × lines) values: a 0/1 (day types × days) matrix times the values
+gives the totals of every day type at once. Only the dates the calendar
+covers are compared, since a holiday missing from it would count as a
+working day. School holidays may be listed for only part of those dates;
+`school_holiday_gaps` gives the spans they are missing for.
+"""
+import os
+import tomllib
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ridership.data import date_bounds
+
+CALENDAR_PATH = Path(os.environ.get('RIDERSHIP_CALENDAR_CONFIG', Path(__file__).with_name('calendar.toml')))
+
+# Bits of a day's flags
+WEEKDAY = 1
+WEEKEND = 2
+PUBLIC_HOLIDAY = 4
+SCHOOL_HOLIDAY = 8
+MOVEMENT_CONTROL = 16
+
+# {name: (flags required, flags excluded)}
+DAY_TYPES = {
+    'Working day': (WEEKDAY, PUBLIC_HOLIDAY),
+    'Weekend': (WEEKEND, 0),
+    'Public holiday': (PUBLIC_HOLIDAY, 0),
+    'School holiday (working day)': (WEEKDAY | SCHOOL_HOLIDAY, PUBLIC_HOLIDAY),
+    'Movement control': (MOVEMENT_CONTROL, 0),
+}
+
+
+def _day_numbers(dates):
+    # Days since 1970-01-01, as in a table's `day_number` column
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+@dataclass(frozen=True)
+class HolidayCalendar:
+    """Public holidays {date: name} and school-holiday and movement-control periods.
+
+    Periods are lists of (first date, last date, name), both dates inclusive.
+    The lists are complete from `first_date` to `last_date`, except that
+    school holidays are complete only within the (first date, last date)
+    spans of `school_coverage`.
+    """
+    public_holidays: dict
+    school_holidays: list
+    movement_control: list
+    first_date: date
+    last_date: date
+    school_coverage: list
+
+    @staticmethod
+    def _in_periods(days, periods):
+        if not periods:
+            return np.zeros(len(days), dtype=bool)
+        # +1 at each period start and -1 after its end; a day is inside a
+        # period where the running count of the boundaries up to it is positive
+        starts = np.sort(_day_numbers([start for start, _, _ in periods]))
+        ends = np.sort(_day_numbers([end for _, end, _ in periods]) + 1)
+        return (np.searchsorted(starts, days, side='right') - np.searchsorted(ends, days, side='right')) > 0
+
+    def flags(self, days, weekend):
+        """The day-type bitmask of each day, as uint8.
+
+        `days` are day numbers (days since 1970-01-01) and `weekend` the
+        weekend mask, i.e. a table's `day_number` and `is_weekend` columns.
+        """
+        flags = np.where(weekend, WEEKEND, WEEKDAY).astype(np.uint8)
+        flags |= np.isin(days, _day_numbers(list(self.public_holidays))).astype(np.uint8) * PUBLIC_HOLIDAY
+        flags |= self._in_periods(days, self.school_holidays).astype(np.uint8) * SCHOOL_HOLIDAY
+        flags |= self._in_periods(days, self.movement_control).astype(np.uint8) * MOVEMENT_CONTROL
+        return flags
+
+
+def load_calendar(path=CALENDAR_PATH):
+    """Read a `HolidayCalendar` from the TOML file at `path`."""
+    with open(path, 'rb') as fh:
+        config = tomllib.load(fh)
+    public_holidays = {entry['date']: entry.get('name', '') for entry in config.get('public_holiday', [])}
+    school_holidays = [(entry['start'], entry['end'], entry.get('name', ''))
+                       for entry in config.get('school_holiday', [])]
+    movement_control = [(entry['start'], entry['end'], entry.get('name', ''))
+                        for entry in config.get('movement_control', [])]
+    # Without explicit bounds, the calendar covers the years it lists dates in
+    listed = list(public_holidays) + [day for start, end, _ in school_holidays + movement_control
+                                      for day in (start, end)]
+    first_date = config.get('first_date') or date(min(listed).year, 1, 1)
+    last_date = config.get('last_date') or date(max(listed).year, 12, 31)
+    school_coverage = [(entry['start'], entry['end']) for entry in config.get('school_holiday_coverage', [])]
+    return HolidayCalendar(
+        public_holidays=public_holidays,
+        school_holidays=school_holidays,
+        movement_control=movement_control,
+        first_date=first_date,
+        last_date=last_date,
+        school_coverage=sorted(school_coverage) or [(first_date, last_date)])
+
+
+CALENDAR = load_calendar()
+
+
+def day_type_masks(flags, day_types):
+    """(day types × days) boolean matrix of the days in each of `day_types`."""
+    return np.stack([((flags & required) == required) & ((flags & excluded) == 0)
+                     for required, excluded in (DAY_TYPES[name] for name in day_types)])
+
+
+def covered_range(start=None, end=None, calendar=CALENDAR):
+    """The part of `start` to `end` (inclusive; None for open) that `calendar` covers.
+
+    Returns (start, end) as timestamps; `start` is after `end` when none of
+    the range is covered.
+    """
+    first, last = pd.Timestamp(calendar.first_date), pd.Timestamp(calendar.last_date)
+    return (first if start is None else max(pd.Timestamp(start), first),
+            last if end is None else min(pd.Timestamp(end), last))
+
+
+def school_holiday_gaps(start=None, end=None, calendar=CALENDAR):
+    """Spans of the covered part of `start` to `end` that school holidays aren't listed for.
+
+    A list of (first date, last date) timestamps, both inclusive; school
+    holidays within them are counted as ordinary working days.
+    """
+    start, end = covered_range(start, end, calendar)
+    gaps = []
+    for first, last in calendar.school_coverage:
+        if start > end:
+            break
+        first, last = pd.Timestamp(first), pd.Timestamp(last)
+        if first > start:
+            gaps.append((start, min(first - pd.Timedelta(days=1), end)))
+        start = max(start, last + pd.Timedelta(days=1))
+    if start <= end:
+        gaps.append((start, end))
+    return gaps
+
+
+def _covered_masks(table, start, end, day_types):
+    # Positions [lo, hi) of the covered days of the range and their day-type masks
+    lo, hi = date_bounds(table.dates, *covered_range(start, end))
+    return lo, hi, day_type_masks(table.column('day_flags')[lo:hi], day_types)
+
+
+def day_type_days(table, start=None, end=None, day_types=tuple(DAY_TYPES)):
+    """Number of days of each day type from `start` to `end` (inclusive) that the calendar covers."""
+    day_types = list(day_types)
+    _, _, masks = _covered_masks(table, start, end, day_types)
+    return pd.Series(masks.sum(axis=1).astype(np.int64), index=day_types, name='n_days')
+
+
+def day_type_split(table, lines, start=None, end=None, day_types=tuple(DAY_TYPES)):
+    """Mean daily ridership of each line by day type, from `start` to `end` (inclusive).
+
+    `table` is a `RidershipTable`. Only the days the calendar covers are
+    counted (see `covered_range`). Returns the (lines × day types) means,
+    NaN where a line has no reading on any day of a type, and the number of
+    days of each type in the range (as `day_type_days`).
+    """
+    day_types = list(day_types)
+    lo, hi, masks = _covered_masks(table, start, end, day_types)
+    masks = masks.astype(np.float64)
+    present = table.column('present', lines)[lo:hi]
+    values = np.where(present, table.line_values(lines)[lo:hi], 0.0)
+    sums = masks @ values
+    counts = masks @ present
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return (pd.DataFrame(means.T, index=pd.Index(lines, name='line'), columns=day_types),
+            pd.Series(masks.sum(axis=1).astype(np.int64), index=day_types, name='n_days'))
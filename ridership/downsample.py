@@ -0,0 +1,87 @@
+"""Server-side downsampling of daily ridership series for plotting.
+
+Long daily series are reduced to roughly one point per horizontal pixel before
+they are sent to the browser, so the chart payload stays bounded however much
+history there is. Both functions return the indices of the points to keep.
+"""
+import numpy as np
+import pandas as pd
+
+from ridership.data import select_rows
+
+# Points per line sent to the browser; about the pixel width of a wide chart
+TARGET_POINTS = 1200
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of `n_out` points that keep the shape of `y`.
+
+    The first and last points are always kept. Between them, each bucket keeps
+    the point that forms the largest triangle with the point kept in the
+    previous bucket and the mean of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2]
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_out):
+    """Indices of the first and last points and of the minimum and maximum of `y` in each bucket.
+
+    The points between the first and last are split into ``(n_out - 2) // 2``
+    equal buckets, so `n_out` points are kept (one fewer for odd `n_out`).
+    """
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    # Every bucket has at least two points, so its minimum and maximum are two
+    # distinct points even where they are equal
+    inner = np.asarray(y)[1:-1]
+    bucket = np.arange(n - 2) * ((n_out - 2) // 2) // (n - 2)
+    order = np.lexsort((inner, bucket))
+    starts = np.flatnonzero(np.diff(bucket[order], prepend=-1))
+    ends = np.append(starts[1:], n - 2) - 1
+    return np.concatenate([[0], np.sort(np.concatenate([order[starts], order[ends]])) + 1, [n - 1]])
+
+
+DOWNSAMPLERS = {
+    'lttb': lambda x, y, n_out: lttb(x, y, n_out),
+    'minmax': lambda x, y, n_out: minmax(y, n_out),
+}
+
+
+def downsample_lines(df, lines, start=None, end=None, n_out=TARGET_POINTS, method='lttb'):
+    """Downsample each of `lines` between `start` and `end` to at most `n_out` points.
+
+    Missing days are dropped per line before downsampling. Returns a dict of
+    line -> Series indexed by date.
+    """
+    downsample = DOWNSAMPLERS[method]
+    rows = select_rows(df, lines, start, end)
+    dates = rows['date'].to_numpy()
+    days = dates.astype('datetime64[D]').astype('float64')
+
+    series = {}
+    for line in lines:
+        values = rows[line].to_numpy(dtype='float64', na_value=np.nan)
+        present = np.flatnonzero(~np.isnan(values))
+        keep = present[downsample(days[present], values[present], n_out)]
+        series[line] = pd.Series(values[keep], index=pd.DatetimeIndex(dates[keep]), name=line)
+    return series
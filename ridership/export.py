@@ -0,0 +1,96 @@
+"""On-demand exports of the ridership table as CSV, Parquet or Arrow IPC.
+
+Exports are only built when a download is requested, written to disk in
+chunks of `CHUNK_ROWS` rows so the encoder never holds the whole file in
+memory, and cached per data version, format, line selection and date range.
+pyarrow is imported on the first Parquet/Arrow export rather than at startup.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from ridership.data import CACHE_DIR, select_rows
+
+# format -> (label, file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('Arrow IPC', '.arrow', 'application/vnd.apache.arrow.file'),
+}
+EXPORT_DIR = CACHE_DIR / 'exports'
+CHUNK_ROWS = 50_000
+
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _write_csv(df, fh, chunk_rows):
+    for i, chunk in enumerate(iter_chunks(df, chunk_rows)):
+        fh.write(chunk.to_csv(index=False, header=i == 0).encode('utf-8'))
+    if not len(df):
+        fh.write(df.to_csv(index=False).encode('utf-8'))
+
+
+def _write_arrow(df, fh, chunk_rows, writer_factory):
+    import pyarrow as pa
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with writer_factory(fh, schema) as writer:
+        for chunk in iter_chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_export(df, fh, fmt, chunk_rows=CHUNK_ROWS):
+    """Encode `df` into the binary file object `fh`, one chunk of rows at a time."""
+    if fmt == 'csv':
+        _write_csv(df, fh, chunk_rows)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        _write_arrow(df, fh, chunk_rows, pq.ParquetWriter)
+    elif fmt == 'arrow':
+        import pyarrow.ipc
+        _write_arrow(df, fh, chunk_rows, pyarrow.ipc.new_file)
+    else:
+        raise ValueError(f'Unknown export format {fmt!r}, expected one of {list(EXPORT_FORMATS)}')
+
+
+def export_name(fmt, lines=None, start=None, end=None, prefix='ridership_data'):
+    """File name offered to the user for a download."""
+    parts = [prefix]
+    if start is not None or end is not None:
+        parts.append(f"{start or 'start'}_{end or 'end'}".replace('-', ''))
+    if lines is not None:
+        parts.append(f'{len(lines)}_lines')
+    return '_'.join(parts) + EXPORT_FORMATS[fmt][1]
+
+
+def export_path(df, fmt, data_version, lines=None, start=None, end=None, export_dir=EXPORT_DIR):
+    """Path of the cached export of `df`, building it on the first request.
+
+    Files of other data versions are removed when a new export is written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format {fmt!r}, expected one of {list(EXPORT_FORMATS)}')
+    key = repr((fmt, None if lines is None else list(lines), str(start), str(end)))
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+    export_dir = Path(export_dir)
+    path = export_dir / f'{data_version}-{digest}{EXPORT_FORMATS[fmt][1]}'
+    if path.exists():
+        return path
+
+    export_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=export_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write_export(select_rows(df, lines, start, end), fh, fmt)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    for old in export_dir.iterdir():
+        if not old.name.startswith(f'{data_version}-') and old.suffix != '.tmp':
+            old.unlink(missing_ok=True)
+    return path
@@ -0,0 +1,128 @@
+"""Process-wide LRU cache of built Plotly figures.
+
+Most reruns ask for figures that were already built for another session: the
+same chart for the same lines, date range and data version. Figures are
+cached under such a key and evicted least-recently-used once their total
+serialized size exceeds a byte budget. A cached figure is only ever read (by
+``st.plotly_chart``, which serializes a copy), so sharing it between sessions
+is safe.
+
+The serialized size is estimated from the figure's data arrays rather than
+measured with ``fig.to_json()``, which would serialize every figure once
+more on top of the serialization for each render.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Serialized bytes of figures kept in memory
+MAX_BYTES = int(os.environ.get('RIDERSHIP_FIGURE_CACHE_BYTES', 64 * 1024 ** 2))
+
+# Approximate JSON bytes of a figure's layout (with its template) and of a
+# trace's styling, on top of the data arrays
+LAYOUT_BYTES = 8 * 1024
+TRACE_BYTES = 512
+# Trace properties holding one value per point
+_ARRAY_PROPERTIES = ('x', 'y', 'z', 'customdata', 'text', 'hovertext')
+
+
+def _array_bytes(value):
+    array = np.asarray(value)
+    if array.dtype.kind in 'biuf':
+        # Numeric arrays are sent as base64-encoded typed arrays
+        return array.nbytes * 4 // 3
+    if array.dtype.kind == 'M':
+        # ISO timestamps, quoted, e.g. "2024-01-31T00:00:00"
+        return array.size * 24
+    return sum(len(str(item)) + 3 for item in array.ravel())
+
+
+def estimate_size(fig):
+    """Approximate size of ``fig.to_json()`` in bytes, from its traces' data arrays."""
+    size = LAYOUT_BYTES
+    for trace in fig.data:
+        size += TRACE_BYTES
+        for name in _ARRAY_PROPERTIES:
+            value = trace[name] if name in trace else None
+            if value is not None and not isinstance(value, str):
+                size += _array_bytes(value)
+    return size
+
+
+class FigureCache:
+    """Thread-safe LRU of figures bounded by the (estimated) size of their JSON specs."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_build(self, key, build):
+        """The figure cached under `key`, or ``build()``'s result, cached.
+
+        `build` runs outside the lock, so a slow figure doesn't block other
+        sessions; two sessions missing the same key at once both build it.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        fig = build()
+        size = estimate_size(fig)
+        with self._lock:
+            if size > self.max_bytes:
+                return fig
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = (fig, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Counters and occupancy, e.g. for the debug panel."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def prometheus_text(self):
+        """The counters in the Prometheus text exposition format."""
+        stats = self.stats()
+        return '\n'.join([
+            '# HELP ridership_figure_cache_hits_total Figures served from the cache.',
+            '# TYPE ridership_figure_cache_hits_total counter',
+            f'ridership_figure_cache_hits_total {stats["hits"]}',
+            '# HELP ridership_figure_cache_misses_total Figures built on a cache miss.',
+            '# TYPE ridership_figure_cache_misses_total counter',
+            f'ridership_figure_cache_misses_total {stats["misses"]}',
+            '# HELP ridership_figure_cache_evictions_total Figures evicted to stay within the byte budget.',
+            '# TYPE ridership_figure_cache_evictions_total counter',
+            f'ridership_figure_cache_evictions_total {stats["evictions"]}',
+            '# HELP ridership_figure_cache_bytes Serialized size of the cached figures.',
+            '# TYPE ridership_figure_cache_bytes gauge',
+            f'ridership_figure_cache_bytes {stats["bytes"]}',
+        ]) + '\n'
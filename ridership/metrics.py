@@ -0,0 +1,161 @@
+"""Timing and memory instrumentation for the dashboard's sections.
+
+Each section of a script run is wrapped in `SectionMetrics.section(name)`,
+which records its wall time and the change in the process's resident memory.
+Measurements are kept in a bounded window per section for the p50/p95 shown in
+the debug panel, appended as JSON lines to ``metrics.jsonl`` and summarised in
+``metrics.prom``, a Prometheus text-format snapshot that a textfile collector
+or sidecar can scrape.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ridership.data import CACHE_DIR, write_atomic
+
+METRICS_DIR = Path(os.environ.get('RIDERSHIP_METRICS_DIR', CACHE_DIR / 'metrics'))
+
+# Measurements kept per section for the latency quantiles
+WINDOW = 1000
+QUANTILES = (0.5, 0.95)
+
+# The JSON lines log is rotated to metrics.jsonl.1 beyond this size
+MAX_LOG_BYTES = 64 * 1024 ** 2
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where it isn't available."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class SectionMetrics:
+    """Thread-safe per-section timings, shared by every session of the process."""
+
+    def __init__(self, metrics_dir=METRICS_DIR, window=WINDOW):
+        self.metrics_dir = Path(metrics_dir)
+        self.window = window
+        self._seconds = {}
+        self._rss_delta = {}
+        self._count = {}
+        self._sum = {}
+        self._pending = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def add_collector(self, collect):
+        """Append the exposition text returned by `collect()` to `prometheus_text`."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    @property
+    def log_path(self):
+        return self.metrics_dir / 'metrics.jsonl'
+
+    @property
+    def prometheus_path(self):
+        return self.metrics_dir / 'metrics.prom'
+
+    @contextmanager
+    def section(self, name, **fields):
+        """Time the body of the ``with`` block as section `name`.
+
+        Extra `fields` (e.g. the data version) are written to the JSON lines
+        log only, keeping the Prometheus label set small.
+        """
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = rss_bytes()
+            rss_delta = None if rss_before is None or rss_after is None else rss_after - rss_before
+            self.record(name, seconds, rss_after, rss_delta, **fields)
+
+    def record(self, name, seconds, rss=None, rss_delta=None, **fields):
+        with self._lock:
+            if name not in self._seconds:
+                self._seconds[name] = deque(maxlen=self.window)
+                self._count[name] = 0
+                self._sum[name] = 0.0
+            self._seconds[name].append(seconds)
+            self._count[name] += 1
+            self._sum[name] += seconds
+            if rss_delta is not None:
+                self._rss_delta[name] = rss_delta
+            self._pending.append({'ts': time.time(), 'pid': os.getpid(), 'section': name,
+                                  'seconds': round(seconds, 6), 'rss_bytes': rss,
+                                  'rss_delta_bytes': rss_delta, **fields})
+
+    def summary(self):
+        """Per-section count and latency quantiles (ms), slowest p95 first."""
+        with self._lock:
+            rows = []
+            for name, samples in self._seconds.items():
+                values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+                p50, p95 = np.quantile(values, QUANTILES) * 1e3
+                rows.append({'section': name, 'count': self._count[name], 'p50_ms': p50, 'p95_ms': p95,
+                             'last_ms': values[-1] * 1e3, 'rss_delta_mib': self._rss_delta.get(name, 0) / 1024 ** 2})
+        columns = ['section', 'count', 'p50_ms', 'p95_ms', 'last_ms', 'rss_delta_mib']
+        return pd.DataFrame(rows, columns=columns).sort_values('p95_ms', ascending=False, ignore_index=True)
+
+    def prometheus_text(self):
+        """The current measurements in the Prometheus text exposition format."""
+        lines = ['# HELP ridership_section_seconds Wall time of dashboard sections.',
+                 '# TYPE ridership_section_seconds summary']
+        with self._lock:
+            for name, samples in sorted(self._seconds.items()):
+                section = _label(name)
+                values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+                for q, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                    lines.append(f'ridership_section_seconds{{section="{section}",quantile="{q}"}} {value:.6g}')
+                lines.append(f'ridership_section_seconds_sum{{section="{section}"}} {self._sum[name]:.6g}')
+                lines.append(f'ridership_section_seconds_count{{section="{section}"}} {self._count[name]}')
+            lines += ['# HELP ridership_section_rss_delta_bytes Change in resident memory over the last run of a section.',
+                      '# TYPE ridership_section_rss_delta_bytes gauge']
+            for name, delta in sorted(self._rss_delta.items()):
+                lines.append(f'ridership_section_rss_delta_bytes{{section="{_label(name)}"}} {delta}')
+        rss = rss_bytes()
+        if rss is not None:
+            lines += ['# HELP ridership_process_resident_memory_bytes Resident memory of the dashboard process.',
+                      '# TYPE ridership_process_resident_memory_bytes gauge',
+                      f'ridership_process_resident_memory_bytes {rss}']
+        text = '\n'.join(lines) + '\n'
+        for collect in list(self._collectors):
+            text += collect()
+        return text
+
+    def flush(self):
+        """Append pending measurements to the JSON lines log and rewrite the Prometheus snapshot.
+
+        Write errors are ignored: instrumentation must never break the page.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            self.metrics_dir.mkdir(parents=True, exist_ok=True)
+            if pending:
+                if self.log_path.exists() and self.log_path.stat().st_size > MAX_LOG_BYTES:
+                    os.replace(self.log_path, self.log_path.with_name(self.log_path.name + '.1'))
+                with open(self.log_path, 'a', encoding='utf-8') as fh:
+                    fh.writelines(json.dumps(record) + '\n' for record in pending)
+            write_atomic(self.prometheus_path, self.prometheus_text().encode())
+        except OSError:
+            pass
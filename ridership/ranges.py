@@ -0,0 +1,139 @@
+"""Date-range queries over the daily table from prefix sums.
+
+`DateRangeIndex` is built once per data version. A date range is located with
+a binary search on the sorted dates; per-line totals and counts over it are
+differences of cumulative sums, and the busiest day comes from a sparse table
+of range maxima. `DateRangeIndex.cube` assembles a `RidershipCube` for any
+range from those arrays without touching the daily rows, so every KPI and
+chart computed from a cube can be filtered to the range.
+"""
+import numpy as np
+import pandas as pd
+
+from ridership.cube import CATEGORIES, CUBE_LEVELS, LINE_COLUMNS, RidershipCube
+from ridership.data import date_bounds
+from ridership.table import as_table
+
+
+def _prefix(values):
+    # Cumulative sums along axis 0 with a leading zero row, so [lo, hi) sums are prefix[hi] - prefix[lo]
+    prefix = np.zeros((len(values) + 1,) + values.shape[1:], dtype=values.dtype)
+    np.cumsum(values, axis=0, out=prefix[1:])
+    return prefix
+
+
+def sparse_table(values):
+    """Levels of positions of the (first) maximum of `values` over windows of 2**k."""
+    levels = [np.arange(len(values))]
+    width = 1
+    while 2 * width <= len(values):
+        prev = levels[-1]
+        left, right = prev[:len(prev) - width], prev[width:]
+        levels.append(np.where(values[right] > values[left], right, left))
+        width *= 2
+    return levels
+
+
+def range_argmax(values, table, lo, hi):
+    """Position of the first maximum of ``values[lo:hi]`` in O(1) with a `sparse_table`."""
+    k = (hi - lo).bit_length() - 1
+    left, right = table[k][lo], table[k][hi - (1 << k)]
+    return right if values[right] > values[left] else left
+
+
+class DateRangeIndex:
+    """Prefix sums of the daily per-line ridership for fast date-range queries.
+
+    `df` is a frame or a `RidershipTable`, sorted by date as `load_ridership`
+    returns it. Cumulative sums are kept per weekday (the days of each
+    weekday, in date order), so the (year, month, weekday) cells of any range
+    are a handful of lookups.
+    """
+
+    def __init__(self, df, lines=LINE_COLUMNS):
+        table = as_table(df, lines)
+        self.lines = list(lines)
+        self.dates = table.dates
+        present = table.column('present', self.lines)
+        values = np.where(present, table.line_values(self.lines), 0.0)
+
+        day_of_week = table.column('day_of_week')
+        self._weekday_positions = [np.flatnonzero(day_of_week == day) for day in range(7)]
+        # One block per weekday, each led by its own zero row
+        offsets = np.cumsum([0] + [len(positions) + 1 for positions in self._weekday_positions])
+        self._weekday_offsets = offsets[:-1]
+        self._sums = np.concatenate([_prefix(values[positions]) for positions in self._weekday_positions])
+        self._counts = np.concatenate([_prefix(present[positions].astype(np.int64))
+                                       for positions in self._weekday_positions])
+        subtotals = np.column_stack([table.column(f'{group}_total', self.lines) for group in CATEGORIES])
+        self._subtotals = np.concatenate([_prefix(subtotals[positions]) for positions in self._weekday_positions])
+
+        month_keys = table.column('month_key')
+        self._month_starts = np.flatnonzero(np.diff(month_keys, prepend=-1))
+        self._month_keys = month_keys[self._month_starts]
+
+        self._daily = table.column('total', self.lines)
+        self._peak_table = sparse_table(self._daily)
+        self._row_hashes = pd.Series(table.column('row_hash', self.lines), index=self.dates, name='row_hash')
+
+    @property
+    def first_date(self):
+        return self.dates[0]
+
+    @property
+    def last_date(self):
+        return self.dates[-1]
+
+    def bounds(self, start=None, end=None):
+        """Positions [lo, hi) of the days from `start` to `end` (inclusive; None for open)."""
+        return date_bounds(self.dates, start, end)
+
+    def peak(self, start=None, end=None):
+        """(total ridership, date) of the busiest day in the range."""
+        lo, hi = self.bounds(start, end)
+        if lo == hi:
+            return np.nan, pd.NaT
+        position = range_argmax(self._daily, self._peak_table, lo, hi)
+        return self._daily[position], self.dates[position]
+
+    def _cells(self, lo, hi):
+        # Month boundaries inside [lo, hi), clipped to it
+        first = np.searchsorted(self._month_starts, lo, side='right') - 1
+        last = np.searchsorted(self._month_starts, hi, side='left')
+        edges = np.append(np.clip(self._month_starts[first:last], lo, hi), hi)
+        edges[0] = lo
+
+        sums, counts, subtotals, n_days = [], [], [], []
+        for day, positions in enumerate(self._weekday_positions):
+            rows = self._weekday_offsets[day] + np.searchsorted(positions, edges)
+            sums.append(self._sums[rows[1:]] - self._sums[rows[:-1]])
+            counts.append(self._counts[rows[1:]] - self._counts[rows[:-1]])
+            subtotals.append(self._subtotals[rows[1:]] - self._subtotals[rows[:-1]])
+            n_days.append(np.diff(rows))
+        # (months, weekdays, lines) in cube cell order
+        return (np.stack(sums, axis=1), np.stack(counts, axis=1), np.stack(subtotals, axis=1),
+                np.stack(n_days, axis=1), self._month_keys[first:last])
+
+    def cube(self, start=None, end=None):
+        """The `RidershipCube` of the days from `start` to `end` (inclusive)."""
+        lo, hi = self.bounds(start, end)
+        if lo == hi:
+            raise ValueError(f'no data between {start} and {end}')
+        sums, counts, subtotals, n_days, month_keys = self._cells(lo, hi)
+        n_months, n_lines = len(month_keys), len(self.lines)
+        day_of_week = np.tile(np.arange(7, dtype=np.int8), n_months)
+        keep = n_days.ravel() > 0
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(month_keys // 12, 7).astype(np.int32)[keep],
+             np.repeat(month_keys % 12 + 1, 7).astype(np.int8)[keep],
+             day_of_week[keep], (day_of_week >= 5)[keep]], names=CUBE_LEVELS)
+
+        sums = pd.DataFrame(sums.reshape(-1, n_lines)[keep], index=index, columns=self.lines)
+        counts = pd.DataFrame(counts.reshape(-1, n_lines)[keep], index=index, columns=self.lines)
+        n_days = pd.Series(n_days.ravel()[keep], index=index, name='n_days')
+        subtotals = pd.DataFrame(subtotals.reshape(-1, len(CATEGORIES))[keep], index=index, columns=CATEGORIES)
+        daily = pd.Series(self._daily[lo:hi], index=self.dates[lo:hi], name='total')
+        monthly_totals = sums.sum(axis=1).groupby(level=['year', 'month']).sum()
+        return RidershipCube(lines=list(self.lines), sums=sums, counts=counts, n_days=n_days,
+                             subtotals=subtotals, daily=daily, row_hashes=self._row_hashes.iloc[lo:hi], monthly_totals=monthly_totals,
+                             peak=self.peak(start, end))
@@ -0,0 +1,127 @@
+"""Background refresh of the dataset, off the request path.
+
+`DataRefresher` holds the last good `Dataset` (the read-only table, its
+version and its aggregate cube) and revalidates it against the source from a daemon thread.
+A new version is loaded and aggregated in that thread and swapped in with a
+single reference assignment, so a page run reads either the old dataset or
+the new one in full, never a mix, and never waits on the network once the
+first version is loaded. A failed refresh is recorded and the previous
+dataset keeps being served.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from ridership.cube import LINE_COLUMNS, IncrementalCube, RidershipCube
+from ridership.table import RidershipTable
+
+logger = logging.getLogger(__name__)
+
+# Seconds between revalidations of the source
+REFRESH_INTERVAL = float(os.environ.get('RIDERSHIP_REFRESH_INTERVAL', 15 * 60))
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """One version of the daily table with its cube; `loaded_at` is a Unix time."""
+    table: RidershipTable
+    version: str
+    cube: RidershipCube
+    loaded_at: float
+
+    @property
+    def df(self):
+        """The daily table as a frame (a copy-on-write copy, see `RidershipTable.df`)."""
+        return self.table.df
+
+
+class DataRefresher:
+    """Stale-while-revalidate holder of the current `Dataset`.
+
+    `load` returns ``(df, version)``, typically through the on-disk cache so
+    an unchanged source costs one conditional request. `on_refresh` is called
+    with each new `Dataset` from the refreshing thread, once it is served; an
+    error from it (e.g. saving the snapshot) is logged and doesn't fail the
+    refresh.
+    """
+
+    def __init__(self, load, interval=REFRESH_INTERVAL, lines=LINE_COLUMNS, on_refresh=None):
+        self.load = load
+        self.interval = interval
+        self.on_refresh = on_refresh
+        self.ingest = IncrementalCube(lines)
+        self.current = None
+        self.checked_at = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def seed(self, cube, version):
+        """Start aggregating from a saved cube (see `ridership.snapshot`)."""
+        self.ingest.seed(cube, version)
+
+    def refresh(self):
+        """Load the source now and swap in a new `Dataset` if its version changed.
+
+        Returns the current dataset. Errors are recorded in `error` as
+        ``(time, message)`` and only raised when there is nothing to serve yet.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        refreshed = None
+        try:
+            df, version = self.load()
+            if self.current is None or version != self.current.version:
+                table = RidershipTable(df, version, self.ingest.lines)
+                cube = self.ingest.ingest(table, version)
+                self.current = refreshed = Dataset(table, version, cube, time.time())
+            self.checked_at, self.error = time.time(), None
+        except Exception as exc:
+            # Anything from the network, the parquet reader or the
+            # aggregation: keep serving the last good version
+            self.error = (time.time(), f'{type(exc).__name__}: {exc}')
+            if self.current is None:
+                raise
+        if refreshed is not None and self.on_refresh is not None:
+            try:
+                self.on_refresh(refreshed)
+            except Exception:
+                # The new version is already being served
+                logger.exception('on_refresh failed for data version %s', refreshed.version)
+        return self.current
+
+    def get(self):
+        """The current dataset, loading it in this thread only if there is none yet.
+
+        Sessions arriving during that first load wait for it instead of
+        starting their own.
+        """
+        dataset = self.current
+        if dataset is not None:
+            return dataset
+        with self._lock:
+            return self.current if self.current is not None else self._refresh()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Nothing loaded yet either; the next page run or tick retries
+                pass
+
+    def start(self):
+        """Revalidate every `interval` seconds from a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='ridership-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
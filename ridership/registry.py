@@ -0,0 +1,91 @@
+"""Registry of ridership lines and how they group into modes, operators and states.
+
+The lines and their groupings are read from ``lines.toml`` (or the file named
+by ``RIDERSHIP_LINES_CONFIG``), so a new line or extension is a config change.
+Roll-ups to groups are a product of the per-line values with a line × group
+indicator matrix: every grouping is stacked into one matrix, so rolling up to
+any number of groupings is still a single pass over the values.
+"""
+import os
+import tomllib
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REGISTRY_PATH = Path(os.environ.get('RIDERSHIP_LINES_CONFIG', Path(__file__).with_name('lines.toml')))
+
+# Keys of a [[line]] entry that are not groupings
+_LINE_FIELDS = ('code', 'label')
+
+
+@dataclass(frozen=True)
+class LineRegistry:
+    """Line codes in column order, their labels and {grouping: {group: [lines]}}."""
+    lines: list
+    labels: dict
+    groupings: dict
+
+    def groups(self, grouping):
+        """Groups of `grouping` in config order."""
+        return list(self.groupings[grouping])
+
+    def members(self, grouping, group):
+        """Lines in `group` of `grouping`."""
+        return list(self.groupings[grouping][group])
+
+    def group_of(self, grouping, line):
+        """The group `line` belongs to in `grouping`, or None."""
+        for group, lines in self.groupings[grouping].items():
+            if line in lines:
+                return group
+        return None
+
+    def indicator(self, lines, *groupings):
+        """One-hot (len(lines) × groups) matrix and its (grouping, group) column index.
+
+        Lines that aren't registered, or have no group in a grouping, get a
+        zero row for it.
+        """
+        columns = [(grouping, group) for grouping in groupings for group in self.groupings[grouping]]
+        position = {line: i for i, line in enumerate(lines)}
+        matrix = np.zeros((len(lines), len(columns)))
+        for j, (grouping, group) in enumerate(columns):
+            rows = [position[line] for line in self.groupings[grouping][group] if line in position]
+            matrix[rows, j] = 1.0
+        return matrix, pd.MultiIndex.from_tuples(columns, names=['grouping', 'group'])
+
+    def rollup(self, frame, *groupings):
+        """Sum the line columns of `frame` into the groups of `groupings`.
+
+        Missing values count as zero, as in ``DataFrame.sum``. With one
+        grouping the columns are its groups; with several they are
+        (grouping, group) pairs.
+        """
+        lines = [column for column in frame.columns if column in self.labels]
+        matrix, columns = self.indicator(lines, *groupings)
+        values = frame[lines].to_numpy(dtype=np.float64, na_value=np.nan)
+        totals = np.nan_to_num(values) @ matrix
+        result = pd.DataFrame(totals, index=frame.index, columns=columns)
+        return result.droplevel('grouping', axis=1) if len(groupings) == 1 else result
+
+
+def load_registry(path=REGISTRY_PATH):
+    """Read a `LineRegistry` from the TOML file at `path`."""
+    with open(path, 'rb') as fh:
+        config = tomllib.load(fh)
+    lines, labels, groupings = [], {}, {}
+    for entry in config.get('line', []):
+        code = entry['code']
+        if code in labels:
+            raise ValueError(f'{path}: line {code!r} is listed twice')
+        lines.append(code)
+        labels[code] = entry.get('label', code)
+        for grouping, group in entry.items():
+            if grouping not in _LINE_FIELDS:
+                groupings.setdefault(grouping, {}).setdefault(group, []).append(code)
+    return LineRegistry(lines, labels, groupings)
+
+
+REGISTRY = load_registry()
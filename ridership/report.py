@@ -0,0 +1,243 @@
+"""Headless batch report: the dashboard's figures as standalone HTML and JSON.
+
+    python -m ridership.report --output report
+    python -m ridership.report --output report --range 2024-01-01:2024-06-30 --range 2023-01-01: \\
+        --selection klang-valley=rail_lrt_kj,rail_lrt_ampang,rail_mrt_kajang,rail_mrt_pjy --selection all
+    python -m ridership.report --output report --matrix weekly.json --workers 8
+
+The data is loaded once, and the aggregates (a cube and a correlation matrix,
+a few KiB each) are computed once per date range in the parent process. They
+are handed to each worker of a process pool when it starts, and every figure
+of every variant is then built and written in parallel. A figure that fails
+is recorded in the index and reported at the end instead of stopping the
+others; the exit status is then 1.
+
+A matrix file lists the date ranges and named line selections to combine::
+
+    {"ranges": ["2024-01-01:2024-06-30", "2023-01-01:"],
+     "selections": {"klang-valley": ["rail_lrt_kj", "rail_lrt_ampang"], "all": "all"}}
+
+Output layout::
+
+    <output>/index.json                      every file written (and any figure that failed), per variant
+    <output>/<range>/kpis.json
+    <output>/<range>/<figure>.{html,json}    figures that don't depend on the lines
+    <output>/<range>/<selection>/<figure>.{html,json}
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from ridership import analytics, charts
+from ridership.correlation import correlation_matrix, select_correlations
+from ridership.cube import LINE_COLUMNS, build_cube
+from ridership.data import LOCAL_DATA_PATH, URL_DATA, load_ridership, select_rows
+
+# Figures of a date range, built from its cube
+RANGE_FIGURES = {
+    'yearly': lambda cube, correlations: charts.yearly_figure(analytics.yearly_ridership(cube)),
+    'monthly': lambda cube, correlations: charts.monthly_figure(analytics.monthly_average_ridership(cube)),
+    'day_of_week': lambda cube, correlations: charts.day_of_week_figure(analytics.day_of_week_ridership(cube)),
+    'monthly_modes': lambda cube, correlations: charts.monthly_mode_figure(analytics.monthly_mode_comparison(cube)),
+    'yearly_modes': lambda cube, correlations: charts.yearly_mode_figure(analytics.yearly_mode_comparison(cube)),
+}
+
+# Figures that also depend on the line selection
+SELECTION_FIGURES = {
+    'correlation': lambda cube, correlations, lines: charts.correlation_figure(
+        select_correlations(correlations, lines)),
+    'weekday_weekend': lambda cube, correlations, lines: charts.weekday_weekend_figure(
+        analytics.weekday_weekend_ridership(cube, lines)),
+}
+
+ALL_LINES = 'all'
+
+# Aggregates of each date range, set once per worker process by `_init_worker`
+_AGGREGATES = {}
+
+
+def parse_range(text):
+    """``START:END`` (either side may be empty) as a (start, end) pair of ISO dates or None."""
+    start, sep, end = text.partition(':')
+    if not sep:
+        raise ValueError(f'date range {text!r} is not of the form START:END')
+    return start.strip() or None, end.strip() or None
+
+
+def range_key(start, end):
+    """Directory name of a date range."""
+    return f'{start or "first"}_to_{end or "last"}' if start or end else 'all-dates'
+
+
+def parse_selection(text):
+    """``NAME=line,line`` (or ``all``) as a (name, lines) pair."""
+    name, sep, lines = text.partition('=')
+    if not sep:
+        return (ALL_LINES, list(LINE_COLUMNS)) if name == ALL_LINES else (name, name.split(','))
+    return name, list(LINE_COLUMNS) if lines == ALL_LINES else lines.split(',')
+
+
+def _jsonable(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def kpis(cube):
+    """The dashboard's KPI cards as a JSON-friendly dict."""
+    peak, peak_date = analytics.peak_ridership(cube)
+    return {'total_ridership': _jsonable(analytics.total_ridership(cube)),
+            'avg_ridership_per_day': _jsonable(analytics.avg_ridership_per_day(cube)),
+            'latest_growth_rate': _jsonable(analytics.latest_growth_rate(cube)),
+            'peak_ridership': _jsonable(peak),
+            'peak_ridership_date': _jsonable(peak_date)}
+
+
+def build_aggregates(df, ranges):
+    """{range key: (cube, correlation matrix)} for each (start, end) in `ranges`."""
+    aggregates = {}
+    for start, end in ranges:
+        rows = select_rows(df, LINE_COLUMNS, start, end)
+        if rows.empty:
+            raise ValueError(f'no data between {start or "the first date"} and {end or "the last date"}')
+        aggregates[range_key(start, end)] = (build_cube(rows), correlation_matrix(rows, LINE_COLUMNS))
+    return aggregates
+
+
+def _init_worker(aggregates):
+    _AGGREGATES.clear()
+    _AGGREGATES.update(aggregates)
+
+
+def write_figure(fig, path, include_plotlyjs=True):
+    """Write `fig` to ``path.html`` and ``path.json`` and return both paths."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    html, spec = path.with_suffix('.html'), path.with_suffix('.json')
+    fig.write_html(html, include_plotlyjs=include_plotlyjs, full_html=True)
+    spec.write_text(fig.to_json(), encoding='utf-8')
+    return [str(html), str(spec)]
+
+
+def render(task):
+    """Build and write one figure; `task` is (range key, selection name, lines, figure, output dir, plotlyjs).
+
+    Returns (range key, selection name, figure, paths written, error). A
+    failing figure gives no paths and its error message, so one bad variant
+    doesn't abort the rest of the pool.
+    """
+    key, selection, lines, figure, output, include_plotlyjs = task
+    try:
+        cube, correlations = _AGGREGATES[key]
+        if selection is None:
+            fig = RANGE_FIGURES[figure](cube, correlations)
+            path = Path(output) / key / figure
+        else:
+            fig = SELECTION_FIGURES[figure](cube, correlations, lines)
+            path = Path(output) / key / selection / figure
+        return key, selection, figure, write_figure(fig, path, include_plotlyjs), None
+    except Exception as exc:
+        return key, selection, figure, [], f'{type(exc).__name__}: {exc}'
+
+
+def plan(aggregates, selections, output, include_plotlyjs=True):
+    """The render tasks for every date range and line selection."""
+    tasks = []
+    for key in aggregates:
+        tasks += [(key, None, None, figure, str(output), include_plotlyjs) for figure in RANGE_FIGURES]
+        for name, lines in selections.items():
+            tasks += [(key, name, lines, figure, str(output), include_plotlyjs) for figure in SELECTION_FIGURES]
+    return tasks
+
+
+def run(tasks, aggregates, workers=None):
+    """Render `tasks` on a pool of `workers` processes (in this process if `workers` is 1)."""
+    if workers == 1:
+        _init_worker(aggregates)
+        return [render(task) for task in tasks]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(aggregates,)) as pool:
+        return list(pool.map(render, tasks, chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the dashboard figures for a matrix of date ranges '
+                                                 'and line selections as standalone HTML and JSON.')
+    parser.add_argument('--output', type=Path, default=Path('report'), help='output directory')
+    parser.add_argument('--range', dest='ranges', action='append', default=[], metavar='START:END',
+                        help='date range to report on, either side may be empty (repeatable; default: all dates)')
+    parser.add_argument('--selection', dest='selections', action='append', default=[], metavar='NAME=LINES',
+                        help='named comma-separated line selection, or "all" (repeatable; default: all)')
+    parser.add_argument('--matrix', type=Path, help='JSON file with "ranges" and "selections" to add')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--plotlyjs', choices=['inline', 'cdn'], default='inline',
+                        help='embed plotly.js in every HTML file, or load it from the CDN')
+    parser.add_argument('--url', default=URL_DATA, help='source parquet URL (empty to skip the network)')
+    parser.add_argument('--local-path', default=LOCAL_DATA_PATH, help='local parquet file to fall back to')
+    args = parser.parse_args(argv)
+
+    try:
+        ranges = [parse_range(text) for text in args.ranges]
+        selections = dict(parse_selection(text) for text in args.selections)
+        if args.matrix:
+            matrix = json.loads(args.matrix.read_text())
+            ranges += [parse_range(text) for text in matrix.get('ranges', [])]
+            selections.update({name: list(LINE_COLUMNS) if lines == ALL_LINES else list(lines)
+                               for name, lines in matrix.get('selections', {}).items()})
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    ranges = list(dict.fromkeys(ranges)) or [(None, None)]
+    selections = selections or {ALL_LINES: list(LINE_COLUMNS)}
+    for name, lines in selections.items():
+        unknown = sorted(set(lines) - set(LINE_COLUMNS))
+        if unknown:
+            parser.error(f'selection {name!r} has unknown lines: {", ".join(unknown)}')
+
+    started = time.perf_counter()
+    df, version = load_ridership(args.url, args.local_path, columns=LINE_COLUMNS, compact=True)
+    try:
+        aggregates = build_aggregates(df, ranges)
+    except ValueError as exc:
+        parser.error(str(exc))
+    aggregated = time.perf_counter()
+
+    include_plotlyjs = True if args.plotlyjs == 'inline' else 'cdn'
+    tasks = plan(aggregates, selections, args.output, include_plotlyjs)
+    results = run(tasks, aggregates, args.workers)
+
+    index = {'data_version': version, 'variants': {}}
+    for key, (cube, _) in aggregates.items():
+        path = args.output / key / 'kpis.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(kpis(cube), indent=2), encoding='utf-8')
+        index['variants'][key] = {'kpis': str(path), 'figures': [], 'errors': {},
+                                  'selections': {name: {'lines': lines, 'figures': [], 'errors': {}}
+                                                 for name, lines in selections.items()}}
+    failures = []
+    for key, selection, figure, paths, error in results:
+        variant = index['variants'][key]
+        if selection is not None:
+            variant = variant['selections'][selection]
+        variant['figures'].extend(paths)
+        if error is not None:
+            variant['errors'][figure] = error
+            failures.append(f'{key}/{selection + "/" if selection else ""}{figure}: {error}')
+    (args.output / 'index.json').write_text(json.dumps(index, indent=2), encoding='utf-8')
+
+    finished = time.perf_counter()
+    print(f'Wrote {len(tasks) - len(failures)} figures for {len(aggregates)} date ranges x {len(selections)} '
+          f'selections of data version {version} to {args.output} '
+          f'(aggregates {aggregated - started:.1f}s, figures {finished - aggregated:.1f}s)')
+    if failures:
+        print(f'{len(failures)} figures failed:', *failures, sep='\n  ', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""On-disk snapshot of the aggregate cube for fast cold starts.
+
+A freshly started process can paint the KPIs and overview charts from the
+last snapshot straight away, instead of waiting for the download and the full
+aggregation. The snapshot is rewritten whenever a new data version is
+aggregated, and can be prebuilt at image build time:
+
+    python -m ridership.snapshot
+"""
+import argparse
+import os
+import pickle
+from pathlib import Path
+
+from ridership.cube import LINE_COLUMNS, build_cube
+from ridership.data import CACHE_DIR, LOCAL_DATA_PATH, URL_DATA, load_ridership, write_atomic
+
+SNAPSHOT_PATH = Path(os.environ.get('RIDERSHIP_SNAPSHOT_PATH', CACHE_DIR / 'aggregates.pkl'))
+
+# Bumped whenever `RidershipCube` changes shape, so stale snapshots are ignored
+SNAPSHOT_FORMAT = 3
+
+
+def save_snapshot(cube, data_version, path=SNAPSHOT_PATH):
+    """Write `cube`, its lines and its data version to `path`."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {'format': SNAPSHOT_FORMAT, 'version': data_version, 'lines': list(cube.lines), 'cube': cube}
+    write_atomic(path, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_snapshot(path=SNAPSHOT_PATH, lines=LINE_COLUMNS):
+    """Return (cube, data_version) from `path`, or None if there is no usable snapshot.
+
+    A snapshot of other `lines`, e.g. saved before a line was added to the
+    registry, is not usable.
+    """
+    try:
+        payload = pickle.loads(Path(path).read_bytes())
+    except (OSError, pickle.UnpicklingError, AttributeError, ImportError, EOFError, TypeError, ValueError):
+        # Besides a truncated file, unpickling fails with TypeError or
+        # ValueError when the snapshot was written by another pandas version
+        return None
+    if not isinstance(payload, dict) or payload.get('format') != SNAPSHOT_FORMAT:
+        return None
+    if payload.get('lines') != list(lines):
+        return None
+    return payload['cube'], payload['version']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prebuild the aggregate snapshot used at startup.')
+    parser.add_argument('--url', default=URL_DATA, help='source parquet URL (empty to skip the network)')
+    parser.add_argument('--local-path', default=LOCAL_DATA_PATH, help='local parquet file to fall back to')
+    parser.add_argument('--output', default=SNAPSHOT_PATH, help='where to write the snapshot')
+    args = parser.parse_args(argv)
+
+    df, version = load_ridership(args.url, args.local_path, columns=LINE_COLUMNS, compact=True)
+    save_snapshot(build_cube(df), version, args.output)
+    print(f'Wrote snapshot of data version {version} to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Per-state aggregates for the state drill-down.
+
+The lines of each state (the registry's ``state`` grouping) get their own
+`DateRangeIndex`, built once per data version. A state's `RidershipCube` for
+any date range is then assembled from prefix sums, so switching states or
+moving the date range never regroups the daily rows, and every function of
+`ridership.analytics` applies to it as to the cube of all lines.
+"""
+import pandas as pd
+
+from ridership import analytics
+from ridership.ranges import DateRangeIndex
+from ridership.registry import REGISTRY
+from ridership.table import as_table
+
+STATE_GROUPING = 'state'
+
+
+class StateAggregates:
+    """A `DateRangeIndex` over the lines of each state, in registry order.
+
+    `df` is the daily table sorted by date, as a frame or a `RidershipTable`
+    whose calendar fields the states then share; states with none of their
+    lines in it are left out.
+    """
+
+    def __init__(self, df, registry=REGISTRY, grouping=STATE_GROUPING):
+        table = as_table(df)
+        self.grouping = grouping
+        self.indexes = {}
+        for state in registry.groups(grouping):
+            lines = [line for line in registry.members(grouping, state) if line in table.columns]
+            if lines:
+                self.indexes[state] = DateRangeIndex(table, lines)
+
+    @property
+    def states(self):
+        return list(self.indexes)
+
+    def lines(self, state):
+        """The line codes of `state`."""
+        return list(self.indexes[state].lines)
+
+    def cube(self, state, start=None, end=None):
+        """The `RidershipCube` of `state`'s lines from `start` to `end` (inclusive)."""
+        return self.indexes[state].cube(start, end)
+
+    def summary(self, start=None, end=None):
+        """The KPIs of every state over the range, one row per state."""
+        rows = {}
+        for state in self.indexes:
+            cube = self.cube(state, start, end)
+            peak, peak_date = analytics.peak_ridership(cube)
+            rows[state] = {'lines': len(cube.lines),
+                           'total_ridership': analytics.total_ridership(cube),
+                           'avg_ridership_per_day': analytics.avg_ridership_per_day(cube),
+                           'growth_rate': analytics.latest_growth_rate(cube),
+                           'peak_ridership': peak,
+                           'peak_date': peak_date}
+        return pd.DataFrame.from_dict(rows, orient='index').rename_axis(self.grouping)
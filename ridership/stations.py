@@ -0,0 +1,179 @@
+"""Out-of-core roll-up of station-level and origin-destination ridership.
+
+The station and OD files are far too large to read with one
+``read_parquet``. They are scanned in record batches with a pyarrow dataset,
+reading only the date, station and ridership columns and skipping row groups
+outside the requested dates. Each batch is folded into a days × lines
+accumulator, so memory is bounded by one row group plus the number of days,
+not by the number of rows. The result has the same shape as the headline
+table (a ``date`` column plus one column per line code) and can be passed
+straight to `build_cube`.
+
+Stations are mapped to line codes with a station → line table, e.g. a CSV
+with ``station,line`` columns loaded by `load_station_lines`. For OD files,
+rolling up by the ``origin`` column counts each trip on the line it started
+on.
+"""
+import csv
+
+import numpy as np
+import pandas as pd
+
+from ridership.cube import LINE_COLUMNS
+
+# Rows per record batch handed to `StationRollup.add_batch`
+BATCH_SIZE = 256 * 1024
+
+
+def load_station_lines(path):
+    """{station: line code} from a CSV file with ``station`` and ``line`` columns."""
+    with open(path, newline='', encoding='utf-8') as fh:
+        return {row['station'].strip(): row['line'].strip() for row in csv.DictReader(fh)}
+
+
+class StationRollup:
+    """Accumulates per-day, per-line ridership from record batches of station rows.
+
+    Days are stored as offsets from the first day seen; the accumulator grows
+    to cover new days as batches arrive in any order. Stations missing from
+    `station_lines` are counted in `unmapped` and otherwise ignored.
+    """
+
+    def __init__(self, station_lines, lines=LINE_COLUMNS, date_column='date', station_column='station',
+                 value_column='ridership'):
+        unknown = sorted(set(station_lines.values()) - set(lines))
+        if unknown:
+            raise ValueError(f'station table maps to unknown lines: {", ".join(unknown)}')
+        self.lines = list(lines)
+        self.station_lines = station_lines
+        self.date_column = date_column
+        self.station_column = station_column
+        self.value_column = value_column
+        self._line_index = {line: i for i, line in enumerate(self.lines)}
+        self._first_day = None
+        self._sums = np.zeros((0, len(self.lines)))
+        self._counts = np.zeros((0, len(self.lines)), dtype=np.int64)
+        self.rows = 0
+        self.unmapped = {}
+
+    @property
+    def columns(self):
+        """The columns a scan needs to read."""
+        return [self.date_column, self.station_column, self.value_column]
+
+    def _station_codes(self, stations):
+        import pyarrow as pa
+        if not pa.types.is_dictionary(stations.type):
+            stations = stations.dictionary_encode()
+        # Look up each distinct station of the batch once, then map the row codes
+        names = stations.dictionary.to_pylist()
+        lookup = np.array([self._line_index.get(self.station_lines.get(name), -1) for name in names] + [-1])
+        indices = stations.indices.fill_null(len(names)).to_numpy(zero_copy_only=False)
+        codes = lookup[indices]
+        missing = np.bincount(indices[codes < 0], minlength=len(names) + 1)
+        for i in np.flatnonzero(missing[:-1]):
+            self.unmapped[names[i]] = self.unmapped.get(names[i], 0) + int(missing[i])
+        return codes
+
+    def _grow(self, first, last):
+        if self._first_day is None:
+            self._first_day = first
+        start = min(first, self._first_day)
+        n_days = max(last, self._first_day + len(self._sums) - 1) - start + 1
+        if start == self._first_day and n_days == len(self._sums):
+            return
+        sums = np.zeros((n_days, len(self.lines)))
+        counts = np.zeros((n_days, len(self.lines)), dtype=np.int64)
+        offset = self._first_day - start
+        sums[offset:offset + len(self._sums)] = self._sums
+        counts[offset:offset + len(self._counts)] = self._counts
+        self._first_day, self._sums, self._counts = start, sums, counts
+
+    def add_batch(self, batch):
+        """Fold a pyarrow RecordBatch (or Table) of station rows into the totals."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        if isinstance(batch, pa.Table):
+            for chunk in batch.to_batches():
+                self.add_batch(chunk)
+            return
+        if batch.num_rows == 0:
+            return
+        self.rows += batch.num_rows
+        days = batch.column(self.date_column).cast(pa.date32()).cast(pa.int32())
+        values = batch.column(self.value_column).cast(pa.float64())
+        codes = self._station_codes(batch.column(self.station_column))
+        keep = (codes >= 0) & ~(pc.is_null(days).to_numpy(zero_copy_only=False)
+                                | pc.is_null(values).to_numpy(zero_copy_only=False))
+        if not keep.any():
+            return
+        days = days.fill_null(0).to_numpy(zero_copy_only=False)[keep].astype(np.int64)
+        values = values.fill_null(0).to_numpy(zero_copy_only=False)[keep]
+        codes = codes[keep]
+        self._grow(int(days.min()), int(days.max()))
+
+        n_lines = len(self.lines)
+        cells = (days - self._first_day) * n_lines + codes
+        size = self._sums.size
+        self._sums += np.bincount(cells, weights=values, minlength=size).reshape(self._sums.shape)
+        self._counts += np.bincount(cells, minlength=size).reshape(self._counts.shape)
+
+    def result(self):
+        """Daily per-line ridership like the headline table; days or lines without rows are NaN.
+
+        Every day between the first and last one seen gets a row, so the dates
+        are consecutive and sorted as `build_cube` and `select_rows` expect.
+        """
+        if self._first_day is None:
+            return pd.DataFrame(columns=['date'] + self.lines)
+        dates = pd.to_datetime(np.arange(len(self._sums)) + self._first_day, unit='D')
+        sums = np.where(self._counts > 0, self._sums, np.nan)
+        df = pd.DataFrame(sums, columns=self.lines)
+        df.insert(0, 'date', dates)
+        return df
+
+
+def _date_filter(field, field_type, start, end):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    def scalar(value):
+        value = pd.Timestamp(value)
+        if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+            return value.strftime('%Y-%m-%d') if value == value.normalize() else value.isoformat()
+        return pa.scalar(value.to_pydatetime(), pa.timestamp('us')).cast(field_type)
+
+    expr = None
+    if start is not None:
+        expr = ds.field(field) >= scalar(start)
+    if end is not None:
+        # Inclusive of the whole end day, also for timestamp columns
+        upper = ds.field(field) < scalar(pd.Timestamp(end) + pd.Timedelta(days=1))
+        expr = upper if expr is None else expr & upper
+    return expr
+
+
+def stream_station_ridership(source, station_lines, lines=LINE_COLUMNS, date_column='date',
+                             station_column='station', value_column='ridership', start=None, end=None,
+                             batch_size=BATCH_SIZE):
+    """Roll the station-level parquet data at `source` up to daily per-line ridership.
+
+    `source` is a parquet file, a directory of them or a list of paths. Only
+    the three columns used are read; with `start`/`end` (inclusive dates) the
+    row groups whose statistics fall outside the range are skipped. Returns
+    the `StationRollup`, whose `result()` is the daily frame and whose
+    `unmapped` lists the rows of stations missing from `station_lines`.
+    """
+    import pyarrow.dataset as ds
+
+    rollup = StationRollup(station_lines, lines, date_column, station_column, value_column)
+    dataset = ds.dataset(source, format='parquet')
+    date_filter = _date_filter(date_column, dataset.schema.field(date_column).type, start, end)
+    # Row group by row group rather than through one dataset scanner, whose
+    # readahead buffers grow with the file: this keeps at most one decoded row
+    # group in memory. Row groups outside the dates are pruned from statistics.
+    for fragment in dataset.get_fragments(filter=date_filter):
+        for row_group in fragment.split_by_row_group(date_filter):
+            for batch in row_group.to_batches(columns=rollup.columns, filter=date_filter, batch_size=batch_size):
+                rollup.add_batch(batch)
+    return rollup
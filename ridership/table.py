@@ -0,0 +1,202 @@
+"""Read-only daily table with lazily derived columns.
+
+`RidershipTable` wraps one version of the daily table. Its base columns are
+never modified, and every column derived from them (calendar fields, the
+weekend mask, day-type flags, per-line values as float64, row totals,
+category subtotals, row fingerprints) is declared once in this module with
+`derived_column`. A derived column is computed on first access with
+vectorized integer and array operations, kept on the table (so per data
+version), and handed out as a read-only array: the cube, the date-range index
+and the per-state aggregates built from one table share the same arrays
+instead of each deriving and copying their own.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ridership.day_types import CALENDAR
+from ridership.registry import REGISTRY
+
+# {name: (compute(table, lines), by_lines)}; see `derived_column`
+DERIVED_COLUMNS = {}
+
+
+def derived_column(name, by_lines=False):
+    """Register `compute(table, lines)` as the derived column `name`.
+
+    Columns computed from line values are `by_lines` and memoized per list of
+    lines; the others ignore `lines`.
+    """
+    def register(compute):
+        DERIVED_COLUMNS[name] = (compute, by_lines)
+        return compute
+    return register
+
+
+def _copy_on_write():
+    # Always on from pandas 3; opted into with an option on pandas 2
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+
+
+def _read_only(array):
+    array = np.asarray(array)
+    array.flags.writeable = False
+    return array
+
+
+class RidershipTable:
+    """One version of the daily table, sorted by date, with memoized derived columns.
+
+    `lines` are the ridership columns used when a derived column is asked for
+    without its own list (the registry's lines present in `df` by default).
+    The table keeps its own copy of `df`, so writes to the caller's frame
+    after construction don't reach it or its memoized columns.
+    """
+
+    def __init__(self, df, version=None, lines=None):
+        # Under copy-on-write a shallow copy is enough: a later write to `df`
+        # copies the block it touches instead of changing the one shared here
+        self._df = df.copy(deep=not _copy_on_write())
+        self.version = version
+        self.lines = list(lines) if lines is not None else [line for line in REGISTRY.lines if line in df.columns]
+        self._derived = {}
+        # Re-entrant: a derived column may read others while being computed
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._df)
+
+    @property
+    def df(self):
+        """The base table.
+
+        A shallow copy-on-write copy: a caller that adds or overwrites columns
+        changes only its own copy, never the table other sections read.
+        """
+        return self._df.copy(deep=False)
+
+    @property
+    def columns(self):
+        return self._df.columns
+
+    @property
+    def dates(self):
+        """The dates as a `DatetimeIndex`."""
+        return self.column('date_index')
+
+    def column(self, name, lines=None):
+        """Base or derived column `name` as a read-only array.
+
+        Derived columns are computed once and shared by every caller.
+        """
+        if name not in DERIVED_COLUMNS:
+            return self._df[name].to_numpy()
+        compute, by_lines = DERIVED_COLUMNS[name]
+        key = (name, tuple(self.lines if lines is None else lines)) if by_lines else (name,)
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = compute(self, list(key[1]) if by_lines else None)
+                    self._derived[key] = value
+        return value
+
+    def line_values(self, lines=None):
+        """Ridership of `lines` as a read-only float64 (days × lines) array, NaN where missing."""
+        return self.column('line_values', lines)
+
+
+def as_table(data, lines=None):
+    """`data` if it is a `RidershipTable`, else a new table over the frame `data`."""
+    return data if isinstance(data, RidershipTable) else RidershipTable(data, lines=lines)
+
+
+# Calendar fields, from the dates as integer day and month numbers
+@derived_column('date_index')
+def _date_index(table, lines):
+    return pd.DatetimeIndex(table.column('date'))
+
+
+@derived_column('day_number')
+def _day_number(table, lines):
+    """Days since 1970-01-01."""
+    return _read_only(table.column('date').astype('datetime64[D]').astype(np.int64))
+
+
+@derived_column('month_number')
+def _month_number(table, lines):
+    """Months since January 1970."""
+    return _read_only(table.column('date').astype('datetime64[M]').astype(np.int64))
+
+
+@derived_column('year')
+def _year(table, lines):
+    return _read_only((table.column('month_number') // 12 + 1970).astype(np.int32))
+
+
+@derived_column('month')
+def _month(table, lines):
+    return _read_only((table.column('month_number') % 12 + 1).astype(np.int8))
+
+
+@derived_column('month_key')
+def _month_key(table, lines):
+    """``year * 12 + month - 1``."""
+    return _read_only(table.column('month_number') + 1970 * 12)
+
+
+@derived_column('day_of_week')
+def _day_of_week(table, lines):
+    """0 (Monday) to 6 (Sunday); 1970-01-01 was a Thursday."""
+    return _read_only(((table.column('day_number') + 3) % 7).astype(np.int8))
+
+
+@derived_column('is_weekend')
+def _is_weekend(table, lines):
+    return _read_only(table.column('day_of_week') >= 5)
+
+
+@derived_column('day_flags')
+def _day_flags(table, lines):
+    """Weekday, weekend, holiday and movement-control bits (see `ridership.day_types`)."""
+    return _read_only(CALENDAR.flags(table.column('day_number'), table.column('is_weekend')))
+
+
+# Per-line values and row totals
+@derived_column('line_values', by_lines=True)
+def _line_values(table, lines):
+    # Aggregate in float64 whatever the storage dtype, so sums can't overflow
+    # and missing readings stay NaN
+    return _read_only(table._df[lines].to_numpy(dtype=np.float64, na_value=np.nan))
+
+
+@derived_column('present', by_lines=True)
+def _present(table, lines):
+    return _read_only(~np.isnan(table.line_values(lines)))
+
+
+@derived_column('total', by_lines=True)
+def _total(table, lines):
+    """Sum over the lines, skipping missing readings like ``DataFrame.sum``."""
+    return _read_only(np.nansum(table.line_values(lines), axis=1))
+
+
+@derived_column('row_hash', by_lines=True)
+def _row_hash(table, lines):
+    """Fingerprint of each row's values, used to spot corrected rows."""
+    values = pd.DataFrame(table.line_values(lines), columns=lines)
+    return _read_only(pd.util.hash_pandas_object(values, index=False).to_numpy())
+
+
+def _category_total(group):
+    def compute(table, lines):
+        members = [i for i, line in enumerate(lines) if REGISTRY.group_of('category', line) == group]
+        return _read_only(np.nansum(table.line_values(lines)[:, members], axis=1))
+    return compute
+
+
+# One subtotal per category of the registry, e.g. `bus_total` and `rail_total`
+for _group in REGISTRY.groups('category'):
+    derived_column(f'{_group}_total', by_lines=True)(_category_total(_group))
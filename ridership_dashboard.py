@@ -1,29 +1,138 @@
+import time
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import seaborn as sns
-from streamlit_extras.add_vertical_space import add_vertical_space
-import plotly.graph_objects as go
+from ridership import analytics, charts
+from ridership.anomalies import THRESHOLD, AnomalyDetector
+from ridership.correlation import ROLLING_WINDOW, correlation_matrix, rolling_correlation, select_correlations
+from ridership.cube import LINE_COLUMNS
+from ridership.data import URL_DATA, load_ridership, memory_usage, select_rows
+from ridership.day_types import DAY_TYPES, covered_range, day_type_days, day_type_split, school_holiday_gaps
+from ridership.downsample import TARGET_POINTS, downsample_lines
+from ridership.export import EXPORT_FORMATS, export_name, export_path
+from ridership.figure_cache import FigureCache
+from ridership.metrics import SectionMetrics
+from ridership.ranges import DateRangeIndex
+from ridership.refresh import DataRefresher
+from ridership.registry import REGISTRY
+from ridership.snapshot import load_snapshot, save_snapshot
+from ridership.states import StateAggregates
 
 
 # load data
-URL_DATA = 'https://storage.data.gov.my/transportation/ridership_headline.parquet'
-df = pd.read_parquet(URL_DATA)
-if 'date' in df.columns: df['date'] = pd.to_datetime(df['date'])
+# The dataset is kept current by a background refresher shared by every
+# session. It revalidates the source against data.gov.my on a schedule (the
+# parquet file is kept in a versioned on-disk cache and only re-downloaded when
+# the source reports a new version), and folds a new version into the previous
+# aggregate cube, re-aggregating only the months that gained or corrected rows.
+# The table and cube are then swapped in together. Page runs never wait on the
+# network once the first version is loaded, and keep the last good version
+# when a refresh fails. Only the date and line columns are read, downcast to
+# compact integer types, and the frame is shared read-only by every session.
+@st.cache_resource(show_spinner=False)
+def data_refresher():
+    def load():
+        with metrics.section("refresh"):
+            return load_ridership(URL_DATA, columns=LINE_COLUMNS, compact=True)
+    refresher = DataRefresher(load, on_refresh=lambda dataset: save_snapshot(dataset.cube, dataset.version))
+    return refresher.start()
+
+# Filtering to a date range reads prefix sums built once per data version, so
+# moving the range slider doesn't regroup the daily rows. They are built from
+# the dataset's read-only table, whose calendar fields and line values are
+# derived once per version and shared with the state aggregates below.
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_range_index(data_version, _table):
+    return DateRangeIndex(_table, LINE_COLUMNS)
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_range_cube(data_version, start, end, _table):
+    return load_range_index(data_version, _table).cube(start, end)
+
+# Per-state prefix sums for the state drill-down, also built once per data
+# version, so switching states only assembles that state's cube
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_state_aggregates(data_version, _table):
+    return StateAggregates(_table)
+
+# Anomaly scores of every line and day, kept by one detector per process so
+# a new data version only rescores the days appended or corrected since the
+# previous one
+@st.cache_resource(show_spinner=False)
+def anomaly_detector():
+    return AnomalyDetector(LINE_COLUMNS)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_anomalies(data_version, _table):
+    return anomaly_detector().update(_table, data_version)
+
+# Line-by-line correlations are computed once per data version, date range
+# (and rolling window); line selections only slice them
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_correlations(data_version, start, end, _df):
+    return correlation_matrix(select_rows(_df, LINE_COLUMNS, start, end), LINE_COLUMNS)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_rolling_correlation(data_version, window, _df):
+    return rolling_correlation(_df, LINE_COLUMNS, window)
+
+# Timing and memory of each section below, shared by all sessions of the
+# process. They are written as JSON lines and a Prometheus text snapshot
+# after every run, and shown in a debug panel when the page is opened with
+# ?debug=perf.
+@st.cache_resource(show_spinner=False)
+def section_metrics():
+    return SectionMetrics()
+
+metrics = section_metrics()
+data_version = None
+
+def timed(section):
+    return metrics.section(section, data_version=data_version)
+
+# Built figures, shared by all sessions of the process. A figure is cached by
+# chart, line selection, date range and data version (plus any chart
+# options), so sessions looking at the same view reuse one figure instead of
+# re-aggregating and rebuilding it. The least recently used figures are
+# evicted once their serialized size exceeds the cache's byte budget.
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    figures = FigureCache()
+    metrics.add_collector(figures.prometheus_text)
+    return figures
+
+figures = figure_cache()
+
+def cached_figure(chart, build, lines=None, *options):
+    key = (chart, tuple(lines) if lines is not None else None, range_start, range_end, data_version) + options
+    return figures.get_or_build(key, build)
+
+# Display a chart, timing its serialization apart from building it
+def plotly_chart(section, fig, **kwargs):
+    with timed(f"{section}.render"):
+        st.plotly_chart(fig, **kwargs)
+
+# Every section of a run reads the same dataset, taken once here. A cold
+# process paints the KPIs and overview from the last saved aggregate snapshot,
+# and the dataset is only loaded after them (see below).
+with timed("startup"):
+    refresher = data_refresher()
+    dataset = refresher.current
+    if dataset is None:
+        if refresher.ingest.cube is None:
+            snapshot = load_snapshot()
+            if snapshot is not None:
+                refresher.seed(*snapshot)
+        cube, data_version = refresher.ingest.cube, refresher.ingest.version
+        if cube is None:
+            dataset = refresher.get()
+    if dataset is not None:
+        df, cube, data_version = dataset.df, dataset.cube, dataset.version
+
+# Function to show refresh times
+def format_time(timestamp):
+    return time.strftime('%d %b %Y, %H:%M %Z', time.localtime(timestamp))
 
 
-# State mapping 
-state_mapping = {
-    "Kuala Lumpur": ["bus_rkl", "rail_lrt_kj", "rail_lrt_ampang", "rail_monorail", 
-                     "rail_mrt_kajang", "rail_mrt_pjy"],
-    "Penang": ["bus_rpn"],
-    "Kuantan": ["bus_rkn"],
-    "Cross-State": ["rail_ets", "rail_intercity", "rail_komuter", 
-                 "rail_komuter_utara", "rail_tebrau"]
-}
-
 # Landing Page
 # Create the top section of the page 
 st.set_page_config(page_title="Malaysia Public Transport Ridership Dashboard 🚆", layout="wide",initial_sidebar_state="collapsed")
@@ -32,6 +141,17 @@ st.subheader("A deep dive into Malaysia's public transport ridership trends from
 st.markdown("""This dashboard presents key trends in public transport ridership based on data from [data.gov.my](https://data.gov.my/).
             Explore interactive visualizations to gain insights into public transport usage across different regions and modes of transportation.""")
 
+# Show which version of the data is on screen and how fresh it is
+if dataset is not None:
+    st.caption(f"Data version {data_version}, loaded {format_time(dataset.loaded_at)}; "
+               f"source last checked {format_time(refresher.checked_at)}.")
+else:
+    st.caption(f"Data version {data_version} from the saved aggregates; the latest data is loading.")
+if refresher.error is not None:
+    failed_at, message = refresher.error
+    st.caption(f"⚠️ Refreshing the data failed at {format_time(failed_at)} ({message}); "
+               f"showing the last good version.")
+
 # Create optional description section in a expander 
 with st.expander("Learn More About This Project 📖"):
     st.markdown("""
@@ -44,7 +164,8 @@ with st.expander("Learn More About This Project 📖"):
     """)
 
 # Create an expander for variable descriptions
-with st.expander("Data Description"):
+data_description = st.expander("Data Description")
+with data_description:
     st.markdown(
         """
         Below is a list of the key variables in this dataset.\n
@@ -52,45 +173,41 @@ with st.expander("Data Description"):
         """
     )
 
-    # Define the variable definitions as a dictionary
-    variable_definitions = {
-        'date (Date)': 'Date in YYYY-MM-DD format',
-        'bus_rkl (Integer)': 'Ridership: Rapid Bus (KL)',
-        'bus_rkn (Integer)': 'Ridership: Rapid Bus (Kuantan)',
-        'bus_rpn (Integer)': 'Ridership: Rapid Bus (Penang)',
-        'rail_lrt_ampang (Integer)': 'Ridership: LRT Ampang Line ',
-        'rail_lrt_kj (Integer)': 'Ridership: LRT Kelana Jaya Line',
-        'rail_monorail (Integer)': 'Ridership: Monorail Line',
-        'rail_mrt_kajang (Integer)': 'Ridership: MRT Kajang Line',
-        'rail_mrt_pjy (Integer)': 'Ridership: MRT Putrajaya Line',
-        'rail_ets (Integer)': 'Ridership: KTMB ETS',
-        'rail_komuter (Integer)': 'Ridership: KTM Komuter Utara',
-        'rail_tebrau (Integer)': 'Ridership: KTM Shuttle Tebrau',
-        'rail_intercity (Integer)': 'Ridership: KTM Intercity'
-    }
+    # Define the variable definitions as a dictionary, one entry per line in the registry
+    variable_definitions = {'date (Date)': 'Date in YYYY-MM-DD format'}
+    variable_definitions.update({f'{line} (Integer)': f'Ridership: {REGISTRY.labels[line]}'
+                                 for line in LINE_COLUMNS})
 
     # Create a DataFrame for better UI/UX
     new_df = pd.DataFrame(variable_definitions.items(), columns=['Variable', 'Description'])
 
     # Display the variable descriptions
     st.write("### Variable Descriptions")
-    st.table(new_df.style.applymap(lambda x: 'background-color: #f2f2f2' if x else ''))
-
-    # Display the download button for the CSV file
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-    csv = convert_df(df)
-    st.write("You can get the latest data from [data.gov.my](https://data.gov.my/) or you download it here using the button")
-    st.download_button(
-        "Press to Download",
-        csv,
-        "ridership_data.csv",
-        "text/csv",
-        key='download-csv'
-    )
+    st.table(new_df.style.map(lambda x: 'background-color: #f2f2f2' if x else ''))
 
 st.markdown("<br>", unsafe_allow_html=True)
 
+# Date range applied to every KPI and chart below. The full history uses the
+# cube as is; a narrower range is served from the prefix-sum index.
+full_cube = cube
+first_date, last_date = cube.daily.index[0].date(), cube.daily.index[-1].date()
+date_range = st.slider("Date range", min_value=first_date, max_value=last_date,
+                       value=(first_date, last_date), format="DD MMM YYYY")
+range_start, range_end = None, None
+if date_range != (first_date, last_date):
+    with timed("date_range"):
+        # On a cold start the dataset is loaded here; if it is newer than the
+        # snapshot, the rerun below picks it up first
+        if dataset is None:
+            dataset = refresher.get()
+        if dataset.version == data_version:
+            try:
+                cube = load_range_cube(data_version, pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]),
+                                       dataset.table)
+                range_start, range_end = map(pd.Timestamp, date_range)
+            except ValueError:
+                st.warning("There is no data in the selected range; showing the full history.")
+
 # Display KPIs
 # Function to simplify large numbers for display
 def format_number(number):
@@ -100,62 +217,45 @@ def format_number(number):
         return f"{number / 1_000:.1f}K"
     else:
         return str(number)
+
+# Growth rate as a colored KPI; a range within one month has no growth to show
+def growth_rate_html(growth_rate):
+    if pd.isna(growth_rate):
+        return "<h3>n/a</h3>"
+    return f"<h3 style='color: {'red' if growth_rate < 0 else 'green'};'>{growth_rate:.2f}%</h3>"
     
 # Total Ridership
-col1, col2, col3,col4 = st.columns(4)
-
-# KPI 1: Total Ridership 
-total_ridership = df[['bus_rkl', 'bus_rkn', 'bus_rpn', 'rail_lrt_ampang', 'rail_mrt_kajang', 
-                      'rail_lrt_kj', 'rail_monorail', 'rail_mrt_pjy', 'rail_ets', 'rail_intercity', 
-                      'rail_komuter_utara', 'rail_tebrau', 'rail_komuter']].sum().sum()
-with col1:
-    st.markdown("**Total Ridership:**")
-    st.markdown(f"<h3 style='color: #4CAF50;'>{format_number(total_ridership)} trips</h3>", unsafe_allow_html=True)
-
-# KPI 2: Average Ridership per Day
-avg_ridership_per_day = df[['bus_rkl', 'bus_rkn', 'bus_rpn', 'rail_lrt_ampang', 'rail_mrt_kajang', 
-                            'rail_lrt_kj', 'rail_monorail', 'rail_mrt_pjy', 'rail_ets', 'rail_intercity', 
-                            'rail_komuter_utara', 'rail_tebrau', 'rail_komuter']].sum().mean()
-with col2:
-    st.markdown("**Average Ridership per Day:**")
-    st.markdown(f"<h3>{format_number(avg_ridership_per_day)} trips</h3>", unsafe_allow_html=True)
-
-# KPI 3: Growth Rate (Month-over-month growth in ridership)
-df['year'] = df['date'].dt.year.astype('Int64')
-df['month'] = df['date'].dt.month.astype('Int64')
-
-# Monthly ridership based on grouped year and month 
-monthly_ridership_df = df.groupby(['year', 'month'])[['bus_rkl', 'bus_rkn', 'bus_rpn', 'rail_lrt_ampang', 
-                                                     'rail_mrt_kajang', 'rail_lrt_kj', 'rail_monorail', 
-                                                     'rail_mrt_pjy', 'rail_ets', 'rail_intercity', 
-                                                     'rail_komuter_utara', 'rail_tebrau', 'rail_komuter']].sum()
-
-# Calculate month-over-month growth for each transportation mode
-monthly_ridership_df['growth_rate'] = monthly_ridership_df.sum(axis=1).pct_change() * 100
-
-# Calculate the latest growth rate (last row's growth rate)
-latest_growth_rate = monthly_ridership_df['growth_rate'].iloc[-1]
-
-with col3:
-    growth_rate_color = "red" if latest_growth_rate < 0 else "green"
-    st.markdown("**Growth Rate:**")
-    st.markdown(f"<h3 style='color: {growth_rate_color};'>{latest_growth_rate:.2f}%</h3>", unsafe_allow_html=True)
-
-# KPI 4: Peak Ridership (maximum number of trips recorded per day)
-df['sum_ridership'] = df[['bus_rkl', 'bus_rkn', 'bus_rpn', 
-                            'rail_lrt_ampang', 'rail_mrt_kajang', 
-                            'rail_lrt_kj', 'rail_monorail', 'rail_mrt_pjy', 
-                            'rail_ets', 'rail_intercity', 'rail_komuter_utara', 
-                            'rail_tebrau', 'rail_komuter']].sum(axis=1)
-
-# Find the peak ridership value and the corresponding date
-peak_ridership = df['sum_ridership'].max()  # Maximum value
-peak_ridership_date = df[df['sum_ridership']== peak_ridership]['date'].iloc[0]  
-
-with col4:
-    st.markdown("**Peak Ridership:**")
-    st.markdown(f"<h3>{format_number(peak_ridership)} trips</h3>", unsafe_allow_html=True)
-    st.caption(f"Occurred on: {peak_ridership_date.strftime('%B %d, %Y')}")
+with timed("kpis"):
+    col1, col2, col3,col4 = st.columns(4)
+
+    # KPI 1: Total Ridership 
+    total_ridership = analytics.total_ridership(cube)
+    with col1:
+        st.markdown("**Total Ridership:**")
+        st.markdown(f"<h3 style='color: #4CAF50;'>{format_number(total_ridership)} trips</h3>", unsafe_allow_html=True)
+
+    # KPI 2: Average Ridership per Day
+    avg_ridership_per_day = analytics.avg_ridership_per_day(cube)
+    with col2:
+        st.markdown("**Average Ridership per Day:**")
+        st.markdown(f"<h3>{format_number(avg_ridership_per_day)} trips</h3>", unsafe_allow_html=True)
+
+    # KPI 3: Growth Rate (Month-over-month growth in ridership)
+    # Calculate the latest growth rate (last month's growth rate)
+    latest_growth_rate = analytics.latest_growth_rate(cube)
+
+    with col3:
+        st.markdown("**Growth Rate:**")
+        st.markdown(growth_rate_html(latest_growth_rate), unsafe_allow_html=True)
+
+    # KPI 4: Peak Ridership (maximum number of trips recorded per day)
+    # Find the peak ridership value and the corresponding date
+    peak_ridership, peak_ridership_date = analytics.peak_ridership(cube)
+
+    with col4:
+        st.markdown("**Peak Ridership:**")
+        st.markdown(f"<h3>{format_number(peak_ridership)} trips</h3>", unsafe_allow_html=True)
+        st.caption(f"Occurred on: {peak_ridership_date.strftime('%B %d, %Y')}")
 
 # Ridership Trends Visualizations
 st.header("Overview Ridership Trends")
@@ -163,406 +263,441 @@ st.header("Overview Ridership Trends")
 tab1, tab2, tab3 = st.tabs(["Yearly", "Monthly", "Day of The Week"])
 
 # Yearly Ridership Trends
-with tab1:
+with tab1, timed("overview.yearly"):
     st.subheader("Yearly Ridership Trends (2019-2024)")
     # You can use a line chart or bar chart to show trends over the years.
-    yearly_df = df.groupby('year')[['bus_rkl', 'bus_rkn', 'bus_rpn', 
-                                              'rail_lrt_ampang', 'rail_mrt_kajang', 
-                                              'rail_lrt_kj', 'rail_monorail', 
-                                              'rail_mrt_pjy', 'rail_ets', 
-                                              'rail_intercity', 'rail_komuter_utara', 
-                                              'rail_tebrau', 'rail_komuter']].sum()
-
-    yearly_df['total_ridership'] = yearly_df.sum(axis=1)
     # Plot the yearly ridership trends
-    fig_yearly = px.line(yearly_df, x=yearly_df.index, 
-                         y='total_ridership', 
-                         labels={'total_ridership': 'Total Ridership'},
-                         line_shape="linear",
-                         markers=True,
-                         line_dash_sequence=['solid'],
-                         color_discrete_sequence=["#1E90FF"])
-    st.plotly_chart(fig_yearly)
+    fig_yearly = cached_figure("yearly", lambda: charts.yearly_figure(analytics.yearly_ridership(cube)))
+    plotly_chart("overview.yearly", fig_yearly)
 
 # Monthly Ridership Trends
 # Monthly Average Ridership Trends
-with tab2:
+with tab2, timed("overview.monthly"):
     st.subheader("Monthly Average Ridership Trends (2019-2024)")
 
-    # Group by year and month
-    monthly_ridership_df = df.groupby(['year', 'month'])[['bus_rkl', 'bus_rkn', 'bus_rpn', 
-                                                          'rail_lrt_ampang', 'rail_mrt_kajang', 
-                                                          'rail_lrt_kj', 'rail_monorail', 
-                                                          'rail_mrt_pjy', 'rail_ets', 
-                                                          'rail_intercity', 'rail_komuter_utara', 
-                                                          'rail_tebrau', 'rail_komuter']].sum()
-
-    # Calculate total ridership for each month
-    monthly_ridership_df['total_ridership'] = monthly_ridership_df.sum(axis=1)
-    monthly_day_count = df.groupby(['year', 'month'])['date'].nunique()
-
-    # Calculate the average ridership for each month
-    monthly_ridership_df['average_ridership'] = monthly_ridership_df['total_ridership'] / monthly_day_count
-
-    # Reset index to include year and month as columns
-    monthly_ridership_df = monthly_ridership_df.reset_index()
-
-    # Plot
-    fig_monthly = px.line(monthly_ridership_df, x='month', y='average_ridership', 
-                          color='year', 
-                          labels={'average_ridership': 'Average Ridership'},
-                          line_shape="linear",
-                          color_discrete_sequence=px.colors.qualitative.Set2)  
-    
-    # Customize x-axis to show month names
-    fig_monthly.update_xaxes(title='Month', tickmode='array', 
-                             tickvals=monthly_ridership_df['month'], 
-                             ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                                       'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
-    st.plotly_chart(fig_monthly)
+    # Plot the average ridership for each year and month, with month names on the x-axis
+    fig_monthly = cached_figure("monthly",
+                                lambda: charts.monthly_figure(analytics.monthly_average_ridership(cube)))
+    plotly_chart("overview.monthly", fig_monthly)
 
 # Day-wise Ridership Trends
-with tab3:
+with tab3, timed("overview.day_of_week"):
     st.subheader("Average Ridership by Day of the Week")
 
-    # Group by day of the week
-    df['day_of_week'] = df['date'].dt.day_name()
-
-    # Calculate the mean ridership for each day of the week
-    days = df.groupby('day_of_week')[['bus_rkl', 'bus_rkn', 'bus_rpn', 
-                                      'rail_lrt_ampang', 'rail_mrt_kajang', 
-                                      'rail_lrt_kj', 'rail_monorail', 
-                                      'rail_mrt_pjy', 'rail_ets', 
-                                      'rail_intercity', 'rail_komuter_utara', 
-                                      'rail_tebrau', 'rail_komuter']].mean()
-
-    days = days.reindex(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
-
-    # Calculate the total ridership 
-    days['total_ridership'] = days.sum(axis=1)
-
-    # Calculate the bus and rail ridership breakdown 
-    days['bus_ridership'] = days[['bus_rkl', 'bus_rkn', 'bus_rpn']].sum(axis=1)
-    days['rail_ridership'] = days[['rail_lrt_ampang', 'rail_mrt_kajang', 'rail_lrt_kj', 
-                                   'rail_monorail', 'rail_mrt_pjy', 'rail_ets', 
-                                   'rail_intercity', 'rail_komuter_utara', 
-                                   'rail_tebrau', 'rail_komuter']].sum(axis=1)
-
-    # Plot day of the week ridership trends
-    fig_day = px.bar(days, 
-                     x=days.index, 
-                     y='total_ridership', 
-                     labels={'total_ridership': 'Average Ridership'},
-                     color='total_ridership',  
-                     color_continuous_scale='Blues', 
-                     template='plotly_dark',
-                     barmode='group', 
-                     category_orders={"day_of_week": ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']} 
-                    )
-
-    # Pass the custom bus and rail breakdown data 
-    fig_day.update_traces(
-    customdata=days[['bus_ridership', 'rail_ridership']].values,
-    hovertemplate="<b>Day: </b> %{x}<br><b>Total Ridership: </b> %{y:.0f}<br><b>Bus: </b> %{customdata[0]:.0f}<br><b>Rail: </b> %{customdata[1]:.0f}"
-    )
+    # Plot the mean ridership for each day of the week, with the bus and rail breakdown on hover
+    fig_day = cached_figure("day_of_week", lambda: charts.day_of_week_figure(analytics.day_of_week_ridership(cube)))
 
     # Display the plot
-    st.plotly_chart(fig_day)
+    plotly_chart("overview.day_of_week", fig_day)
     
 st.markdown("<br>", unsafe_allow_html=True)        
 
-st.header("In-Depth Ridership Analysis")     
-# st.caption("Analyzing patterns, correlations, and growth in public transport usage.")
-# Add a subheader to guide the user
-st.subheader('Select Rail or Bus Lines to Analyze:')
-selected_df = df.drop(columns=['month', 'year','sum_ridership','day_of_week'])
-
-# Create a checkbox to enable select all options
-select_all = st.checkbox("Select All Lines", value=True)
-multiselect_options = selected_df.columns[1:]
+# Load the dataset for the sections below. On a cold start with a snapshot this
+# is the first time it is needed; if it turns out newer than the snapshot, the
+# page is rerun once so the KPIs and overview show the new version.
+with timed("load_data"):
+    if dataset is None:
+        dataset = refresher.get()
+if dataset.version != data_version:
+    metrics.flush()
+    st.rerun()
+df = dataset.df
+
+with data_description, timed("downloads"):
+    # Display the download buttons for the full dataset. The files are only
+    # encoded when a button is pressed and are cached on disk per data version.
+    def export_data(fmt, lines=None, start=None, end=None):
+        return lambda: export_path(df, fmt, data_version, lines, start, end).read_bytes()
+    st.write("You can get the latest data from [data.gov.my](https://data.gov.my/) or you download it here using the button")
+    download_cols = st.columns(len(EXPORT_FORMATS))
+    for download_col, (fmt, (label, _, mime)) in zip(download_cols, EXPORT_FORMATS.items()):
+        with download_col:
+            st.download_button(
+                "Press to Download" if fmt == 'csv' else f"Download {label}",
+                export_data(fmt),
+                export_name(fmt),
+                mime,
+                key=f'download-{fmt}',
+                on_click='ignore'
+            )
+    # Function to show memory sizes in readable units
+    def format_bytes(size):
+        for unit in ['B', 'KiB', 'MiB']:
+            if size < 1024:
+                return f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} GiB"
+    st.caption(f"Data version {data_version}: {format_bytes(memory_usage(df))} for the daily table and "
+               f"{format_bytes(full_cube.memory_usage())} for the aggregates, shared by all sessions.")
+
+# Daily per-line trends over the full history. Series are downsampled on the
+# server to about one point per pixel; moving the date slider re-queries the
+# visible range at full resolution, rerunning only this fragment. Days whose
+# ridership departs from the line's usual level for that weekday are marked
+# on the chart and listed below it.
+@st.fragment
+def daily_trends(selected_lines):
+    st.title('Daily Ridership Trends')
+    first_date, last_date = cube.daily.index[0].date(), cube.daily.index[-1].date()
+    # A one-day range has nothing to zoom into
+    zoom_start, zoom_end = first_date, last_date
+    if first_date != last_date:
+        zoom_start, zoom_end = st.slider("Zoom to dates", min_value=first_date, max_value=last_date,
+                                         value=(first_date, last_date), format="MMM YYYY")
+    threshold = st.slider("Flag days with a robust z-score beyond", min_value=2.0, max_value=8.0,
+                          value=THRESHOLD, step=0.5)
+    with timed("in_depth.anomalies"):
+        flagged = load_anomalies(data_version, dataset.table).flagged(selected_lines, zoom_start, zoom_end,
+                                                                      threshold)
+    with timed("in_depth.daily_trends"):
+        # WebGL traces keep the browser responsive with many lines
+        fig_daily = cached_figure("daily_trends", lambda: charts.daily_trend_figure(
+            downsample_lines(df, selected_lines, zoom_start, zoom_end, TARGET_POINTS), flagged),
+            selected_lines, zoom_start, zoom_end, threshold)
+        plotly_chart("in_depth.daily_trends", fig_daily, width='stretch')
+    n_points = sum(len(trace.x) for trace in fig_daily.data[:len(selected_lines)])
+    st.caption(f"Showing {n_points:,} points for {len(selected_lines)} lines, "
+               f"at most {TARGET_POINTS:,} per line.")
+
+    with st.expander(f"Unusual Days ({len(flagged):,})"):
+        if len(flagged):
+            st.caption("Expected ridership is the line's median over the previous four weeks, scaled by its "
+                       "usual ratio on that weekday. Days are flagged when their deviation from it is far "
+                       "outside the deviations of the previous eight weeks.")
+            st.dataframe(flagged.assign(deviation=flagged['deviation'] * 100).sort_values('date', ascending=False),
+                         width='stretch', hide_index=True,
+                         column_config={"date": st.column_config.DateColumn("Date"),
+                                        "line": st.column_config.TextColumn("Line"),
+                                        "ridership": st.column_config.NumberColumn("Ridership", format="%.0f"),
+                                        "expected": st.column_config.NumberColumn("Expected", format="%.0f"),
+                                        "deviation": st.column_config.NumberColumn("Deviation", format="%+.1f%%"),
+                                        "score": st.column_config.NumberColumn("Robust z", format="%+.1f")})
+        else:
+            st.info("No unusual days for the selected lines in this range.")
+    metrics.flush()
+
+# The in-depth analysis is the only part of the page that depends on the line
+# selection, so it runs as a fragment: changing the selection reruns just this
+# section instead of the data load, KPIs and overview tabs above it.
+@st.fragment
+def in_depth_analysis():
+    st.header("In-Depth Ridership Analysis")     
+    # st.caption("Analyzing patterns, correlations, and growth in public transport usage.")
+    # Add a subheader to guide the user
+    st.subheader('Select Rail or Bus Lines to Analyze:')
+    selected_df = df
+
+    # Create a checkbox to enable select all options
+    select_all = st.checkbox("Select All Lines", value=True)
+    multiselect_options = selected_df.columns[1:]
+
+    # If "Select All" is checked, select all available lines in the multiselect
+    if select_all:
+        selected_lines = list(multiselect_options)
+    else:
+        selected_lines = st.multiselect(
+            'Choose from the available rail or bus lines:',
+            options=multiselect_options, 
+            default=multiselect_options[:2]  
+        )
+
+    # Filter the data based on selected lines
+    if selected_lines:
+        filtered_data = selected_df.head()[['date'] + selected_lines]
+    else:
+        st.warning("No lines selected. Please select at least one rail or bus line.")
+        filtered_data = selected_df.head()[['date']]
+
+    # Display filtered data for transparency (only the preview rows are copied)
+    st.write("Filtered Data Preview:", filtered_data)
+
+    # Export the selected lines over a chosen date range
+    if selected_lines:
+        with st.expander("Export Selected Data"):
+            first_date, last_date = cube.daily.index[0].date(), cube.daily.index[-1].date()
+            export_range = st.date_input("Date range", value=(first_date, last_date),
+                                         min_value=first_date, max_value=last_date)
+            export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True,
+                                     format_func=lambda fmt: EXPORT_FORMATS[fmt][0])
+            if len(export_range) == 2:
+                start, end = export_range
+                st.download_button(
+                    "Download Selection",
+                    export_data(export_format, selected_lines, start, end),
+                    export_name(export_format, selected_lines, start, end),
+                    EXPORT_FORMATS[export_format][2],
+                    key='download-selection',
+                    on_click='ignore'
+                )
+            else:
+                st.info("Choose both a start and an end date to export the selection.")
+
+        daily_trends(selected_lines)
+
+    # Visualization 1: Correlation Between Rail and Bus Lines
+    st.title('Correlation Between Rail and Bus Lines')
+    if selected_lines:
+        with timed("in_depth.correlation"):
+            # Create a heatmap, slicing the correlation matrix for selected lines
+            fig_corr = cached_figure("correlation", lambda: charts.correlation_figure(select_correlations(
+                load_correlations(data_version, range_start, range_end, df), selected_lines)), selected_lines)
+            plotly_chart("in_depth.correlation", fig_corr, width='stretch')
+
+        # Rolling correlation of one line with the other selected lines
+        st.subheader("Rolling Correlation Over Time")
+        rolling_col1, rolling_col2 = st.columns([2, 1])
+        with rolling_col1:
+            reference_line = st.selectbox("Correlate this line with the other selected lines:", selected_lines)
+        with rolling_col2:
+            rolling_window = st.slider("Window (days)", min_value=30, max_value=365,
+                                       value=ROLLING_WINDOW, step=15)
+        other_lines = [line for line in selected_lines if line != reference_line]
+        if other_lines:
+            with timed("in_depth.rolling_correlation"):
+                def rolling_figure():
+                    rolling_df = load_rolling_correlation(data_version, rolling_window, df)[reference_line][other_lines]
+                    return charts.rolling_correlation_figure(rolling_df.loc[range_start:range_end])
+                fig_rolling = cached_figure("rolling_correlation", rolling_figure, other_lines,
+                                            reference_line, rolling_window)
+                plotly_chart("in_depth.rolling_correlation", fig_rolling, width='stretch')
+        else:
+            st.info("Select at least two lines to see how their correlation changes over time.")
+    else:
+        st.info("Visualizations will appear here once you select rail or bus lines.")
 
-# If "Select All" is checked, select all available lines in the multiselect
-if select_all:
-    selected_lines = list(multiselect_options)
-else:
-    selected_lines = st.multiselect(
-        'Choose from the available rail or bus lines:',
-        options=multiselect_options, 
-        default=multiselect_options[:2]  
-    )
+    # Insights section 
+    st.markdown("""
+        <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
+        <h3>Insights:</h3>
+        <ul style="list-style-type: none; padding-left: 0;">
+            <li><b>Moderate to Weak Correlation Between Bus and Rail Ridership:</b> The moderate to weak correlation between bus and rail ridership suggests that these modes might cater to different commuter needs or geographic areas. While buses may cover more localized or less accessible routes, rail services likely serve higher-density, long-distance commuters.</li>
+            <li><b>Improving Bus and Rail Connections:</b> Enhancing the integration between bus and rail services could improve the commuter experience. Streamlining transfers and creating seamless connections between buses and rail could make it easier for passengers to use both modes during their commute, reducing travel times and increasing overall system efficiency.</li>
+        </ul>
+        </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+     # Visualization 2: Weekday vs Weekend Ridership
+    st.title('Weekday vs Weekend Ridership')
+    if selected_lines:
+        with timed("in_depth.weekday_weekend"):
+            # Create a Plotly bar chart with tooltips of the ridership for weekdays and weekends
+            fig = cached_figure("weekday_weekend", lambda: charts.weekday_weekend_figure(
+                analytics.weekday_weekend_ridership(cube, selected_lines)), selected_lines)
+            plotly_chart("in_depth.weekday_weekend", fig, width='stretch')
+    else:
+        st.info("Visualizations will appear here once you select rail or bus lines.")
 
-# Filter the data based on selected lines
-if selected_lines:
-    filtered_data = selected_df[['date'] + selected_lines]  
-else:
-    st.warning("No lines selected. Please select at least one rail or bus line.")
-    filtered_data = selected_df[['date']]  
+    # Insights section
+    st.markdown("""
+        <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
+        <h3>Insights:</h3>
+        <ul style="list-style-type: none; padding-left: 0;">
+            <li><b>Weekday vs Weekend Ridership:</b> The analysis shows that weekday ridership is consistently higher across all transport modes compared to weekends, particularly during rush hours. This suggests that public transport is mainly used for commuting purposes during weekdays, with higher demand during peak morning and evening hours.</li>
+            <li><b>Potential for Adjusting Service Frequencies:</b> The difference in ridership between weekdays and weekends signals an opportunity to adjust service frequencies based on demand. For example, reducing the frequency of buses and rail services during weekends while maintaining high frequencies on weekdays could help reduce operational costs while ensuring service quality is maintained during peak hours.</li>
+        </ul>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # Working days vs holidays: mean daily ridership by day type, from the
+    # calendar's holiday and movement-control flags. Only the dates the
+    # calendar lists holidays for are compared.
+    st.title('Working Days vs Holidays')
+    data_dates = dataset.table.dates
+    shown_start, shown_end = range_start or data_dates[0], range_end or data_dates[-1]
+    covered_start, covered_end = covered_range(shown_start, shown_end)
+    calendar_start, calendar_end = covered_range()
+    if selected_lines:
+        compared_day_types = st.multiselect("Day types to compare:", list(DAY_TYPES),
+                                            default=['Working day', 'Public holiday', 'School holiday (working day)'])
+        if covered_start > covered_end:
+            st.info(f"The holiday calendar only covers {calendar_start:%d %b %Y} to {calendar_end:%d %b %Y}, "
+                    "outside the selected date range.")
+        elif compared_day_types:
+            with timed("in_depth.day_types"):
+                # The split is only computed when the figure for this data
+                # version, lines, range and day types isn't cached yet
+                def day_type_figure():
+                    day_type_means, _ = day_type_split(dataset.table, selected_lines, range_start, range_end,
+                                                       compared_day_types)
+                    return charts.day_type_figure(day_type_means)
+                fig_day_types = cached_figure("day_types", day_type_figure, selected_lines, *compared_day_types)
+                plotly_chart("in_depth.day_types", fig_day_types, width='stretch')
+                days_in_range = day_type_days(dataset.table, range_start, range_end, compared_day_types)
+            coverage = ""
+            if (covered_start, covered_end) != (shown_start, shown_end):
+                coverage = (f" Only {covered_start:%d %b %Y} to {covered_end:%d %b %Y} are compared: "
+                            "the holiday calendar lists no holidays outside these dates.")
+            school_gaps = school_holiday_gaps(covered_start, covered_end)
+            if school_gaps and 'School holiday (working day)' in compared_day_types:
+                coverage += (" School holidays are not listed for " +
+                             ", ".join(f"{first:%d %b %Y} to {last:%d %b %Y}" for first, last in school_gaps) +
+                             "; working days there count as ordinary working days.")
+            st.caption("Average ridership per day. Days in range: " +
+                       ", ".join(f"{day_type} {n:,}" for day_type, n in days_in_range.items()) + "." + coverage)
+        else:
+            st.info("Choose at least one day type to compare.")
+    else:
+        st.info("Visualizations will appear here once you select rail or bus lines.")
+
+    # Visualisation 3: Monthly Comparison of Average Ridership Across Transport Modes
+    st.title("Monthly Comparison of Average Ridership Across Transport Modes")
+    if selected_lines:
+        with timed("in_depth.monthly_modes"):
+            # A bar chart to compare the average ridership for each mode across all years
+            fig_bar = cached_figure("monthly_modes",
+                                    lambda: charts.monthly_mode_figure(analytics.monthly_mode_comparison(cube)))
+
+            # Plot the stacked bar chart
+            plotly_chart("in_depth.monthly_modes", fig_bar, width='stretch')
+    else:
+        st.info("Visualizations will appear here once you select rail or bus lines.")
 
-# Display filtered data for transparency 
-st.write("Filtered Data Preview:", filtered_data.head())
+    st.markdown("""
+        <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
+        <h3>Insights:</h3>
+        <ul style="list-style-type: none; padding-left: 0;">
+            <li><b>Rail vs. Bus Ridership:</b>
+                <ul style="list-style-type: none; padding-left: 0;">
+                    <li><b>Higher Ridership for Rail Modes (LRT, MRT):</b> Rail modes like LRT and MRT consistently show higher ridership compared to buses, suggesting a preference for rail due to its faster travel times, higher frequency, and direct routes in urban areas.</li>
+                    <li><b>Bus Ridership vs Rail:</b> Although buses are crucial for connecting areas not served by rail, they generally show lower ridership. This could be due to longer travel times, lower frequency, and less predictable schedules compared to rail.</li>
+                </ul>
+            </li>
+            <li><b>Monthly Ridership Trends:</b>
+                <ul style="list-style-type: none; padding-left: 0;">
+                    <li><b>December Peak:</b> December sees the highest ridership across all transport modes, likely driven by year-end holidays and school vacations, when travel demand is higher.</li>
+                    <li><b>April Low:</b> April shows the lowest ridership, which may be due to fewer holidays and a lull in travel demand compared to other months.</li>
+                </ul>
+            </li>
+            <li><b>Mode Performance Across Months:</b>
+                <ul style="list-style-type: none; padding-left: 0;">
+                    <li><b>LRT Leading:</b> LRT consistently leads in ridership across all months, indicating its high demand in urban areas.</li>
+                    <li><b>KTM Intercity Low:</b> KTM Intercity consistently records the lowest ridership, reflecting its more regional focus compared to urban-centric modes like LRT and MRT.</li>
+                </ul>
+            </li>
+        </ul>
+        </div>
+    """, unsafe_allow_html=True)
+    st.markdown("<br>", unsafe_allow_html=True)     
+
+    # Visualisation 4: Yearly Comparison of Average Ridership Across Transport Modes
+    st.title("Yearly Comparison of Average Ridership Across Transport Modes")
+    if selected_lines:
+        with timed("in_depth.yearly_modes"):
+            # A bar chart to compare the average ridership for each mode across all months in each year
+            fig_bar_yearly = cached_figure("yearly_modes",
+                                           lambda: charts.yearly_mode_figure(analytics.yearly_mode_comparison(cube)))
+
+            # Plot the grouped bar chart
+            plotly_chart("in_depth.yearly_modes", fig_bar_yearly, width='stretch')
+    else:
+        st.info("Visualizations will appear here once you select rail or bus lines.")
 
-# Visualization 1: Correlation Between Rail and Bus Lines
-st.title('Correlation Between Rail and Bus Lines')
-if selected_lines:
-    # Compute the correlation matrix for selected lines
-    correlation_matrix = selected_df[selected_lines].corr()
-    
-    # Create a heatmap
-    fig_corr = go.Figure(data=go.Heatmap(
-        z=correlation_matrix.values,
-        x=correlation_matrix.columns,
-        y=correlation_matrix.columns,
-        colorscale='RdBu',
-        colorbar=dict(title='Correlation'),
-        hoverongaps=False,
-        hovertemplate='Correlation: %{z:.2f}<br>X: %{x}<br>Y: %{y}<extra></extra>'))
-
-    # Update layout
-    fig_corr.update_layout(
-        xaxis_title="Transport Modes",
-        yaxis_title="Transport Modes",
-        height=600,
-        width=800,
-    )
-    st.plotly_chart(fig_corr, use_container_width=True)
-else:
-    st.info("Visualizations will appear here once you select rail or bus lines.")
-
-# Insights section 
-st.markdown("""
-    <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-    <h3>Insights:</h3>
-    <ul style="list-style-type: none; padding-left: 0;">
-        <li><b>Moderate to Weak Correlation Between Bus and Rail Ridership:</b> The moderate to weak correlation between bus and rail ridership suggests that these modes might cater to different commuter needs or geographic areas. While buses may cover more localized or less accessible routes, rail services likely serve higher-density, long-distance commuters.</li>
-        <li><b>Improving Bus and Rail Connections:</b> Enhancing the integration between bus and rail services could improve the commuter experience. Streamlining transfers and creating seamless connections between buses and rail could make it easier for passengers to use both modes during their commute, reducing travel times and increasing overall system efficiency.</li>
-    </ul>
-    </div>
-""", unsafe_allow_html=True)
+    # Insights
+    st.markdown("""
+        <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
+        <h3>Insights:</h3>
+
+        <!-- Trends Over Time -->
+        <h4>Trends Over Time:</h4>
+        <ul style="list-style-type: none; padding-left: 0;">
+            <li><b>Drastic Decline from 2019 to 2020:</b> A significant decrease in ridership is observed across all transport modes in 2020, primarily due to the COVID-19 pandemic, which led to lockdowns and reduced demand for public transportation.</li>
+            <li><b>Continued Decline from 2020 to 2021:</b> Despite the easing of restrictions, ridership remained subdued in 2021, as people were still hesitant to travel and public transport services were limited.</li>
+            <li><b>Recovery in 2022:</b> Ridership saw a significant rebound in 2022, following the lifting of travel restrictions and the reopening of the country, leading to increased commuting and regional travel.</li>
+            <li><b>Year-on-Year Growth from 2022 to 2024:</b> Ridership continued to grow steadily in 2023 and 2024, driven by the gradual recovery of the economy, improved confidence in public transport, and the continued expansion of rail networks like MRT and LRT.</li>
+        </ul>
+
+        <!-- Transport Mode Performance -->
+        <h4>Transport Mode Performance:</h4>
+        <ul style="list-style-type: none; padding-left: 0;">
+            <li><b>LRT:</b> Leads in ridership, with approximately 659.17M passengers.</li>
+            <li><b>MRT:</b> Ranked second, but has the highest bounce rate of 37.5%.</li>
+            <li><b>KTM Intercity:</b> Records the lowest ridership among the rail services.</li>
+            <li><b>Rapid Bus (Kuantan):</b> Shows the lowest ridership among bus services.</li>
+        </ul>
+
+        </div>
+    """, unsafe_allow_html=True)
+    metrics.flush()
+
+in_depth_analysis()
 
 st.markdown("<br>", unsafe_allow_html=True)
 
- # Visualization 2: Weekday vs Weekend Ridership
-st.title('Weekday vs Weekend Ridership')
-if selected_lines:
-    # Classify days as Weekday or Weekend
-    df['day_of_week'] = df['date'].dt.day_name()
-    weekday_df = df[df['day_of_week'].isin(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])]
-    weekend_df = df[df['day_of_week'].isin(['Saturday', 'Sunday'])]
-    
-    # Calculate ridership for weekdays and weekends
-    weekday_ridership = weekday_df[selected_lines].sum(axis=0)
-    weekend_ridership = weekend_df[selected_lines].sum(axis=0)
-    
-    # Create a DataFrame for comparison
-    comparison_df = pd.DataFrame({'Weekday': weekday_ridership, 'Weekend': weekend_ridership})
-    
-    # Reshape the DataFrame 
-    comparison_df = comparison_df.reset_index()
-    comparison_df = comparison_df.rename(columns={'index': 'Transport Mode'})
-    comparison_df_melted = comparison_df.melt(id_vars=['Transport Mode'], value_vars=['Weekday', 'Weekend'], var_name='DayType', value_name='Ridership')
-    
-    # Create a Plotly bar chart with tooltips
-    fig = px.bar(
-        comparison_df_melted,
-        x='Transport Mode',
-        y='Ridership',
-        color='DayType',
-        color_discrete_map={'Weekday': '#004c8c', 'Weekend': '#eb6060'},
-        labels={'Ridership': 'Ridership', 'Transport Mode': 'Transport Mode'},
-        hover_data={'Transport Mode': True, 'Ridership': True, 'DayType': True}
-    )
-    st.plotly_chart(fig, use_container_width=True)
-else:
-    st.info("Visualizations will appear here once you select rail or bus lines.")
-
-# Insights section
-st.markdown("""
-    <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-    <h3>Insights:</h3>
-    <ul style="list-style-type: none; padding-left: 0;">
-        <li><b>Weekday vs Weekend Ridership:</b> The analysis shows that weekday ridership is consistently higher across all transport modes compared to weekends, particularly during rush hours. This suggests that public transport is mainly used for commuting purposes during weekdays, with higher demand during peak morning and evening hours.</li>
-        <li><b>Potential for Adjusting Service Frequencies:</b> The difference in ridership between weekdays and weekends signals an opportunity to adjust service frequencies based on demand. For example, reducing the frequency of buses and rail services during weekends while maintaining high frequencies on weekdays could help reduce operational costs while ensuring service quality is maintained during peak hours.</li>
-    </ul>
-    </div>
-""", unsafe_allow_html=True)
-
-# Visualisation 3: Monthly Comparison of Average Ridership Across Transport Modes
-st.title("Monthly Comparison of Average Ridership Across Transport Modes")
-if selected_lines:
-    # Separate the transport modes 
-    bus_columns = ['bus_rkl', 'bus_rkn', 'bus_rpn']
-    lrt_columns = ['rail_lrt_ampang', 'rail_lrt_kj']
-    mrt_columns = ['rail_mrt_kajang', 'rail_mrt_pjy']
-    monorail_columns = ['rail_monorail']
-    ets_columns = ['rail_ets']
-    intercity_columns = ['rail_intercity']
-    komuter_columns = ['rail_komuter_utara', 'rail_komuter', 'rail_tebrau']
-
-    # Group by month and calculate the sum 
-    bus_ridership = df.groupby(['month'])[bus_columns].sum()
-    lrt_ridership = df.groupby(['month'])[lrt_columns].sum()
-    mrt_ridership = df.groupby(['month'])[mrt_columns].sum()
-    monorail_ridership = df.groupby(['month'])[monorail_columns].sum()
-    ets_ridership = df.groupby(['month'])[ets_columns].sum()
-    intercity_ridership = df.groupby(['month'])[intercity_columns].sum()
-    komuter_ridership = df.groupby(['month'])[komuter_columns].sum()
-
-    # Calculate the average ridership for each mode across all years
-    average_bus_ridership = bus_ridership.sum(axis=1)/len(df['year'].unique())
-    average_lrt_ridership = lrt_ridership.sum(axis=1)/len(df['year'].unique())
-    average_mrt_ridership = mrt_ridership.sum(axis=1)/len(df['year'].unique())
-    average_monorail_ridership = monorail_ridership.sum(axis=1)/len(df['year'].unique())
-    average_ets_ridership = ets_ridership.sum(axis=1)/len(df['year'].unique())
-    average_intercity_ridership = intercity_ridership.sum(axis=1)/len(df['year'].unique())
-    average_komuter_ridership = komuter_ridership.sum(axis=1)/len(df['year'].unique())
-    
-    # Combine all ridership data 
-    ridership_comparison = pd.DataFrame({
-        'month': bus_ridership.index,
-        'Bus': average_bus_ridership,
-        'LRT': average_lrt_ridership,
-        'MRT': average_mrt_ridership,
-        'Monorial': average_monorail_ridership,
-        'ETS': average_ets_ridership,
-        'Intercity': average_intercity_ridership,
-        'Komuter': average_komuter_ridership
-    })
-
-   # A bar chart to compare the average ridership for different transport modes over time
-    fig_bar = px.bar(ridership_comparison, 
-                     x='month', 
-                     y=['Bus', 'LRT', 'MRT',
-                        'Monorial', 'ETS', 'Intercity', 
-                        'Komuter'],
-                     labels={'value': 'Average Ridership', 'month': 'Month'},
-                      color_discrete_sequence=px.colors.qualitative.Set1)
-
-    # Chart Layout
-    fig_bar.update_layout(
-        barmode='stack',  
-        xaxis_title="Month",
-        yaxis_title="Ridership",
-        height=600,
-        width=900
-    )
-
-    # Update
-    fig_bar.update_xaxes(tickmode='array',
-                         tickvals=ridership_comparison.index,
-                         ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
-
-    # Plot the stacked bar chart
-    st.plotly_chart(fig_bar, use_container_width=True)
-else:
-    st.info("Visualizations will appear here once you select rail or bus lines.")
-
-st.markdown("""
-    <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-    <h3>Insights:</h3>
-    <ul style="list-style-type: none; padding-left: 0;">
-        <li><b>Rail vs. Bus Ridership:</b>
-            <ul style="list-style-type: none; padding-left: 0;">
-                <li><b>Higher Ridership for Rail Modes (LRT, MRT):</b> Rail modes like LRT and MRT consistently show higher ridership compared to buses, suggesting a preference for rail due to its faster travel times, higher frequency, and direct routes in urban areas.</li>
-                <li><b>Bus Ridership vs Rail:</b> Although buses are crucial for connecting areas not served by rail, they generally show lower ridership. This could be due to longer travel times, lower frequency, and less predictable schedules compared to rail.</li>
-            </ul>
-        </li>
-        <li><b>Monthly Ridership Trends:</b>
-            <ul style="list-style-type: none; padding-left: 0;">
-                <li><b>December Peak:</b> December sees the highest ridership across all transport modes, likely driven by year-end holidays and school vacations, when travel demand is higher.</li>
-                <li><b>April Low:</b> April shows the lowest ridership, which may be due to fewer holidays and a lull in travel demand compared to other months.</li>
-            </ul>
-        </li>
-        <li><b>Mode Performance Across Months:</b>
-            <ul style="list-style-type: none; padding-left: 0;">
-                <li><b>LRT Leading:</b> LRT consistently leads in ridership across all months, indicating its high demand in urban areas.</li>
-                <li><b>KTM Intercity Low:</b> KTM Intercity consistently records the lowest ridership, reflecting its more regional focus compared to urban-centric modes like LRT and MRT.</li>
-            </ul>
-        </li>
-    </ul>
-    </div>
-""", unsafe_allow_html=True)
-st.markdown("<br>", unsafe_allow_html=True)     
-
-# Visualisation 4: Yearly Comparison of Average Ridership Across Transport Modes
-st.title("Yearly Comparison of Average Ridership Across Transport Modes")
-if selected_lines:
-    # Group by year and calculate the sum for each transport mode
-    bus_ridership_yearly = df.groupby(['year'])[bus_columns].sum()
-    lrt_ridership_yearly = df.groupby(['year'])[lrt_columns].sum()
-    mrt_ridership_yearly = df.groupby(['year'])[mrt_columns].sum()
-    monorail_ridership_yearly = df.groupby(['year'])[monorail_columns].sum()
-    ets_ridership_yearly = df.groupby(['year'])[ets_columns].sum()
-    intercity_ridership_yearly = df.groupby(['year'])[intercity_columns].sum()
-    komuter_ridership_yearly = df.groupby(['year'])[komuter_columns].sum()
-
-    # Calculate the average ridership for each mode across all months in each year
-    average_bus_ridership_yearly = bus_ridership_yearly.sum(axis=1)/12
-    average_lrt_ridership_yearly = lrt_ridership_yearly.sum(axis=1)/12
-    average_mrt_ridership_yearly = mrt_ridership_yearly.sum(axis=1)/12
-    average_monorail_ridership_yearly = monorail_ridership_yearly.sum(axis=1)/12
-    average_ets_ridership_yearly = ets_ridership_yearly.sum(axis=1)/12
-    average_intercity_ridership_yearly = intercity_ridership_yearly.sum(axis=1)/12
-    average_komuter_ridership_yearly = komuter_ridership_yearly.sum(axis=1)/12
-    
-    # Combine all yearly ridership data
-    ridership_comparison_yearly = pd.DataFrame({
-        'year': bus_ridership_yearly.index,
-        'Bus': average_bus_ridership_yearly,
-        'LRT': average_lrt_ridership_yearly,
-        'MRT': average_mrt_ridership_yearly,
-        'Monorial': average_monorail_ridership_yearly,
-        'ETS': average_ets_ridership_yearly,
-        'Intercity': average_intercity_ridership_yearly,
-        'Komuter': average_komuter_ridership_yearly
-    })
-
-    # A bar chart to compare the average ridership for different transport modes across years
-    fig_bar_yearly = px.bar(ridership_comparison_yearly, 
-                            x='year', 
-                            y=['Bus', 'LRT', 'MRT',
-                               'Monorial', 'ETS', 'Intercity', 
-                               'Komuter'],
-                            labels={'value': 'Average Ridership', 'year': 'Year'},
-                            color_discrete_sequence=px.colors.qualitative.Set1)
-
-    # Chart Layout for yearly comparison
-    fig_bar_yearly.update_layout(
-        barmode='group',  
-        xaxis_title="Year",
-        yaxis_title="Ridership",
-        height=600,
-        width=900
-    )
-
-    # Plot the grouped bar chart
-    st.plotly_chart(fig_bar_yearly, use_container_width=True)
-else:
-    st.info("Visualizations will appear here once you select rail or bus lines.")
-
-# Insights
-st.markdown("""
-    <div style="background-color:#f7f7f7; padding:10px; border-radius:8px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">
-    <h3>Insights:</h3>
-    
-    <!-- Trends Over Time -->
-    <h4>Trends Over Time:</h4>
-    <ul style="list-style-type: none; padding-left: 0;">
-        <li><b>Drastic Decline from 2019 to 2020:</b> A significant decrease in ridership is observed across all transport modes in 2020, primarily due to the COVID-19 pandemic, which led to lockdowns and reduced demand for public transportation.</li>
-        <li><b>Continued Decline from 2020 to 2021:</b> Despite the easing of restrictions, ridership remained subdued in 2021, as people were still hesitant to travel and public transport services were limited.</li>
-        <li><b>Recovery in 2022:</b> Ridership saw a significant rebound in 2022, following the lifting of travel restrictions and the reopening of the country, leading to increased commuting and regional travel.</li>
-        <li><b>Year-on-Year Growth from 2022 to 2024:</b> Ridership continued to grow steadily in 2023 and 2024, driven by the gradual recovery of the economy, improved confidence in public transport, and the continued expansion of rail networks like MRT and LRT.</li>
-    </ul>
-
-    <!-- Transport Mode Performance -->
-    <h4>Transport Mode Performance:</h4>
-    <ul style="list-style-type: none; padding-left: 0;">
-        <li><b>LRT:</b> Leads in ridership, with approximately 659.17M passengers.</li>
-        <li><b>MRT:</b> Ranked second, but has the highest bounce rate of 37.5%.</li>
-        <li><b>KTM Intercity:</b> Records the lowest ridership among the rail services.</li>
-        <li><b>Rapid Bus (Kuantan):</b> Shows the lowest ridership among bus services.</li>
-    </ul>
-    
-    </div>
-""", unsafe_allow_html=True)
-
+# State drill-down for regional planners: KPIs, trends and the weekday/weekend
+# split of the lines in one state, over the date range chosen above. It runs as
+# a fragment, so switching states reruns only this section.
+@st.fragment
+def state_drilldown():
+    st.header("State Drill-Down")
+    states = load_state_aggregates(data_version, dataset.table)
+    state = st.radio("State", states.states, horizontal=True)
+    state_lines = states.lines(state)
+    st.caption("Lines: " + ", ".join(REGISTRY.labels[line] for line in state_lines))
+
+    with timed("state.kpis"):
+        state_cube = states.cube(state, range_start, range_end)
+        state_peak, state_peak_date = analytics.peak_ridership(state_cube)
+        state_growth_rate = analytics.latest_growth_rate(state_cube)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown("**Total Ridership:**")
+            st.markdown(f"<h3 style='color: #4CAF50;'>{format_number(analytics.total_ridership(state_cube))} trips</h3>", unsafe_allow_html=True)
+        with col2:
+            st.markdown("**Average Ridership per Day:**")
+            st.markdown(f"<h3>{format_number(analytics.avg_ridership_per_day(state_cube))} trips</h3>", unsafe_allow_html=True)
+        with col3:
+            st.markdown("**Growth Rate:**")
+            st.markdown(growth_rate_html(state_growth_rate), unsafe_allow_html=True)
+        with col4:
+            st.markdown("**Peak Ridership:**")
+            st.markdown(f"<h3>{format_number(state_peak)} trips</h3>", unsafe_allow_html=True)
+            st.caption(f"Occurred on: {state_peak_date.strftime('%B %d, %Y')}")
+
+    state_tab1, state_tab2, state_tab3 = st.tabs(["Yearly", "Monthly", "Weekday vs Weekend"])
+    with state_tab1, timed("state.yearly"):
+        fig_state_yearly = cached_figure("state.yearly", lambda: charts.yearly_figure(
+            analytics.yearly_ridership(state_cube)), state_lines)
+        plotly_chart("state.yearly", fig_state_yearly, width='stretch')
+    with state_tab2, timed("state.monthly"):
+        fig_state_monthly = cached_figure("state.monthly", lambda: charts.monthly_figure(
+            analytics.monthly_average_ridership(state_cube)), state_lines)
+        plotly_chart("state.monthly", fig_state_monthly, width='stretch')
+    with state_tab3, timed("state.weekday_weekend"):
+        fig_state_split = cached_figure("state.weekday_weekend", lambda: charts.weekday_weekend_figure(
+            analytics.weekday_weekend_ridership(state_cube, state_lines)), state_lines)
+        plotly_chart("state.weekday_weekend", fig_state_split, width='stretch')
+
+    # All states side by side over the same range
+    with st.expander("Compare States"), timed("state.summary"):
+        st.dataframe(states.summary(range_start, range_end), width='stretch',
+                     column_config={"total_ridership": st.column_config.NumberColumn("Total Ridership", format="%.0f"),
+                                    "avg_ridership_per_day": st.column_config.NumberColumn("Average Ridership per Day", format="%.0f"),
+                                    "growth_rate": st.column_config.NumberColumn("Growth Rate", format="%.2f%%"),
+                                    "peak_ridership": st.column_config.NumberColumn("Peak Ridership", format="%.0f"),
+                                    "peak_date": st.column_config.DateColumn("Peak Date")})
+    metrics.flush()
+
+state_drilldown()
+
+# Debug panel with the per-section timings, hidden unless the page is opened
+# with ?debug=perf. It runs as a fragment so it can be refreshed after the
+# in-depth sections rerun on their own.
+@st.fragment
+def performance_panel():
+    with st.expander("Performance", expanded=True):
+        st.button("Refresh", key="refresh-metrics")
+        st.dataframe(metrics.summary(), hide_index=True, width='stretch',
+                     column_config={column: st.column_config.NumberColumn(format="%.1f")
+                                    for column in ['p50_ms', 'p95_ms', 'last_ms', 'rss_delta_mib']})
+        st.caption(f"Process-wide over the last {metrics.window:,} runs of each section. "
+                   f"Logged to {metrics.log_path} and {metrics.prometheus_path}.")
+        cache_stats = figures.stats()
+        st.caption(f"Figure cache: {cache_stats['entries']:,} figures, "
+                   f"{cache_stats['bytes'] / 1024 ** 2:.1f} of {cache_stats['max_bytes'] / 1024 ** 2:.0f} MiB; "
+                   f"{cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses "
+                   f"({cache_stats['hit_rate']:.0%}), {cache_stats['evictions']:,} evictions.")
+
+if st.query_params.get("debug") == "perf":
+    performance_panel()
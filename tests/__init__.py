@@ -0,0 +1 @@
+"""Tests of the ridership package (run with ``python -m pytest`` from the repository root)."""
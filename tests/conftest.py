@@ -0,0 +1,20 @@
+"""Shared fixtures: small synthetic tables shaped like the headline dataset."""
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_ridership_frame
+from ridership.cube import LINE_COLUMNS
+
+
+@pytest.fixture
+def ridership_df():
+    """Three years of daily ridership, with lines that open late and missing readings.
+
+    The first line only opens in the second year and a few readings of
+    another are missing, so the nullable paths are exercised too.
+    """
+    df = make_ridership_frame(n_rows=3 * 365, seed=1)
+    df.loc[:400, LINE_COLUMNS[0]] = np.nan
+    df.loc[[30, 31, 500, 777], LINE_COLUMNS[1]] = np.nan
+    return df
+
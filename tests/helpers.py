@@ -0,0 +1,21 @@
+"""Assertions shared by the tests."""
+import numpy as np
+import pytest
+
+from ridership.cube import RidershipCube
+
+
+def assert_cubes_equal(actual, expected):
+    """Every frame and series of two `RidershipCube`s equal, values and index alike."""
+    assert list(actual.lines) == list(expected.lines)
+    for field in RidershipCube.__dataclass_fields__:
+        if field in ('lines', 'peak'):
+            continue
+        left, right = getattr(actual, field), getattr(expected, field)
+        np.testing.assert_allclose(left.to_numpy(dtype=float), right.to_numpy(dtype=float), rtol=1e-12,
+                                   err_msg=field)
+        assert left.index.equals(right.index), field
+        if hasattr(left, 'columns'):
+            assert list(left.columns) == list(right.columns), field
+    assert actual.peak[0] == pytest.approx(expected.peak[0])
+    assert actual.peak[1] == expected.peak[1]
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ridership.anomalies import (LEVEL_WINDOW, MAD_SCALE, SCALE_WINDOW, SEASONAL_WEEKS, AnomalyDetector,
+                                 score_days)
+from ridership.cube import LINE_COLUMNS
+from ridership.table import RidershipTable
+
+
+def reference_scores(values):
+    """The baseline and robust z-scores computed one line and one day at a time."""
+    n_days, n_lines = values.shape
+    baseline = np.full(values.shape, np.nan)
+    scores = np.full(values.shape, np.nan)
+
+    def median(window, min_periods):
+        window = window[~np.isnan(window)]
+        return np.median(window) if len(window) >= min_periods else np.nan
+
+    for j in range(n_lines):
+        level = np.array([median(values[max(t - LEVEL_WINDOW, 0):t, j], LEVEL_WINDOW // 2)
+                          for t in range(n_days)])
+        level[~(level > 0)] = np.nan
+        ratio = values[:, j] / level
+        for t in range(n_days):
+            same_weekday = [ratio[t - 7 * k] for k in range(1, SEASONAL_WEEKS + 1) if t - 7 * k >= 0]
+            expected = level[t] * median(np.array(same_weekday), SEASONAL_WEEKS // 2)
+            baseline[t, j] = expected if expected > 0 else np.nan
+        deviation = values[:, j] / baseline[:, j] - 1
+        for t in range(n_days):
+            window = deviation[max(t - SCALE_WINDOW, 0):t]
+            window = window[~np.isnan(window)]
+            if len(window) < SCALE_WINDOW // 2:
+                continue
+            centre = np.median(window)
+            mad = np.median(np.abs(window - centre))
+            if mad > 0:
+                scores[t, j] = (deviation[t] - centre) / (MAD_SCALE * mad)
+    return baseline, scores
+
+
+def test_scores_match_a_per_line_loop(ridership_df):
+    values = ridership_df[LINE_COLUMNS[:3]].iloc[:400].to_numpy(dtype=float)
+    baseline, scores = score_days(values)
+    expected_baseline, expected_scores = reference_scores(values)
+    np.testing.assert_allclose(baseline, expected_baseline, rtol=1e-12)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-9)
+    assert np.isfinite(scores).sum() > 0
+
+
+def test_an_injected_spike_is_flagged(ridership_df):
+    spiked = ridership_df.copy()
+    day = spiked['date'].iloc[600]
+    spiked.loc[600, LINE_COLUMNS[3]] *= 5
+    flagged = AnomalyDetector().update(spiked).flagged([LINE_COLUMNS[3]], day, day)
+    assert list(flagged['line']) == [LINE_COLUMNS[3]]
+    assert flagged['score'].iloc[0] > 10
+
+
+def assert_same_scores(actual, expected):
+    assert actual.dates.equals(expected.dates)
+    np.testing.assert_array_equal(actual.baseline, expected.baseline)
+    np.testing.assert_array_equal(actual.scores, expected.scores)
+
+
+@pytest.mark.parametrize('n_new', [1, 30, 200])
+def test_appended_days_match_a_full_rescore(ridership_df, n_new):
+    detector = AnomalyDetector()
+    detector.update(RidershipTable(ridership_df.iloc[:-n_new]), 'v1')
+    assert_same_scores(detector.update(RidershipTable(ridership_df), 'v2'),
+                       AnomalyDetector().update(ridership_df))
+
+
+def test_corrected_and_removed_days_match_a_full_rescore(ridership_df):
+    detector = AnomalyDetector()
+    detector.update(ridership_df, 'v1')
+
+    corrected = ridership_df.copy()
+    corrected.loc[len(corrected) - 100, LINE_COLUMNS[5]] = 0
+    assert_same_scores(detector.update(corrected, 'v2'), AnomalyDetector().update(corrected))
+
+    shortened = corrected.iloc[:-10]
+    assert_same_scores(detector.update(shortened, 'v3'), AnomalyDetector().update(shortened))
+
+
+def test_missing_dates_become_empty_days(ridership_df):
+    with_gap = ridership_df.drop(index=range(300, 305))
+    anomalies = AnomalyDetector().update(with_gap.reset_index(drop=True))
+    assert anomalies.dates.equals(pd.DatetimeIndex(ridership_df['date']))
+    assert np.isnan(anomalies.values[300:305]).all()
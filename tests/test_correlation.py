@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ridership.correlation import correlation_matrix, rolling_correlation, select_correlations
+
+LINES = ['a', 'b', 'c', 'd']
+
+
+@pytest.fixture
+def lines_df():
+    """Correlated daily series with gaps, including a line that opens late."""
+    rng = np.random.default_rng(3)
+    n = 400
+    common = rng.normal(size=n).cumsum()
+    df = pd.DataFrame({'date': pd.date_range('2022-01-01', periods=n, freq='D')})
+    for i, line in enumerate(LINES):
+        df[line] = 1e5 + 1e3 * (common * (i - 1.5) + rng.normal(scale=2 + i, size=n))
+    df.loc[rng.choice(n, 40, replace=False), 'b'] = np.nan
+    df.loc[:150, 'd'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('window, min_periods', [(30, None), (90, 20)])
+def test_rolling_correlation_matches_pandas(lines_df, window, min_periods):
+    result = rolling_correlation(lines_df, LINES, window, min_periods)
+    indexed = lines_df.set_index('date')
+    for line in LINES:
+        for other in LINES:
+            if other == line:
+                continue
+            expected = indexed[line].rolling(window, min_periods=min_periods or window).corr(indexed[other])
+            np.testing.assert_allclose(result[(line, other)].to_numpy(), expected.to_numpy(),
+                                       rtol=1e-7, atol=1e-9, err_msg=f'{line}/{other}')
+
+
+def test_selected_correlations_match_correlating_the_selection(lines_df):
+    matrix = correlation_matrix(lines_df, LINES)
+    selection = ['d', 'a']
+    pd.testing.assert_frame_equal(select_correlations(matrix, selection),
+                                  correlation_matrix(lines_df, selection))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_ridership_frame
+from ridership.cube import LINE_COLUMNS, IncrementalCube, build_cube, changed_dates, update_cube
+from ridership.data import compact_ridership
+from tests.helpers import assert_cubes_equal
+
+
+@pytest.mark.parametrize('n_new', [1, 7, 45])
+def test_update_with_appended_days_matches_rebuild(ridership_df, n_new):
+    previous = build_cube(ridership_df.iloc[:-n_new])
+    assert_cubes_equal(update_cube(previous, ridership_df), build_cube(ridership_df))
+
+
+def test_update_with_corrected_days_matches_rebuild(ridership_df):
+    previous = build_cube(ridership_df)
+    corrected = ridership_df.copy()
+    corrected.loc[len(corrected) - 10, LINE_COLUMNS[2]] += 1000
+    corrected.loc[len(corrected) - 3, LINE_COLUMNS[4]] = np.nan
+
+    assert list(changed_dates(previous, corrected)) == list(corrected['date'].iloc[[-10, -3]])
+    assert_cubes_equal(update_cube(previous, corrected), build_cube(corrected))
+
+
+def test_update_with_removed_days_matches_rebuild(ridership_df):
+    previous = build_cube(ridership_df)
+    shortened = ridership_df.iloc[:-5]
+    assert_cubes_equal(update_cube(previous, shortened), build_cube(shortened))
+
+
+def test_update_without_changes_returns_the_same_cube(ridership_df):
+    previous = build_cube(ridership_df)
+    assert update_cube(previous, ridership_df) is previous
+
+
+def test_update_of_compact_table_matches_rebuild(ridership_df):
+    compact = compact_ridership(ridership_df)
+    previous = build_cube(compact.iloc[:-20])
+    assert_cubes_equal(update_cube(previous, compact), build_cube(ridership_df))
+
+
+def test_incremental_cube_follows_versions(ridership_df):
+    ingest = IncrementalCube()
+    first = ingest.ingest(ridership_df.iloc[:-30], 'v1')
+    assert ingest.ingest(ridership_df.iloc[:-30], 'v1') is first
+    assert_cubes_equal(ingest.ingest(ridership_df, 'v2'), build_cube(ridership_df))
+
+
+def test_years_past_int16_stay_in_order():
+    # The 10,000x benchmark history runs this far; the year keys must neither
+    # wrap around nor leave the cube unsorted for update_cube's prefix slices
+    df = make_ridership_frame(n_rows=400, start=np.datetime64('32767-06-01', 's'))
+    cube = build_cube(df)
+    assert list(cube.sums.index.unique(level='year')) == [32767, 32768]
+    assert cube.sums.index.is_monotonic_increasing
+    assert_cubes_equal(update_cube(build_cube(df.iloc[:-40]), df), cube)
@@ -0,0 +1,72 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+from ridership.data import InvalidParquetError, date_bounds, fetch_parquet, load_ridership
+
+
+@pytest.fixture
+def parquet_file(tmp_path, ridership_df):
+    path = tmp_path / 'local.parquet'
+    ridership_df.to_parquet(path)
+    return path
+
+
+@pytest.fixture
+def server():
+    """A local HTTP server answering every GET with 200 and the bytes in `server.body`."""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(httpd.body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+    httpd.body = b''
+    httpd.url = f'http://127.0.0.1:{httpd.server_port}/ridership_headline.parquet'
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_a_page_that_is_not_parquet_is_not_cached(server, tmp_path):
+    server.body = b'<html>Sign in to the network</html>'
+    with pytest.raises(InvalidParquetError):
+        fetch_parquet(server.url, tmp_path / 'cache')
+    assert not (tmp_path / 'cache' / 'meta.json').exists()
+
+
+def test_a_page_that_is_not_parquet_keeps_the_cached_copy(server, tmp_path, parquet_file):
+    server.body = parquet_file.read_bytes()
+    cached = fetch_parquet(server.url, tmp_path / 'cache')
+    server.body = b'<html>Sign in to the network</html>'
+    assert fetch_parquet(server.url, tmp_path / 'cache') == cached
+
+
+def test_unreadable_cached_copy_falls_back_to_the_local_file(server, tmp_path, parquet_file, ridership_df):
+    cache = tmp_path / 'cache'
+    server.body = parquet_file.read_bytes()
+    fetch_parquet(server.url, cache)
+    meta = json.loads((cache / 'meta.json').read_text())
+    (cache / meta['file']).write_bytes(b'corrupt')
+    # Offline from here on
+    server.shutdown()
+    server.server_close()
+
+    df, _ = load_ridership(server.url, parquet_file, cache)
+    assert len(df) == len(ridership_df)
+
+
+def test_date_bounds(ridership_df):
+    dates = ridership_df['date']
+    assert date_bounds(dates) == (0, len(dates))
+    assert date_bounds(dates, dates[10], dates[19]) == (10, 20)
+    assert date_bounds(dates, '2000-01-01', '2000-12-31') == (0, 0)
+    assert date_bounds(dates, dates[19], dates[10]) == (19, 19)
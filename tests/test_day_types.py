@@ -0,0 +1,145 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ridership.cube import LINE_COLUMNS
+from ridership.day_types import (CALENDAR, MOVEMENT_CONTROL, PUBLIC_HOLIDAY, SCHOOL_HOLIDAY, WEEKDAY, WEEKEND,
+                                 HolidayCalendar, covered_range, day_type_days, day_type_split, load_calendar,
+                                 school_holiday_gaps)
+from ridership.table import RidershipTable
+
+CALENDAR_TOML = """
+first_date = 2024-01-01
+last_date = 2024-12-31
+
+[[school_holiday_coverage]]
+start = 2024-01-01
+end = 2024-03-31
+
+[[school_holiday_coverage]]
+start = 2024-07-01
+end = 2024-12-31
+
+[[public_holiday]]
+date = 2024-05-01
+name = "Labour Day"
+
+[[school_holiday]]
+start = 2024-03-09
+end = 2024-03-17
+name = "Term break"
+
+[[school_holiday]]
+start = 2024-03-15
+end = 2024-03-20
+name = "Overlapping break"
+
+[[movement_control]]
+start = 2024-04-29
+end = 2024-05-04
+name = "Closure"
+"""
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    path = tmp_path / 'calendar.toml'
+    path.write_text(CALENDAR_TOML)
+    return load_calendar(path)
+
+
+def flags_of(calendar, dates):
+    dates = pd.DatetimeIndex(dates)
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return calendar.flags(days, dates.dayofweek >= 5)
+
+
+def test_period_edges_are_inclusive(calendar):
+    dates = pd.date_range('2024-03-07', '2024-03-22')
+    in_school = (flags_of(calendar, dates) & SCHOOL_HOLIDAY) > 0
+    # Overlapping periods make one span, from the first start to the last end
+    expected = (dates >= '2024-03-09') & (dates <= '2024-03-20')
+    np.testing.assert_array_equal(in_school, expected)
+
+
+def test_in_periods_without_periods_is_all_false():
+    days = np.arange(19_000, 19_010)
+    assert not HolidayCalendar._in_periods(days, []).any()
+
+
+def test_bit_flags(calendar):
+    flags = flags_of(calendar, ['2024-04-30', '2024-05-01', '2024-05-04', '2024-05-06', '2024-03-16'])
+    assert list(flags) == [WEEKDAY | MOVEMENT_CONTROL,                   # Tuesday in the closure
+                           WEEKDAY | PUBLIC_HOLIDAY | MOVEMENT_CONTROL,  # Labour Day
+                           WEEKEND | MOVEMENT_CONTROL,                   # Saturday, last day of it
+                           WEEKDAY,                                      # after it
+                           WEEKEND | SCHOOL_HOLIDAY]                     # Saturday in the break
+    assert flags.dtype == np.uint8
+
+
+def test_table_day_flags_use_the_bundled_calendar():
+    dates = pd.date_range('2019-01-01', '2019-01-07')
+    table = RidershipTable(pd.DataFrame({'date': dates, LINE_COLUMNS[0]: np.ones(len(dates))}))
+    np.testing.assert_array_equal(table.column('day_flags'), flags_of(CALENDAR, dates))
+    assert table.column('day_flags')[0] & PUBLIC_HOLIDAY  # New Year's Day
+
+
+def test_covered_range_clips_to_the_calendar(calendar):
+    assert covered_range(calendar=calendar) == (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-12-31'))
+    assert covered_range('2023-06-01', '2024-02-01', calendar) == (pd.Timestamp('2024-01-01'),
+                                                                   pd.Timestamp('2024-02-01'))
+    start, end = covered_range('2025-01-01', '2025-06-30', calendar)
+    assert start > end
+
+
+def test_school_holiday_gaps(calendar):
+    assert school_holiday_gaps(calendar=calendar) == [(pd.Timestamp('2024-04-01'), pd.Timestamp('2024-06-30'))]
+    assert school_holiday_gaps('2024-05-01', '2024-05-31', calendar) == [(pd.Timestamp('2024-05-01'),
+                                                                          pd.Timestamp('2024-05-31'))]
+    assert school_holiday_gaps('2024-01-01', '2024-03-31', calendar) == []
+    assert school_holiday_gaps('2025-01-01', '2025-12-31', calendar) == []
+
+
+def test_school_coverage_defaults_to_the_calendar_range(tmp_path):
+    path = tmp_path / 'calendar.toml'
+    path.write_text('[[public_holiday]]\ndate = 2021-05-01\n')
+    calendar = load_calendar(path)
+    assert (calendar.first_date, calendar.last_date) == (date(2021, 1, 1), date(2021, 12, 31))
+    assert calendar.school_coverage == [(date(2021, 1, 1), date(2021, 12, 31))]
+    assert school_holiday_gaps(calendar=calendar) == []
+
+
+def test_day_type_split_matches_a_per_day_loop(ridership_df):
+    table = RidershipTable(ridership_df)
+    lines = LINE_COLUMNS[:4]
+    means, n_days = day_type_split(table, lines, '2019-03-01', '2020-06-30')
+
+    rows = ridership_df[(ridership_df['date'] >= '2019-03-01') & (ridership_df['date'] <= '2020-06-30')]
+    flags = flags_of(CALENDAR, rows['date'])
+    working = (flags & WEEKDAY > 0) & (flags & PUBLIC_HOLIDAY == 0)
+    holiday = flags & PUBLIC_HOLIDAY > 0
+    pd.testing.assert_series_equal(means['Working day'], rows.loc[working, lines].mean(),
+                                   check_names=False, check_index=False)
+    pd.testing.assert_series_equal(means['Public holiday'], rows.loc[holiday, lines].mean(),
+                                   check_names=False, check_index=False)
+    assert n_days['Working day'] == working.sum()
+    assert n_days['Public holiday'] == holiday.sum()
+    pd.testing.assert_series_equal(day_type_days(table, '2019-03-01', '2020-06-30'), n_days)
+
+
+def test_day_type_split_leaves_out_dates_past_the_calendar():
+    # Two years of ones, then two years of tens past the calendar's last date
+    dates = pd.date_range('2023-01-01', '2026-12-31')
+    values = np.where(dates <= pd.Timestamp(CALENDAR.last_date), 1.0, 10.0)
+    table = RidershipTable(pd.DataFrame({'date': dates, LINE_COLUMNS[0]: values}))
+
+    day_types = ['Working day', 'Weekend', 'Public holiday', 'School holiday (working day)']
+    means, n_days = day_type_split(table, LINE_COLUMNS[:1], day_types=day_types)
+    assert (means.to_numpy() == 1.0).all()
+    assert n_days['Weekend'] == ((dates.dayofweek >= 5) & (dates <= pd.Timestamp(CALENDAR.last_date))).sum()
+
+    means, n_days = day_type_split(table, LINE_COLUMNS[:1], '2025-01-01', '2026-12-31', day_types)
+    assert means.isna().all().all()
+    assert (n_days == 0).all()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ridership.cube import LINE_COLUMNS
+from ridership.downsample import DOWNSAMPLERS, downsample_lines, lttb, minmax
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64), rng.normal(size=n).cumsum()
+
+
+@pytest.mark.parametrize('method', list(DOWNSAMPLERS))
+@pytest.mark.parametrize('n, n_out', [(2192, 1200), (2192, 100), (1000, 999), (50, 4), (7, 6)])
+def test_downsampled_indices(method, n, n_out):
+    x, y = series(n)
+    keep = DOWNSAMPLERS[method](x, y, n_out)
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+    # minmax keeps pairs of points between the first and last
+    assert len(keep) == (n_out if method == 'lttb' else n_out - n_out % 2)
+
+
+@pytest.mark.parametrize('method', list(DOWNSAMPLERS))
+@pytest.mark.parametrize('n, n_out', [(100, 100), (100, 1200), (0, 10), (1, 10)])
+def test_short_series_are_returned_unchanged(method, n, n_out):
+    x, y = series(n)
+    np.testing.assert_array_equal(DOWNSAMPLERS[method](x, y, n_out), np.arange(n))
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    x, y = series(1000, seed=3)
+    keep = minmax(y, 102)
+    # 50 buckets of the 998 points between the first and last
+    bucket = (np.arange(1, 999) - 1) * 50 // 998
+    for b in range(50):
+        points = np.flatnonzero(bucket == b) + 1
+        assert points[np.argmin(y[points])] in keep
+        assert points[np.argmax(y[points])] in keep
+
+
+def test_minmax_of_a_flat_series_keeps_distinct_points():
+    keep = minmax(np.zeros(100), 10)
+    assert len(keep) == 10 and (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_spike():
+    x, y = np.arange(1000, dtype=np.float64), np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb(x, y, 50)
+
+
+def test_downsample_lines_drops_missing_days(ridership_df):
+    lines = LINE_COLUMNS[:2]
+    result = downsample_lines(ridership_df, lines, '2019-06-01', '2020-06-01', n_out=100)
+    assert list(result) == lines
+    for line in lines:
+        rows = ridership_df[(ridership_df['date'] >= '2019-06-01') & (ridership_df['date'] <= '2020-06-01')]
+        present = rows.dropna(subset=[line])
+        points = result[line]
+        assert not points.isna().any()
+        assert len(points) == min(100, len(present))
+        assert points.index.is_monotonic_increasing
+        assert points.index[0] == present['date'].iloc[0] and points.index[-1] == present['date'].iloc[-1]
+        pd.testing.assert_series_equal(points, present.set_index('date')[line].loc[points.index],
+                                       check_names=False, check_index_type=False, check_freq=False)
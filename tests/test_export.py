@@ -0,0 +1,85 @@
+import io
+
+import pandas as pd
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import pytest
+
+from ridership.cube import LINE_COLUMNS
+from ridership.data import compact_ridership
+from ridership.export import export_name, export_path, write_export
+
+
+@pytest.fixture
+def compact_df(ridership_df):
+    """The fixture table as `load_ridership` serves it, with nullable `UInt*` columns.
+
+    Dates are in milliseconds: Parquet has no seconds resolution, so that is
+    how they are read back.
+    """
+    df = compact_ridership(ridership_df.astype({'date': 'datetime64[ms]'}))
+    assert str(df[LINE_COLUMNS[0]].dtype).startswith('UInt')
+    assert df[LINE_COLUMNS[0]].isna().any()
+    return df
+
+
+def encode(df, fmt, chunk_rows):
+    fh = io.BytesIO()
+    write_export(df, fh, fmt, chunk_rows=chunk_rows)
+    return fh.getvalue()
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 100, 333, 10_000])
+def test_chunked_csv_has_one_header(ridership_df, chunk_rows):
+    text = encode(ridership_df, 'csv', chunk_rows).decode('utf-8')
+    header = ','.join(ridership_df.columns)
+    assert text.splitlines()[0] == header
+    assert text.count(header) == 1
+    assert text == ridership_df.to_csv(index=False)
+
+
+def test_csv_of_an_empty_table_is_its_header(ridership_df):
+    text = encode(ridership_df.iloc[:0], 'csv', 100).decode('utf-8')
+    assert text.splitlines() == [','.join(ridership_df.columns)]
+
+
+@pytest.mark.parametrize('chunk_rows', [100, 10_000])
+def test_parquet_round_trip_keeps_nullable_columns(compact_df, chunk_rows):
+    data = encode(compact_df, 'parquet', chunk_rows)
+    result = pq.read_table(io.BytesIO(data)).to_pandas()
+    pd.testing.assert_frame_equal(result, compact_df)
+
+
+@pytest.mark.parametrize('chunk_rows', [100, 10_000])
+def test_arrow_round_trip_keeps_nullable_columns(compact_df, chunk_rows):
+    data = encode(compact_df, 'arrow', chunk_rows)
+    result = pyarrow.ipc.open_file(io.BytesIO(data)).read_all().to_pandas()
+    pd.testing.assert_frame_equal(result, compact_df)
+
+
+def test_unknown_format_is_rejected(ridership_df):
+    with pytest.raises(ValueError):
+        encode(ridership_df, 'xlsx', 100)
+
+
+def test_export_path_is_cached_per_version(tmp_path, compact_df):
+    lines = LINE_COLUMNS[:3]
+    path = export_path(compact_df, 'parquet', 'v1', lines, '2020-01-01', '2020-12-31', export_dir=tmp_path)
+    result = pq.read_table(path).to_pandas()
+    assert list(result.columns) == ['date'] + lines
+    assert result['date'].min() == pd.Timestamp('2020-01-01')
+    assert result['date'].max() == pd.Timestamp('2020-12-31')
+
+    modified = path.stat().st_mtime_ns
+    again = export_path(compact_df, 'parquet', 'v1', lines, '2020-01-01', '2020-12-31', export_dir=tmp_path)
+    assert again == path and again.stat().st_mtime_ns == modified
+
+    # A new data version replaces the files of the old one
+    newer = export_path(compact_df, 'csv', 'v2', export_dir=tmp_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [newer.name]
+
+
+def test_export_name():
+    assert export_name('csv') == 'ridership_data.csv'
+    assert export_name('arrow', LINE_COLUMNS[:2], '2020-01-01', None) == \
+        'ridership_data_20200101_end_2_lines.arrow'
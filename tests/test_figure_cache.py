@@ -0,0 +1,96 @@
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+from ridership.figure_cache import LAYOUT_BYTES, TRACE_BYTES, FigureCache, estimate_size
+
+
+def figure(n_points):
+    """A one-trace figure whose estimated size grows with `n_points`."""
+    return go.Figure(go.Scatter(y=np.arange(n_points, dtype=np.float64)))
+
+
+def size_of(n_points):
+    return LAYOUT_BYTES + TRACE_BYTES + n_points * 8 * 4 // 3
+
+
+def builder(fig, calls):
+    def build():
+        calls.append(fig)
+        return fig
+    return build
+
+
+def test_estimate_size_of_numeric_traces():
+    assert estimate_size(figure(3000)) == size_of(3000)
+    assert estimate_size(go.Figure()) == LAYOUT_BYTES
+
+
+def test_estimate_size_is_close_to_the_json_size():
+    dates = np.arange('2019-01-01', '2024-12-31', dtype='datetime64[D]')
+    fig = go.Figure([go.Scatter(x=dates, y=np.random.default_rng(0).random(len(dates))),
+                     go.Bar(x=['Mon', 'Tue', 'Wed'], y=[1.0, 2.0, 3.0])])
+    assert estimate_size(fig) == pytest.approx(len(fig.to_json()), rel=0.5)
+
+
+def test_hits_and_misses_are_counted():
+    cache, calls = FigureCache(max_bytes=10 * size_of(100)), []
+    fig = figure(100)
+    assert cache.get_or_build('a', builder(fig, calls)) is fig
+    assert cache.get_or_build('a', builder(figure(100), calls)) is fig
+    assert cache.get_or_build('a', builder(figure(100), calls)) is fig
+    assert len(calls) == 1
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+    assert 'ridership_figure_cache_hits_total 2' in cache.prometheus_text()
+    assert 'ridership_figure_cache_misses_total 1' in cache.prometheus_text()
+
+
+def test_least_recently_used_figures_are_evicted_first():
+    cache, calls = FigureCache(max_bytes=3 * size_of(100)), []
+    for key in 'abc':
+        cache.get_or_build(key, builder(figure(100), calls))
+    cache.get_or_build('a', builder(figure(100), calls))   # 'b' is now the oldest
+    cache.get_or_build('d', builder(figure(100), calls))
+
+    assert len(cache) == 3 and cache.evictions == 1
+    calls.clear()
+    for key in 'acd':
+        cache.get_or_build(key, builder(figure(100), calls))
+    assert calls == []
+    cache.get_or_build('b', builder(figure(100), calls))
+    assert len(calls) == 1
+
+
+def test_cache_stays_within_its_byte_budget():
+    budget = 5 * size_of(100)
+    cache, calls = FigureCache(max_bytes=budget), []
+    rng = np.random.default_rng(0)
+    for key, n_points in enumerate(rng.integers(10, 1000, 50)):
+        cache.get_or_build(key, builder(figure(int(n_points)), calls))
+        assert cache.nbytes <= budget
+        assert cache.nbytes == sum(size for _, size in cache._entries.values())
+    assert cache.evictions > 0
+
+
+def test_figure_larger_than_the_budget_is_returned_but_not_cached():
+    cache, calls = FigureCache(max_bytes=2 * size_of(100)), []
+    cache.get_or_build('small', builder(figure(100), calls))
+    big = figure(10_000)
+    assert cache.get_or_build('big', builder(big, calls)) is big
+    assert cache.get_or_build('big', builder(big, calls)) is big
+    assert len(calls) == 3
+
+    # Nothing was evicted to make room for it
+    assert len(cache) == 1 and cache.evictions == 0
+    assert cache.nbytes == size_of(100)
+    assert cache.misses == 3
+
+
+def test_clear_empties_the_cache():
+    cache = FigureCache()
+    cache.get_or_build('a', lambda: figure(10))
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from ridership import metrics as metrics_module
+from ridership.metrics import SectionMetrics
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name + '{') or line.startswith(name + ' ')]
+
+
+def test_section_records_its_wall_time(tmp_path):
+    metrics = SectionMetrics(tmp_path)
+    with metrics.section('overview', data_version='v1'):
+        pass
+    with pytest.raises(RuntimeError), metrics.section('overview'):
+        raise RuntimeError('section failed')
+
+    summary = metrics.summary()
+    assert list(summary['section']) == ['overview']
+    assert summary.loc[0, 'count'] == 2
+    assert summary.loc[0, 'p50_ms'] >= 0
+
+
+def test_summary_is_sorted_by_p95(tmp_path):
+    metrics = SectionMetrics(tmp_path, window=10)
+    for seconds in [0.001] * 20:
+        metrics.record('fast', seconds)
+    for seconds in [0.2, 0.4]:
+        metrics.record('slow', seconds)
+    summary = metrics.summary()
+    assert list(summary['section']) == ['slow', 'fast']
+    assert summary.loc[0, 'last_ms'] == pytest.approx(400)
+    # The count covers every run; the quantiles only the window
+    assert summary.loc[1, 'count'] == 20
+    assert summary.loc[1, 'p95_ms'] == pytest.approx(1)
+
+
+def test_empty_summary_has_its_columns(tmp_path):
+    assert list(SectionMetrics(tmp_path).summary().columns) == \
+        ['section', 'count', 'p50_ms', 'p95_ms', 'last_ms', 'rss_delta_mib']
+
+
+def test_prometheus_text(tmp_path):
+    metrics = SectionMetrics(tmp_path)
+    for seconds in [0.1, 0.2, 0.3]:
+        metrics.record('state "KL"\n', seconds, rss_delta=4096)
+    text = metrics.prometheus_text()
+
+    assert '# TYPE ridership_section_seconds summary' in text
+    section = 'section="state \\"KL\\"\\n"'
+    assert sample_lines(text, 'ridership_section_seconds') == [
+        f'ridership_section_seconds{{{section},quantile="0.5"}} 0.2',
+        f'ridership_section_seconds{{{section},quantile="0.95"}} 0.29']
+    assert sample_lines(text, 'ridership_section_seconds_sum') == [f'ridership_section_seconds_sum{{{section}}} 0.6']
+    assert sample_lines(text, 'ridership_section_seconds_count') == [f'ridership_section_seconds_count{{{section}}} 3']
+    assert sample_lines(text, 'ridership_section_rss_delta_bytes') == \
+        [f'ridership_section_rss_delta_bytes{{{section}}} 4096']
+    assert text.endswith('\n')
+
+
+def test_collectors_are_appended(tmp_path):
+    metrics = SectionMetrics(tmp_path)
+    metrics.add_collector(lambda: 'ridership_figure_cache_hits_total 7\n')
+    assert metrics.prometheus_text().endswith('ridership_figure_cache_hits_total 7\n')
+
+
+def test_flush_appends_json_lines(tmp_path):
+    metrics = SectionMetrics(tmp_path / 'metrics')
+    metrics.record('overview', 0.5, rss=1024, rss_delta=0, data_version='v1')
+    metrics.flush()
+    metrics.record('overview', 0.25)
+    metrics.flush()
+    metrics.flush()
+
+    records = [json.loads(line) for line in metrics.log_path.read_text().splitlines()]
+    assert [record['seconds'] for record in records] == [0.5, 0.25]
+    assert records[0]['data_version'] == 'v1' and records[0]['rss_bytes'] == 1024
+    assert 'data_version' not in records[1]
+    assert 'ridership_section_seconds_count{section="overview"} 2' in metrics.prometheus_path.read_text()
+
+
+def test_flush_rotates_a_large_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_module, 'MAX_LOG_BYTES', 100)
+    metrics = SectionMetrics(tmp_path)
+    for seconds in [0.1, 0.2, 0.3]:
+        metrics.record('overview', seconds)
+        metrics.flush()
+    # Each record is over the limit, so every flush after the first rotates
+    # the log, and only one old log is kept
+    rotated = tmp_path / 'metrics.jsonl.1'
+    assert [json.loads(line)['seconds'] for line in rotated.read_text().splitlines()] == [0.2]
+    assert [json.loads(line)['seconds'] for line in metrics.log_path.read_text().splitlines()] == [0.3]
+
+
+def test_flush_ignores_write_errors(tmp_path):
+    blocker = tmp_path / 'not_a_directory'
+    blocker.write_text('')
+    metrics = SectionMetrics(blocker / 'metrics')
+    metrics.record('overview', 0.5)
+    metrics.flush()
+    assert metrics.summary().loc[0, 'count'] == 1
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ridership import analytics
+from ridership.cube import LINE_COLUMNS, build_cube
+from ridership.data import select_rows
+from ridership.ranges import DateRangeIndex
+from ridership.table import RidershipTable
+from tests.helpers import assert_cubes_equal
+
+
+def random_ranges(dates, n, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        lo, hi = sorted(rng.integers(0, len(dates), 2))
+        yield dates[lo], dates[hi]
+
+
+def test_range_cube_matches_regrouping_the_rows(ridership_df):
+    index = DateRangeIndex(RidershipTable(ridership_df), LINE_COLUMNS)
+    for start, end in random_ranges(ridership_df['date'], 100):
+        expected = build_cube(select_rows(ridership_df, LINE_COLUMNS, start, end))
+        assert_cubes_equal(index.cube(start, end), expected)
+
+
+def test_open_range_is_the_full_cube(ridership_df):
+    index = DateRangeIndex(ridership_df)
+    assert_cubes_equal(index.cube(), build_cube(ridership_df))
+
+
+@pytest.mark.parametrize('start, end', [('2019-01-07', '2019-01-07'),   # one Monday
+                                        ('2019-01-07', '2019-01-09'),   # weekdays only
+                                        ('2019-01-12', '2019-01-13')])  # weekend only
+def test_short_ranges(ridership_df, start, end):
+    cube = DateRangeIndex(ridership_df).cube(start, end)
+    assert_cubes_equal(cube, build_cube(select_rows(ridership_df, LINE_COLUMNS, start, end)))
+
+    comparison = analytics.weekday_weekend_ridership(cube, LINE_COLUMNS)
+    weekend = pd.Timestamp(start).dayofweek >= 5
+    assert (comparison['Weekday' if weekend else 'Weekend'] == 0).all()
+    assert np.isnan(analytics.latest_growth_rate(cube))
+
+
+def test_empty_range_has_no_peak(ridership_df):
+    index = DateRangeIndex(ridership_df)
+    assert index.bounds('2030-01-01', '2030-12-31') == (len(ridership_df), len(ridership_df))
+    value, date = index.peak('2030-01-01', '2030-12-31')
+    assert np.isnan(value) and date is pd.NaT
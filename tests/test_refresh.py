@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from ridership.cube import build_cube
+from ridership.refresh import DataRefresher
+from tests.helpers import assert_cubes_equal
+
+
+class Source:
+    """A `load` function serving `df` as `version`, or raising while `failing`."""
+
+    def __init__(self, df):
+        self.df = df
+        self.version = 'v1'
+        self.failing = False
+        self.calls = 0
+        self.called = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.called.set()
+        if self.failing:
+            raise OSError('source unreachable')
+        return self.df, self.version
+
+
+def test_first_load_failure_raises(ridership_df):
+    source = Source(ridership_df)
+    source.failing = True
+    refresher = DataRefresher(source, interval=3600)
+    with pytest.raises(OSError):
+        refresher.get()
+    assert refresher.current is None
+    assert 'source unreachable' in refresher.error[1]
+
+
+def test_failed_refresh_keeps_the_last_good_version(ridership_df):
+    source = Source(ridership_df)
+    refresher = DataRefresher(source, interval=3600)
+    first = refresher.get()
+    checked_at = refresher.checked_at
+
+    source.failing, source.version = True, 'v2'
+    assert refresher.refresh() is first
+    assert refresher.current.version == 'v1'
+    assert refresher.error is not None and 'OSError' in refresher.error[1]
+    assert refresher.checked_at == checked_at
+
+
+def test_refresh_after_a_failure_swaps_in_the_new_version(ridership_df):
+    source = Source(ridership_df)
+    refreshed = []
+    refresher = DataRefresher(source, interval=3600, on_refresh=refreshed.append)
+    refresher.get()
+    source.failing = True
+    refresher.refresh()
+
+    source.failing, source.version = False, 'v2'
+    dataset = refresher.refresh()
+    assert dataset.version == 'v2' and refresher.current is dataset
+    assert refresher.error is None
+    assert [d.version for d in refreshed] == ['v1', 'v2']
+    assert_cubes_equal(dataset.cube, build_cube(ridership_df))
+
+
+def test_unchanged_version_is_not_reloaded(ridership_df):
+    source = Source(ridership_df)
+    refreshed = []
+    refresher = DataRefresher(source, interval=3600, on_refresh=refreshed.append)
+    first = refresher.get()
+    assert refresher.get() is first and source.calls == 1
+    assert refresher.refresh() is first and source.calls == 2
+    assert len(refreshed) == 1
+
+
+def test_on_refresh_error_does_not_mark_the_data_stale(ridership_df, caplog):
+    source = Source(ridership_df)
+
+    def save_snapshot(dataset):
+        raise OSError('disk full')
+    refresher = DataRefresher(source, interval=3600, on_refresh=save_snapshot)
+    with caplog.at_level(logging.ERROR, logger='ridership.refresh'):
+        dataset = refresher.get()
+    assert dataset.version == 'v1' and refresher.current is dataset
+    assert refresher.error is None
+    assert refresher.checked_at is not None
+    assert 'disk full' in caplog.text
+
+
+def test_background_thread_revalidates_every_interval(ridership_df):
+    source = Source(ridership_df)
+    refresher = DataRefresher(source, interval=0.01)
+    refresher.get()
+    source.called.clear()
+    source.version = 'v2'
+    refresher.start()
+    try:
+        assert source.called.wait(5)
+        for _ in range(500):
+            if refresher.current.version == 'v2':
+                break
+            time.sleep(0.01)
+    finally:
+        refresher.stop()
+    assert refresher.current.version == 'v2'
+
+
+def test_background_thread_waits_for_the_interval(ridership_df):
+    source = Source(ridership_df)
+    refresher = DataRefresher(source, interval=3600)
+    refresher.start()
+    try:
+        assert not source.called.wait(0.2)
+    finally:
+        refresher.stop()
+    assert source.calls == 0
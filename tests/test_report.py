@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from ridership import analytics, report
+from ridership.cube import LINE_COLUMNS, build_cube
+
+
+@pytest.fixture
+def parquet_path(tmp_path, ridership_df):
+    path = tmp_path / 'ridership.parquet'
+    ridership_df.to_parquet(path, index=False)
+    return path
+
+
+def run_report(parquet_path, output, *args):
+    report.main(['--output', str(output), '--url', '', '--local-path', str(parquet_path),
+                 '--workers', '1', '--plotlyjs', 'cdn', *args])
+    return json.loads((output / 'index.json').read_text())
+
+
+def test_parse_range_and_selection():
+    assert report.parse_range('2020-01-01:') == ('2020-01-01', None)
+    assert report.parse_range(':2020-06-30') == (None, '2020-06-30')
+    with pytest.raises(ValueError):
+        report.parse_range('2020-01-01')
+    assert report.range_key(None, None) == 'all-dates'
+    assert report.range_key('2020-01-01', None) == '2020-01-01_to_last'
+    assert report.parse_selection('all') == ('all', list(LINE_COLUMNS))
+    assert report.parse_selection('pair=a,b') == ('pair', ['a', 'b'])
+
+
+def test_report_writes_every_figure(tmp_path, parquet_path, ridership_df, capsys):
+    output = tmp_path / 'report'
+    lines = LINE_COLUMNS[:3]
+    index = run_report(parquet_path, output, '--range', '2019-06-01:2020-06-30', '--range', ':',
+                       '--selection', f'three={",".join(lines)}')
+
+    assert list(index['variants']) == ['2019-06-01_to_2020-06-30', 'all-dates']
+    for key, variant in index['variants'].items():
+        assert variant['errors'] == {}
+        assert sorted(variant['figures']) == sorted(
+            str(output / key / f'{figure}.{suffix}') for figure in report.RANGE_FIGURES for suffix in ['html', 'json'])
+        selection = variant['selections']['three']
+        assert selection['lines'] == lines and selection['errors'] == {}
+        assert len(selection['figures']) == 2 * len(report.SELECTION_FIGURES)
+        for path in variant['figures'] + selection['figures']:
+            text = open(path, encoding='utf-8').read()
+            if path.endswith('.json'):
+                assert json.loads(text)['data']
+            else:
+                assert 'cdn.plot.ly' in text
+
+    kpis = json.loads((output / 'all-dates' / 'kpis.json').read_text())
+    assert kpis['total_ridership'] == pytest.approx(analytics.total_ridership(build_cube(ridership_df)))
+    assert 'Wrote 14 figures for 2 date ranges x 1 selections' in capsys.readouterr().out
+
+
+def test_failing_figures_are_collected(tmp_path, parquet_path, monkeypatch, capsys):
+    def broken(cube, correlations):
+        raise RuntimeError('no such chart')
+    monkeypatch.setitem(report.RANGE_FIGURES, 'broken', broken)
+
+    output = tmp_path / 'report'
+    with pytest.raises(SystemExit) as exit_info:
+        run_report(parquet_path, output)
+    assert exit_info.value.code == 1
+
+    # The other figures are still written, and the failure is in the index
+    variant = json.loads((output / 'index.json').read_text())['variants']['all-dates']
+    assert variant['errors'] == {'broken': 'RuntimeError: no such chart'}
+    assert len(variant['figures']) == 2 * (len(report.RANGE_FIGURES) - 1)
+    assert variant['selections']['all']['errors'] == {}
+    assert 'all-dates/broken: RuntimeError: no such chart' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('args', [['--range', '2030-01-01:'],
+                                  ['--range', '2020-01-01'],
+                                  ['--selection', 'odd=not_a_line']])
+def test_bad_arguments_exit_with_usage_error(tmp_path, parquet_path, args):
+    with pytest.raises(SystemExit) as exit_info:
+        run_report(parquet_path, tmp_path / 'report', *args)
+    assert exit_info.value.code == 2
+    assert not (tmp_path / 'report' / 'index.json').exists()
@@ -0,0 +1,48 @@
+import pickle
+
+from ridership.cube import LINE_COLUMNS, IncrementalCube, build_cube
+from ridership.snapshot import load_snapshot, save_snapshot
+from tests.helpers import assert_cubes_equal
+
+
+def test_snapshot_round_trip(tmp_path, ridership_df):
+    cube = build_cube(ridership_df)
+    save_snapshot(cube, 'v1', tmp_path / 'aggregates.pkl')
+    loaded, version = load_snapshot(tmp_path / 'aggregates.pkl')
+    assert version == 'v1'
+    assert_cubes_equal(loaded, cube)
+
+
+def test_snapshot_of_other_lines_is_ignored(tmp_path, ridership_df):
+    save_snapshot(build_cube(ridership_df, LINE_COLUMNS[:-1]), 'v1', tmp_path / 'aggregates.pkl')
+    assert load_snapshot(tmp_path / 'aggregates.pkl') is None
+
+
+class FailsToUnpickle:
+    """Unpickles by calling ``int(*args)``, failing like frames from an incompatible pandas."""
+
+    def __init__(self, args):
+        self.args = args
+
+    def __reduce__(self):
+        return int, self.args
+
+
+def test_unreadable_snapshots_are_ignored(tmp_path):
+    path = tmp_path / 'aggregates.pkl'
+    assert load_snapshot(path) is None
+    path.write_bytes(b'not a pickle')
+    assert load_snapshot(path) is None
+    for args in [(None,), ('x',)]:  # TypeError, ValueError
+        path.write_bytes(pickle.dumps(FailsToUnpickle(args)))
+        assert load_snapshot(path) is None
+
+
+def test_cube_of_other_lines_is_rebuilt(ridership_df):
+    old = build_cube(ridership_df, LINE_COLUMNS[:-1])
+    ingest = IncrementalCube()
+    ingest.seed(old, 'v1')
+    assert ingest.cube is None
+
+    ingest.cube, ingest.version = old, 'v1'
+    assert_cubes_equal(ingest.ingest(ridership_df, 'v1'), build_cube(ridership_df))
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ridership import analytics
+from ridership.cube import LINE_COLUMNS
+from ridership.registry import REGISTRY
+from ridership.states import StateAggregates
+from ridership.table import RidershipTable
+
+RANGES = [(None, None),
+          ('2019-06-01', '2020-06-30'),   # the late-opening line is still missing
+          ('2020-01-15', '2020-03-31'),   # it opens inside the range
+          ('2021-02-01', '2021-02-28')]
+
+
+def rows_between(df, start, end):
+    dates = df['date']
+    mask = (dates >= (pd.Timestamp(start) if start else dates.min())) & \
+        (dates <= (pd.Timestamp(end) if end else dates.max()))
+    return df[mask]
+
+
+def test_late_opening_line_is_in_a_state(ridership_df):
+    # The fixture's first line has no readings for its first 401 days
+    assert ridership_df[LINE_COLUMNS[0]].iloc[:401].isna().all()
+    assert REGISTRY.group_of('state', LINE_COLUMNS[0]) is not None
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_state_totals_are_the_sums_of_their_lines(ridership_df, start, end):
+    aggregates = StateAggregates(RidershipTable(ridership_df))
+    rows = rows_between(ridership_df, start, end)
+    summary = aggregates.summary(start, end)
+    assert list(summary.index) == [state for state in REGISTRY.groups('state')
+                                   if set(REGISTRY.members('state', state)) & set(ridership_df.columns)]
+
+    for state in aggregates.states:
+        lines = REGISTRY.members('state', state)
+        assert aggregates.lines(state) == lines
+        expected = rows[lines].sum(axis=1)
+
+        cube = aggregates.cube(state, start, end)
+        assert analytics.total_ridership(cube) == pytest.approx(expected.sum())
+        assert summary.loc[state, 'total_ridership'] == pytest.approx(expected.sum())
+        np.testing.assert_allclose(cube.daily.to_numpy(), expected.to_numpy())
+        pd.testing.assert_series_equal(cube.sums.sum(), rows[lines].sum(), check_names=False)
+        assert summary.loc[state, 'peak_ridership'] == pytest.approx(expected.max())
+        assert summary.loc[state, 'peak_date'] == rows['date'].iloc[int(np.argmax(expected.to_numpy()))]
+
+
+def test_states_add_up_to_all_lines(ridership_df):
+    aggregates = StateAggregates(ridership_df)
+    summary = aggregates.summary('2019-06-01', '2020-06-30')
+    rows = rows_between(ridership_df, '2019-06-01', '2020-06-30')
+    assert summary['total_ridership'].sum() == pytest.approx(rows[LINE_COLUMNS].sum().sum())
+    assert summary['lines'].sum() == len(LINE_COLUMNS)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.synthetic import make_station_frame, station_lines
+from ridership.cube import LINE_COLUMNS
+from ridership.stations import stream_station_ridership
+
+
+@pytest.fixture
+def station_rows():
+    """Hourly rows for 45 days of three stations per line, plus a station missing from the table."""
+    stations = station_lines(3)
+    rows = make_station_frame(n_days=45, stations=list(stations) + ['unknown:00'], hours=4, seed=2)
+    return rows, stations
+
+
+@pytest.fixture
+def station_file(tmp_path, station_rows):
+    """The rows as a parquet file of small row groups, in shuffled order."""
+    rows, _ = station_rows
+    path = tmp_path / 'stations.parquet'
+    shuffled = rows.sample(frac=1, random_state=0).reset_index(drop=True)
+    pq.write_table(pa.Table.from_pandas(shuffled, preserve_index=False), path, row_group_size=5000)
+    return path
+
+
+def expected_daily(rows, stations, start=None, end=None):
+    rows = rows.assign(day=rows['date'].dt.floor('D'), line=rows['station'].astype(str).map(stations))
+    if start is not None:
+        rows = rows[rows['day'] >= pd.Timestamp(start)]
+    if end is not None:
+        rows = rows[rows['day'] <= pd.Timestamp(end)]
+    return rows.dropna(subset=['line']).pivot_table(index='day', columns='line', values='ridership',
+                                                     aggfunc='sum').reindex(columns=LINE_COLUMNS)
+
+
+def test_stream_matches_grouping_in_memory(station_file, station_rows):
+    rows, stations = station_rows
+    rollup = stream_station_ridership(station_file, stations, batch_size=1000)
+    daily = rollup.result()
+
+    expected = expected_daily(rows, stations)
+    assert list(daily.columns) == ['date'] + LINE_COLUMNS
+    assert pd.DatetimeIndex(daily['date']).equals(pd.DatetimeIndex(expected.index))
+    np.testing.assert_allclose(daily[LINE_COLUMNS].to_numpy(), expected.to_numpy())
+    assert rollup.rows == len(rows)
+    assert rollup.unmapped == {'unknown:00': int((rows['station'] == 'unknown:00').sum())}
+
+
+def test_stream_reads_only_the_requested_dates(station_file, station_rows):
+    rows, stations = station_rows
+    start, end = '2019-01-10', '2019-01-20'
+    rollup = stream_station_ridership(station_file, stations, start=start, end=end)
+    daily = rollup.result()
+
+    expected = expected_daily(rows, stations, start, end)
+    assert daily['date'].iloc[0] == pd.Timestamp(start) and daily['date'].iloc[-1] == pd.Timestamp(end)
+    np.testing.assert_allclose(daily[LINE_COLUMNS].to_numpy(), expected.to_numpy())
+
+
+def test_unknown_lines_in_the_station_table_are_rejected(station_file):
+    with pytest.raises(ValueError, match='unknown lines'):
+        stream_station_ridership(station_file, {'a': 'no_such_line'})
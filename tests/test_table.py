@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from ridership import analytics
+from ridership.cube import DAY_NAMES, LINE_COLUMNS, build_cube
+from ridership.registry import REGISTRY
+from ridership.table import DERIVED_COLUMNS, RidershipTable
+
+
+def counting(monkeypatch, name):
+    """Wrap the compute function of derived column `name` and return its call log."""
+    compute, by_lines = DERIVED_COLUMNS[name]
+    calls = []
+
+    def wrapped(table, lines):
+        calls.append(lines)
+        return compute(table, lines)
+    monkeypatch.setitem(DERIVED_COLUMNS, name, (wrapped, by_lines))
+    return calls
+
+
+def test_derived_columns_are_computed_once(ridership_df, monkeypatch):
+    calls = counting(monkeypatch, 'total')
+    table = RidershipTable(ridership_df)
+    first = table.column('total')
+    assert table.column('total') is first
+    assert table.column('total', LINE_COLUMNS) is first
+    assert len(calls) == 1
+
+    # Another list of lines is a column of its own
+    table.column('total', LINE_COLUMNS[:3])
+    assert len(calls) == 2
+
+
+def test_derived_columns_are_read_only(ridership_df):
+    table = RidershipTable(ridership_df)
+    for name in ['day_of_week', 'is_weekend', 'line_values', 'total', 'bus_total', 'row_hash']:
+        with pytest.raises(ValueError):
+            table.column(name)[0] = 0
+
+
+def test_writes_to_the_source_frame_do_not_reach_the_table(ridership_df):
+    line = LINE_COLUMNS[-1]
+    table = RidershipTable(ridership_df)
+    before = table.column(line).copy()
+    total = table.column('total').copy()
+
+    ridership_df.loc[0, line] = 99
+    ridership_df['extra'] = 1.0
+    np.testing.assert_array_equal(table.column(line), before)
+    np.testing.assert_array_equal(table.column('total'), total)
+    assert 'extra' not in table.columns
+
+    # A new table over the changed frame derives its columns again
+    fresh = RidershipTable(ridership_df)
+    assert fresh.column(line)[0] == 99
+    assert fresh.column('total')[0] == pytest.approx(total[0] - before[0] + 99)
+
+
+def test_table_df_is_a_private_copy(ridership_df):
+    table = RidershipTable(ridership_df)
+    df = table.df
+    df['extra'] = 1.0
+    df.loc[0, LINE_COLUMNS[-1]] = 99
+    assert 'extra' not in table.columns
+    assert table.column(LINE_COLUMNS[-1])[0] != 99
+
+
+def test_calendar_fields_match_pandas(ridership_df):
+    table = RidershipTable(ridership_df)
+    dates = ridership_df['date'].dt
+    np.testing.assert_array_equal(table.column('year'), dates.year)
+    np.testing.assert_array_equal(table.column('month'), dates.month)
+    np.testing.assert_array_equal(table.column('day_of_week'), dates.dayofweek)
+    np.testing.assert_array_equal(table.column('is_weekend'), dates.dayofweek >= 5)
+
+
+def test_category_subtotals_add_up_to_the_total(ridership_df):
+    table = RidershipTable(ridership_df)
+    for group in REGISTRY.groups('category'):
+        members = REGISTRY.members('category', group)
+        np.testing.assert_allclose(table.column(f'{group}_total'), ridership_df[members].sum(axis=1))
+    subtotals = sum(table.column(f'{group}_total') for group in REGISTRY.groups('category'))
+    np.testing.assert_allclose(subtotals, table.column('total'))
+
+
+def test_day_of_week_breakdown_reads_the_subtotals(ridership_df):
+    days = analytics.day_of_week_ridership(build_cube(RidershipTable(ridership_df)))
+    day_of_week = ridership_df['date'].dt.dayofweek
+    for group in ['bus', 'rail']:
+        members = REGISTRY.members('category', group)
+        expected = ridership_df[members].sum(axis=1).groupby(day_of_week).mean()
+        np.testing.assert_allclose(days[f'{group}_ridership'], expected)
+    np.testing.assert_allclose(days['bus_ridership'] + days['rail_ridership'], days['total_ridership'])
+    assert list(days.index) == DAY_NAMES